@@ -11,22 +11,38 @@ system_utterances = {
     "goodbye": "Goodbye!"
 }
 
+
 from dialogue_system.finite_state_machine_initializor import initialize_fsm
+from dialogue_system.speech_resources import speech_resources
+from dialogue_system.tts_cache import tts_cache
+from utils.dialogue_logger import DialogueLogger
 
-def start_dialogue_system(model, restaurant_manager, restaurant_searcher, use_asr=False, use_tts=False, confirm_matches=False, response_mode="humanlike"):
+def start_dialogue_system(model, restaurant_manager, restaurant_searcher, use_asr=False, use_tts=False, confirm_matches=False, response_mode="humanlike", transcript_writer=None,
+                          input_channel=None):
     """
     Launches the interactive restaurant dialogue system.
+    ASR/TTS resources are warmed on a background thread while the welcome prompt is printed.
+    User turns come from the console/microphone, or from `input_channel` if given (e.g. ASR on replayed wav files).
     """
+    speech_resources.warm_up(use_asr=use_asr, use_tts=use_tts, background=True)
+
     print("\n" + "-"*100)
     print("Welcome to the Restaurant Dialogue System!".center(100) + "\n" + "-"*100)
     
-    fsm = initialize_fsm(restaurant_searcher, model, restaurant_manager, use_asr, use_tts, confirm_matches, response_mode)
-    
-    while fsm.is_active:
-        fsm.step()
+    fsm = initialize_fsm(restaurant_searcher, model, restaurant_manager, use_asr, use_tts, confirm_matches, response_mode,
+                         input_channel=input_channel, logger=DialogueLogger(writer=transcript_writer))
     
-    # Save the transcript at the end of the dialogue
-    fsm.logger.save()
+    # One event loop for the whole dialogue; Ctrl+C cancels it and the transcript is still saved before exiting
+    try:
+        fsm.run_blocking()
+    except KeyboardInterrupt:
+        print("\n[Dialogue interrupted]")
+        raise
+    finally:
+        # Save the transcript at the end of the dialogue
+        fsm.logger.save()
+        speech_resources.print_report()
+        tts_cache.print_report()
     print("\nDialogue ended. Returning to main menu...")
 
 
@@ -106,7 +122,7 @@ def start_simple_cli(models):
                 print(f"{name:<25} -> '{prediction}'")
         print("-" * 50)
 
-def start_cli(models, restaurant_manager, restaurant_searcher):
+def start_cli(models, restaurant_manager, restaurant_searcher, transcript_writer=None):
     """
     Main CLI entry point that allows switching between the simple classifier and the dialogue system.
     """
@@ -158,7 +174,7 @@ def start_cli(models, restaurant_manager, restaurant_searcher):
                     response_mode = "humanlike" if mode_choice == 'h' else "system"
                     print(f"(Using '{response_mode}' response mode)")
 
-                    start_dialogue_system(chosen_model, restaurant_manager, restaurant_searcher, use_asr, use_tts, confirm_matches, response_mode)
+                    start_dialogue_system(chosen_model, restaurant_manager, restaurant_searcher, use_asr, use_tts, confirm_matches, response_mode, transcript_writer)
                 else:
                     print("Invalid choice. Returning to main menu.")
             except (ValueError, IndexError):
@@ -0,0 +1,163 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from data.data import CorpusStats, load_and_preprocess_data, split_data
+
+CORPUS_CACHE_DIR = os.path.join("model_tuning", "corpus")
+SPLIT_VARIANTS = ("original", "deduplicated")
+SPLIT_PARTS = ("train", "val", "test")
+
+# The cache depends on how the corpus is parsed and split, so edits to these files invalidate it
+_LOADER_CODE = tuple(os.path.join(os.path.dirname(__file__), filename) for filename in ("data.py", "corpus_cache.py"))
+
+
+def _file_digest(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def corpus_key(filepath, test_size, val_size, seed):
+    """Cache key of a corpus: hash of the source file, the split parameters and the loader code."""
+    parts = [_file_digest(filepath), *(_file_digest(path) for path in _LOADER_CODE), repr((test_size, val_size, seed))]
+    return hashlib.blake2b("|".join(parts).encode("ascii"), digest_size=16).hexdigest()
+
+
+def _write_corpus(directory, filepath, test_size, val_size, seed):
+    """Parses and splits the corpus once and writes it as flat NumPy arrays."""
+    stats = CorpusStats()
+    df = load_and_preprocess_data(filepath, stats=stats)
+    df_deduplicated = df.drop_duplicates(subset=['utterance'])
+    print(f"Created a copy of the data without duplicates. Total rows: {df_deduplicated.shape[0]}")
+
+    # All utterances in one string; row i is text[offsets[i]:offsets[i + 1]] (character offsets)
+    utterances = df['utterance'].tolist()
+    offsets = np.zeros(len(utterances) + 1, dtype=np.int64)
+    np.cumsum([len(utterance) for utterance in utterances], out=offsets[1:])
+    with open(os.path.join(directory, "text.txt"), "w", encoding="utf-8", newline="") as f:
+        f.write("".join(utterances))
+    np.save(os.path.join(directory, "offsets.npy"), offsets)
+
+    labels = df['dialog_act'].cat
+    np.save(os.path.join(directory, "labels.npy"), labels.codes.to_numpy().astype(np.int16))
+
+    # Split index sets are row numbers into the full corpus (the deduplicated frame keeps the original row numbers)
+    for variant, frame in zip(SPLIT_VARIANTS, (df, df_deduplicated)):
+        X_train, X_val, X_test = split_data(frame, test_size, val_size, seed)[:3]
+        for part, X in zip(SPLIT_PARTS, (X_train, X_val, X_test)):
+            np.save(os.path.join(directory, f"{variant}_{part}.npy"), X.index.to_numpy(dtype=np.int64))
+
+    meta = {
+        "source": os.path.basename(filepath),
+        "split": {"test_size": test_size, "val_size": val_size, "seed": seed},
+        "categories": [str(category) for category in labels.categories],
+        "stats": vars(stats),
+        "deduplicated_rows": int(df_deduplicated.shape[0]),
+    }
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _build_atomically(directory, build):
+    """Builds into a temporary sibling directory and renames it into place, so readers never see partial caches."""
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(directory), prefix=".tmp-")
+    try:
+        build(tmp_dir)
+        os.replace(tmp_dir, directory)
+    except OSError:
+        # Another process published the same corpus first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(directory):
+            raise
+
+
+class CorpusCache:
+    """
+    Read-only view of a cached corpus: the utterances (one UTF-8 text plus offsets), the dialog act codes and the split
+    index sets, all memory-mapped. The utterance strings are decoded once per process and shared by every split.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        self.label_codes = np.load(os.path.join(directory, "labels.npy"), mmap_mode="r")
+        self._texts = None
+
+    @property
+    def texts(self):
+        """All utterances as an object array (decoded on first use)."""
+        if self._texts is None:
+            with open(os.path.join(self.directory, "text.txt"), encoding="utf-8", newline="") as f:
+                text = f.read()
+            bounds = self.offsets.tolist()
+            self._texts = np.array([text[start:end] for start, end in zip(bounds[:-1], bounds[1:])], dtype=object)
+        return self._texts
+
+    def indices(self, variant, part):
+        return np.load(os.path.join(self.directory, f"{variant}_{part}.npy"), mmap_mode="r")
+
+    def split(self, variant):
+        """Returns (X_train, X_val, X_test, y_train, y_val, y_test) as pandas Series, like split_data()."""
+        categories = self.meta["categories"]
+        X, y = [], []
+        for part in SPLIT_PARTS:
+            rows = np.asarray(self.indices(variant, part))
+            X.append(pd.Series(self.texts[rows], index=rows, name='utterance'))
+            y.append(pd.Series(pd.Categorical.from_codes(self.label_codes[rows], categories), index=rows, name='dialog_act'))
+        return (*X, *y)
+
+    def print_stats(self):
+        stats = CorpusStats()
+        vars(stats).update(self.meta["stats"])
+        stats.print_report()
+        print("-"*50 + f"\nLoaded and preprocessed {stats.kept_rows} rows.")
+        print(f"Created a copy of the data without duplicates. Total rows: {self.meta['deduplicated_rows']}")
+
+    def handle(self, variant):
+        return CorpusSplit(self.directory, variant)
+
+
+@lru_cache(maxsize=None)
+def open_corpus(directory):
+    """One CorpusCache per directory and process, so the decoded utterances are shared between stages."""
+    return CorpusCache(directory)
+
+
+@dataclass(frozen=True)
+class CorpusSplit:
+    """
+    Lightweight, picklable reference to one split variant of a cached corpus. Passing it between processes only
+    sends the directory name; the arrays are memory-mapped again on the other side by load().
+    """
+    directory: str
+    variant: str
+
+    def load(self):
+        return open_corpus(self.directory).split(self.variant)
+
+
+def load_corpus(filepath, test_size=0.15, val_size=0.10, seed=42, cache_dir=CORPUS_CACHE_DIR):
+    """
+    Returns the CorpusCache of a data file, parsing and splitting it only if the file, the split parameters
+    or the loader code changed since it was last cached.
+    """
+    directory = os.path.join(cache_dir, corpus_key(filepath, test_size, val_size, seed))
+    if os.path.isdir(directory):
+        corpus = open_corpus(directory)
+        corpus.print_stats()
+        return corpus
+
+    _build_atomically(directory, lambda tmp_dir: _write_corpus(tmp_dir, filepath, test_size, val_size, seed))
+    return open_corpus(directory)
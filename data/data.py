@@ -1,54 +1,107 @@
+import os
+import mmap
+
 import pandas as pd
-from sklearn.model_selection import train_test_split
 
-def load_and_preprocess_data(filepath):
+class CorpusStats:
+    """Row counts collected while streaming the corpus (before any rows are dropped)."""
+    def __init__(self):
+        self.total_rows = 0
+        self.null_count = 0
+        self.unintelligible_count = 0
+        self.kept_rows = 0
+
+    def print_report(self):
+        print("Total rows BEFORE handling missing values: ", self.total_rows)
+        print(f"\nNumber of 'null' dialog acts: {self.null_count}")
+        print(f"Percentage of null dialog acts: {(self.null_count / self.total_rows) * 100:.2f}%")
+        print(f"Number of 'unintelligible' utterances: {self.unintelligible_count}")
+        print(f"Percentage of unintelligible utterances: {(self.unintelligible_count / self.total_rows) * 100:.2f}%")
+        print(f"\nDropping missing values...")
+        print("Total rows AFTER handling missing values: ", self.kept_rows)
+
+
+def _iter_chunks(filepath, chunk_size, use_mmap):
+    """Yields the raw file contents in blocks of about chunk_size bytes (read() calls or slices of a memory map)."""
+    with open(filepath, 'rb') as f:
+        if use_mmap and os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, len(mapped), chunk_size):
+                    yield mapped[offset:offset + chunk_size]
+        else:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                yield block
+
+
+def iter_dialog_acts(filepath, stats=None, chunk_size=1 << 20, use_mmap=False):
+    """
+    Streams (dialog_act, utterance) pairs from the file without loading it as a whole.
+    The file is read in chunks of `chunk_size` bytes (optionally through mmap) and each line is processed like
+    'dialog_act [space] utterance_content': lowercased, empty/malformed lines skipped, and rows with a 'null'
+    dialog act or an 'unintelligible' utterance dropped. If `stats` (a CorpusStats) is given it is updated on the fly.
+    """
+    stats = stats if stats is not None else CorpusStats()
+    remainder = b''
+    for block in _iter_chunks(filepath, chunk_size, use_mmap):
+        # Only decode complete lines, so a multi-byte character is never cut in half at a chunk border
+        block = remainder + block
+        cut = block.rfind(b'\n') + 1
+        remainder = block[cut:]
+        yield from _parse_lines(block[:cut], stats)
+    if remainder:
+        yield from _parse_lines(remainder, stats)
+
+
+def _parse_lines(raw, stats):
+    # Convert the whole chunk to lowercase at once instead of line by line
+    for line in raw.decode('utf-8').lower().split('\n'):
+        line = line.strip()
+
+        # Skip empty lines
+        if not line:
+            continue
+
+        parts = line.split(' ', 1)
+        if len(parts) < 2:
+            # Skip lines that do not conform to the expected format (missing utterance content)
+            continue
+
+        dialog_act, utterance = parts
+        stats.total_rows += 1
+
+        # Since some acts have no label, and some utterances are completely unintelligible, we need to handle those.
+        is_null = dialog_act == 'null'
+        is_unintelligible = utterance == 'unintelligible'
+        stats.null_count += is_null
+        stats.unintelligible_count += is_unintelligible
+        if is_null or is_unintelligible:
+            continue
+
+        stats.kept_rows += 1
+        yield dialog_act, utterance
+
+
+def load_and_preprocess_data(filepath, chunk_size=1 << 20, use_mmap=False, stats=None):
     """
     Loads data from the specified file into a pandas DataFrame.
     Assumes each line is in the format: 'dialog_act [space] utterance_content'
     Converts all text to lowercase, handles multiple dialog acts by taking only the first one,
     and handles missing/null values by dropping malformed rows.
+    The file is streamed (see iter_dialog_acts): rows are filtered and counted in a single pass
+    and 'dialog_act' is stored as a categorical column. Pass a CorpusStats as `stats` to keep the counts.
     """
-    data = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            # Convert the entire line to lowercase
-            line = line.lower().strip()
-
-            # Skip empty lines
-            if not line:
-                continue
-
-            parts = line.split(' ', 1)
-            if len(parts) < 2:
-                # Skip lines that do not conform to the expected format (missing utterance content)
-                continue
-
-            dialog_act = parts[0]
-            utterance = parts[1]
-
-            data.append({'dialog_act': dialog_act, 'utterance': utterance}) # Add entry
-
-    # Convert to dataframe
-    df = pd.DataFrame(data)
-
-    # Since some acts have no label, and some utterances are completely unintelligible, we need to handle those.
-    # Calculate and print the number and percentage of 'null' and 'unintelligible' dialog acts
-    null_count = df[df['dialog_act'] == 'null'].shape[0]
-    unintelligible_count = df[df['utterance'] == 'unintelligible'].shape[0]
-    total_rows = df.shape[0]
-
-    print("Total rows BEFORE handling missing values: ", total_rows)
-    print(f"\nNumber of 'null' dialog acts: {null_count}")
-    print(f"Percentage of null dialog acts: {(null_count / total_rows) * 100:.2f}%")
-    print(f"Number of 'unintelligible' utterances: {unintelligible_count}")
-    print(f"Percentage of unintelligible utterances: {(unintelligible_count / total_rows) * 100:.2f}%")
-    print(f"\nDropping missing values...")
-
-    # Drop rows where dialog_act is 'null' or utterance is 'unintelligible'
-    df = df[df['dialog_act'] != 'null']
-    df = df[df['utterance'] != 'unintelligible']
-    print("Total rows AFTER handling missing values: ", df.shape[0])
+    stats = stats if stats is not None else CorpusStats()
+    dialog_acts = []
+    utterances = []
+    for dialog_act, utterance in iter_dialog_acts(filepath, stats, chunk_size, use_mmap):
+        dialog_acts.append(dialog_act)
+        utterances.append(utterance)
 
+    # Two flat columns instead of one dict per row
+    df = pd.DataFrame({'dialog_act': pd.Categorical(dialog_acts), 'utterance': utterances})
+    del dialog_acts, utterances
+
+    stats.print_report()
     print("-"*50 + f"\nLoaded and preprocessed {len(df)} rows.")
     return df
 
@@ -57,6 +110,9 @@ def split_data(df, test_size=0.15, val_size=0.10, seed=42):
     Splits the data into training, validation, and test sets.
     Approach: 85% train, 15% test. Then split train such that 10% of total data is used for val set.
     """
+    # Imported here so that reading a cached corpus does not pay for loading scikit-learn
+    from sklearn.model_selection import train_test_split
+
     # Split into 85% train and 15% test
     X_train, X_test, y_train, y_test = train_test_split(
         df['utterance'], df['dialog_act'], test_size=test_size, random_state=seed
@@ -0,0 +1,327 @@
+import queue
+import threading
+import time
+import wave
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from dialogue_system.speech_resources import speech_resources
+
+CHUNK = 1024
+CHANNELS = 1
+RATE = 16000
+SILENCE_THRESHOLD = 300
+SILENCE_SECONDS = 2.0
+HANGOVER_SECONDS = 0.5
+
+
+def chunk_rms(chunks: np.ndarray) -> np.ndarray:
+    """RMS energy of every row of a (n_chunks, CHUNK) int16 array, in one vectorized pass (replaces audioop.rms per chunk)."""
+    samples = chunks.astype(np.float32)
+    return np.sqrt(np.einsum("ij,ij->i", samples, samples) / chunks.shape[1])
+
+
+def to_float32(audio: np.ndarray) -> np.ndarray:
+    """int16 PCM -> float32 in [-1, 1), the in-memory input format of WhisperModel.transcribe."""
+    return audio.astype(np.float32) / 32768.0
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size ring of int16 audio chunks, written by one capture thread and read by sequence number.
+    The microphone never waits: when the reader falls more than `capacity` chunks behind, the oldest chunks are
+    overwritten (and counted as overruns). File sources write with block=True and wait for the reader instead, and
+    mark where each of their inputs (a replayed file) ends.
+    """
+    def __init__(self, capacity: int, chunk: int = CHUNK):
+        self.capacity = capacity
+        self.chunk = chunk
+        self.buffer = np.zeros((capacity, chunk), dtype=np.int16)
+        self.times = np.zeros(capacity)  # time.monotonic() at which each chunk was captured
+        self.written = 0  # Sequence number of the next chunk
+        self.read_position = 0
+        self.overruns = 0
+        self.closed = False
+        self.input_ends = deque(maxlen=64)  # Sequence numbers at which an input ended
+        self._condition = threading.Condition()
+
+    def write(self, data: bytes, block: bool = False):
+        samples = np.frombuffer(data, dtype=np.int16)[:self.chunk]
+        with self._condition:
+            while block and not self.closed and self.written - self.read_position >= self.capacity:
+                self._condition.wait()
+            row = self.buffer[self.written % self.capacity]
+            row[:len(samples)] = samples
+            row[len(samples):] = 0
+            self.times[self.written % self.capacity] = time.monotonic()
+            self.written += 1
+            self._condition.notify_all()
+
+    def read(self, start: int, timeout: float = None):
+        """All chunks from sequence number `start` on (waiting up to `timeout` for one) as (chunks, capture times, next start)."""
+        with self._condition:
+            if self.written <= start and not self.closed:
+                self._condition.wait(timeout)
+            end = self.written
+            if end - start > self.capacity:
+                self.overruns += end - start - self.capacity
+                start = end - self.capacity
+            slots = np.arange(start, end) % self.capacity
+            chunks, times = self.buffer[slots], self.times[slots]
+            self.read_position = end
+            self._condition.notify_all()
+        return chunks, times, end
+
+    def end_input(self):
+        """Marks the end of one input at the current write position and wakes a reader that waits for more audio."""
+        with self._condition:
+            self.input_ends.append(self.written)
+            self._condition.notify_all()
+
+    def input_ended(self, start: int, position: int) -> bool:
+        """Whether an input ended after sequence number `start` and at or before `position`."""
+        with self._condition:
+            return any(start < end <= position for end in self.input_ends)
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class MicrophoneSource:
+    """One PyAudio input stream, opened once and read by a daemon thread for the lifetime of the process."""
+    def __init__(self):
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self, ring: AudioRingBuffer):
+        pyaudio = speech_resources.pyaudio()
+        self._pyaudio = pyaudio.PyAudio()
+        self._stream = self._pyaudio.open(format=pyaudio.paInt16, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=ring.chunk)
+
+        def run():
+            try:
+                while not self._stopping.is_set():
+                    ring.write(self._stream.read(ring.chunk, exception_on_overflow=False))
+            except IOError as e:
+                print(f"[ASR] Microphone stream stopped: {e}")
+            finally:
+                ring.close()
+
+        self._thread = threading.Thread(target=run, name="microphone-capture", daemon=True)
+        self._thread.start()
+
+    def listen(self):
+        """The microphone is always capturing."""
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._stream.stop_stream()
+            self._stream.close()
+            self._pyaudio.terminate()
+            self._thread = None
+
+
+def read_wav(path: str) -> np.ndarray:
+    """A 16-bit wav file as mono int16 samples at RATE (channels are averaged, other rates are resampled linearly)."""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM wav files are supported")
+        channels, rate = wf.getnchannels(), wf.getframerate()
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != RATE:
+        n_samples = int(round(len(audio) * RATE / rate))
+        audio = np.interp(np.arange(n_samples) * rate / RATE, np.arange(len(audio)), audio)
+    return audio.astype(np.int16)
+
+
+class FileReplaySource:
+    """
+    Plays wav files into the capture path instead of a microphone: every listen() feeds the next file, followed by
+    `trailing_silence` seconds of silence so the utterance is endpointed, and marks the end of the file in the ring
+    (a file in which no utterance is endpointed ends its turn there). With realtime=True chunks arrive at the speed of
+    a microphone, otherwise as fast as the reader takes them.
+    """
+    def __init__(self, paths, realtime=False, trailing_silence=SILENCE_SECONDS + 1.0):
+        self.paths = list(paths)
+        self.realtime = realtime
+        self.trailing_silence = trailing_silence
+        self._requests = queue.Queue()
+        self._thread = None
+
+    def start(self, ring: AudioRingBuffer):
+        def run():
+            try:
+                # The ring is closed after the last file, so the reader does not wait for a file that never comes
+                for path in self.paths:
+                    if self._requests.get() is None:
+                        break
+                    audio = read_wav(path)
+                    audio = np.concatenate([audio, np.zeros(int(self.trailing_silence * RATE), dtype=np.int16)])
+                    for offset in range(0, len(audio), ring.chunk):
+                        ring.write(audio[offset:offset + ring.chunk].tobytes(), block=True)
+                        if self.realtime:
+                            time.sleep(ring.chunk / RATE)
+                    ring.end_input()
+            finally:
+                ring.close()
+
+        self._thread = threading.Thread(target=run, name="file-replay-capture", daemon=True)
+        self._thread.start()
+
+    def listen(self):
+        self._requests.put(True)
+
+    def close(self):
+        self._requests.put(None)
+
+
+class Endpointer:
+    """
+    Decides from chunk energies when an utterance starts and ends.
+
+    The noise floor is the quietest chunk of the last `floor_window_seconds` (minimum statistics), calibrated from
+    `calibration_seconds` of chunks quiet enough to be room tone (at most max_noise_floor); when the user speaks from
+    the first chunk on, min_threshold is used until enough of them have been seen. Once calibrated, the floor is
+    tracked during speech too, since the pauses between words fall back to the floor, so it persists across turns on
+    the shared microphone and follows a room that gets louder.
+    Speech starts after `onset_seconds` above speech_ratio x the noise floor (at least min_threshold), which ignores
+    clicks. It ends after `hangover_seconds` below release_ratio x that threshold; the lower release level keeps soft
+    word endings from cutting the utterance.
+    """
+    def __init__(self, hangover_seconds=HANGOVER_SECONDS, onset_seconds=0.1, speech_ratio=3.0, release_ratio=0.6,
+                 min_threshold=100.0, max_noise_floor=1000.0, calibration_seconds=0.3, floor_window_seconds=1.5, adaptive=True,
+                 chunk=CHUNK):
+        self.hangover_chunks = max(1, round(hangover_seconds * RATE / chunk))
+        self.onset_chunks = max(1, round(onset_seconds * RATE / chunk))
+        self.calibration_chunks = max(1, round(calibration_seconds * RATE / chunk))
+        self.speech_ratio = speech_ratio
+        self.release_ratio = release_ratio
+        self.min_threshold = min_threshold
+        self.max_noise_floor = max_noise_floor
+        self.adaptive = adaptive
+        self.noise_floor = None
+        self._chunks = 0
+        self._recent = deque(maxlen=max(self.calibration_chunks, round(floor_window_seconds * RATE / chunk)))
+        self.reset()
+
+    @classmethod
+    def fixed(cls, threshold=SILENCE_THRESHOLD, hangover_seconds=SILENCE_SECONDS):
+        """The original endpointing: a fixed energy threshold and `hangover_seconds` (2 s) of silence."""
+        return cls(hangover_seconds=hangover_seconds, onset_seconds=0, release_ratio=1.0, min_threshold=threshold, adaptive=False)
+
+    def reset(self):
+        """Starts a new utterance (the noise floor is kept)."""
+        self.speaking = False
+        self.above = 0
+        self.below = 0
+
+    @property
+    def threshold(self):
+        if not self.adaptive or self.noise_floor is None:
+            return self.min_threshold
+        return max(self.min_threshold, self.noise_floor * self.speech_ratio)
+
+    def update(self, energy) -> bool:
+        """Feeds the energy of the next chunk; returns True once the utterance has ended."""
+        if self.adaptive:
+            self._chunks += 1
+            if self.noise_floor is not None or energy <= self.max_noise_floor:
+                # Speech is kept out of the calibration, or it would become the floor and hide itself
+                self._recent.append(energy)
+            if self.noise_floor is not None or len(self._recent) >= self.calibration_chunks:
+                self.noise_floor = float(min(self._recent))
+            elif self._chunks < self.calibration_chunks:
+                # No decision during the first calibration window (the pre-roll keeps the audio meanwhile)
+                return False
+
+        threshold = self.threshold
+        if not self.speaking:
+            self.above = self.above + 1 if energy > threshold else 0
+            self.speaking = self.above >= self.onset_chunks
+            return False
+
+        self.below = 0 if energy > threshold * self.release_ratio else self.below + 1
+        return self.below >= self.hangover_chunks
+
+
+@dataclass
+class Utterance:
+    audio: np.ndarray  # int16 samples at RATE
+    speech_end: float  # time.monotonic() at which the last speech chunk was captured
+    endpointed: float  # time.monotonic() at which the end of the utterance was detected
+    endpoint_delay: float  # seconds of audio between the last speech chunk and the endpoint (the hangover waited)
+    reason: str  # "silence", "max_duration" or "end_of_audio" (empty audio if the input ended without speech)
+    noise_floor: float = None
+
+
+class AudioCapture:
+    """
+    Cuts utterances out of a continuously captured audio stream. The source (microphone or file replay) writes into a
+    ring buffer from its own thread; next_utterance() reads the new chunks, computes their energy in one NumPy pass and
+    lets the Endpointer (adaptive by default) decide where the utterance starts and ends. The samples from just before
+    speech starts until the endpoint are returned as one int16 array.
+    Audio captured between turns (e.g. while the system is speaking) is skipped unless skip_buffered=False.
+    """
+    def __init__(self, source, endpointer: Endpointer = None, pre_roll_seconds=0.5, max_seconds=30.0, ring_seconds=30.0, chunk=CHUNK):
+        self.source = source
+        self.endpointer = endpointer or Endpointer(chunk=chunk)
+        self.pre_roll_chunks = int(pre_roll_seconds * RATE / chunk)
+        self.max_chunks = int(max_seconds * RATE / chunk)
+        self.ring = AudioRingBuffer(int(ring_seconds * RATE / chunk), chunk)
+        self._position = 0
+        source.start(self.ring)
+
+    def next_utterance(self, skip_buffered=True) -> Utterance:
+        """
+        Blocks until an utterance has been spoken and endpointed, or the source's current input (a replayed file) has
+        ended; an input without speech gives an empty utterance. Raises EOFError when the source has ended.
+        """
+        position = start = self.ring.written if skip_buffered else self._position
+        self.source.listen()
+
+        endpointer = self.endpointer
+        endpointer.reset()
+        frames = []
+        speech_end, speech_end_frames = 0.0, 0
+        reason = "end_of_audio"
+        while reason == "end_of_audio" and not self.ring.input_ended(start, position):
+            chunks, times, position = self.ring.read(position, timeout=0.5)
+            if not len(chunks):
+                if self.ring.closed:
+                    break
+                continue
+
+            for index, (chunk, captured_at, energy) in enumerate(zip(chunks, times, chunk_rms(chunks))):
+                frames.append(chunk)
+                ended = endpointer.update(energy)
+                if not endpointer.speaking:
+                    # Before speech only a short pre-roll is kept
+                    del frames[:-self.pre_roll_chunks or len(frames)]
+                    continue
+                if endpointer.below == 0:
+                    speech_end, speech_end_frames = captured_at, len(frames)
+                if ended or len(frames) >= self.max_chunks:
+                    reason = "silence" if ended else "max_duration"
+                    # The rest of this read belongs to the next utterance
+                    position -= len(chunks) - index - 1
+                    break
+
+        self._position = position
+        if not endpointer.speaking:
+            if not self.ring.input_ended(start, position):
+                raise EOFError("audio source ended")
+            now = time.monotonic()
+            return Utterance(np.zeros(0, dtype=np.int16), now, now, 0.0, reason, endpointer.noise_floor)
+        return Utterance(np.concatenate(frames), speech_end, time.monotonic(),
+                         (len(frames) - speech_end_frames) * self.ring.chunk / RATE, reason, endpointer.noise_floor)
+
+    def close(self):
+        self.source.close()
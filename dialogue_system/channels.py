@@ -0,0 +1,220 @@
+import asyncio
+import os
+import threading
+import time
+
+from colorama import Fore
+from rich.progress import Progress, BarColumn, TimeRemainingColumn
+
+from dialogue_system.audio_capture import AudioCapture, to_float32
+from dialogue_system.speech_resources import speech_resources
+from dialogue_system.tts_cache import VOICE, synthesize_edge_tts, tts_cache as shared_tts_cache
+from utils.metrics import metrics
+
+AUDIO_DIR = "audio"
+
+
+# --- Blocking speech helpers (run on worker threads by the channels below) ---
+
+def transcribe(audio, vad_filter: bool = None) -> str:
+    """
+    Transcribes int16 samples at 16 kHz with the shared ASR model; the audio is passed in memory as float32.
+    vad_filter (default: speech_resources.vad_filter) lets Whisper drop non-speech parts before decoding.
+    """
+    vad_filter = speech_resources.vad_filter if vad_filter is None else vad_filter
+    segments, _ = speech_resources.asr_model().transcribe(to_float32(audio), beam_size=5, vad_filter=vad_filter)
+    return " ".join([segment.text for segment in segments]).strip()
+
+
+def record_and_transcribe(capture: AudioCapture = None, state: str = None, session: str = None) -> str:
+    """
+    Waits for the next utterance on the capture (the shared microphone stream by default) and transcribes it.
+    Reports how long the user waited from the end of their speech until the transcript (endpointing + transcription),
+    and records it in the metrics tagged with the FSM `state` and `session`.
+    """
+    # Heavy audio/ASR dependencies are only loaded (or awaited, if warming in the background) once ASR is used
+    capture = capture or speech_resources.microphone()
+    speech_resources.asr_model()
+
+    print(Fore.GREEN + "[Listening...]")
+    utterance = capture.next_utterance()
+    if not len(utterance.audio):
+        print(Fore.BLUE + "[No speech detected]")
+        return ""
+    print(Fore.BLUE + "[Processing...]")
+    text = transcribe(utterance.audio)
+    transcribed = time.monotonic()
+
+    endpointing, transcription = utterance.endpointed - utterance.speech_end, transcribed - utterance.endpointed
+    print(Fore.BLUE + f"[Transcript {endpointing + transcription:.2f}s after end of speech: "
+                      f"endpointing {endpointing:.2f}s, transcription {transcription:.2f}s]")
+    if metrics.enabled:
+        metrics.record("asr_endpointing", endpointing, state, session)
+        metrics.record("asr_transcription", transcription, state, session)
+        metrics.record("asr_latency", endpointing + transcription, state, session)  # End of speech to transcript
+    return text
+
+
+async def _generate_tts(text: str) -> str:
+    """Streams the synthesized speech of `text` into a temporary mp3 file and returns its path."""
+    temp_audio_file = os.path.join(AUDIO_DIR, f"temp_tts_{time.time()}.mp3")
+    await synthesize_edge_tts(text, VOICE, temp_audio_file)
+    return temp_audio_file
+
+
+def _play_with_progress(audio_file: str, text: str, remove_after: bool = True):
+    words_per_minute = 150
+    words = len(text.split())
+    duration = (words / words_per_minute) * 60
+
+    playback_thread = threading.Thread(target=speech_resources.playsound(), args=(audio_file,))
+    playback_thread.start()
+
+    with Progress(
+        "[progress.description]{task.description}",
+        BarColumn(),
+        "[progress.percentage]{task.percentage:>3.0f}%",
+        TimeRemainingColumn(),
+    ) as progress:
+        task = progress.add_task("[cyan]Speaking...", total=duration)
+        start_time = time.time()
+        while playback_thread.is_alive():
+            elapsed = time.time() - start_time
+            progress.update(task, completed=min(elapsed, duration))
+            time.sleep(0.1)
+        progress.update(task, completed=duration)
+
+    playback_thread.join()
+    if remove_after:
+        os.remove(audio_file)
+    print()
+
+
+def _resolve(future, result=None, exception=None):
+    if future.cancelled():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+async def _in_daemon_thread(func, *args):
+    """
+    Runs a blocking call (input(), a recording) on a daemon thread and awaits its result. Unlike asyncio.to_thread,
+    closing the event loop does not wait for the thread, so Ctrl+C ends a dialogue without waiting for the user.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def run():
+        try:
+            result, exception = func(*args), None
+        except BaseException as e:
+            result, exception = None, e
+        try:
+            loop.call_soon_threadsafe(_resolve, future, result, exception)
+        except RuntimeError:
+            pass  # The loop was closed meanwhile (dialogue interrupted)
+
+    threading.Thread(target=run, name=f"{func.__name__}-reader", daemon=True).start()
+    return await future
+
+
+# --- Channels ---
+
+class Channel:
+    """Base of the channels: the spans a channel records are tagged with the state and session of the FSM it is attached to."""
+    def tags(self):
+        """(state, session) of the current turn; untagged until attach() is called."""
+        return None, None
+
+    def attach(self, tags):
+        """Called by the FSM with a callable returning its current (state, session)."""
+        self.tags = tags
+
+
+class InputChannel(Channel):
+    """Where a dialogue session gets its user turns from. receive() must not block the event loop."""
+    async def receive(self) -> str:
+        raise NotImplementedError
+
+
+class OutputChannel(Channel):
+    """Where a dialogue session sends its system turns to. send() must not block the event loop."""
+    async def send(self, text: str):
+        raise NotImplementedError
+
+
+class ConsoleInput(InputChannel):
+    """
+    Reads typed input; input() runs on a daemon thread so other sessions keep running meanwhile.
+    Typing '!stats' prints the latency metrics instead of answering.
+    """
+    async def receive(self) -> str:
+        while True:
+            text = await _in_daemon_thread(input, "You: ")
+            if text.strip() != "!stats":
+                return text
+            metrics.print_table()
+
+
+class ASRInput(InputChannel):
+    """Captures and transcribes speech on a daemon thread, from the shared microphone stream or the given AudioCapture (e.g. a FileReplaySource)."""
+    def __init__(self, capture: AudioCapture = None):
+        self.capture = capture
+
+    async def receive(self) -> str:
+        state, session = self.tags()
+        with metrics.span("asr", state, session):
+            text = await _in_daemon_thread(record_and_transcribe, self.capture, state, session)
+        print(f"You: {text}")
+        return text
+
+
+class ConsoleOutput(OutputChannel):
+    """
+    Prints system turns and, with use_tts, speaks them (synthesis is awaited, playback runs on a worker thread).
+    Speech comes from the TTS cache (the shared one by default), so repeated turns are not synthesized again;
+    with tts_cache=None (or a disabled cache) every turn is synthesized into a temporary file.
+    """
+    def __init__(self, use_tts: bool = False, tts_cache=shared_tts_cache):
+        self.use_tts = use_tts
+        self.tts_cache = tts_cache
+
+    async def send(self, text: str):
+        print(f"System: {text}")
+        if self.use_tts:
+            cached = self.tts_cache is not None and self.tts_cache.enabled
+            state, session = self.tags()
+            try:
+                with metrics.span("tts_synthesis", state, session):
+                    audio_file = await (self.tts_cache.get(text) if cached else _generate_tts(text))
+                with metrics.span("tts_playback", state, session):
+                    await asyncio.to_thread(_play_with_progress, audio_file, text, not cached)
+            except Exception as e:
+                print(Fore.RED + f"[TTS Error] Could not play audio: {e}")
+
+
+class QueueInput(InputChannel):
+    """User turns pushed by another task (a network connection, a simulator); an idle session just awaits the queue."""
+    def __init__(self, maxsize: int = 0):
+        self.queue = asyncio.Queue(maxsize)
+
+    async def put(self, text: str):
+        await self.queue.put(text)
+
+    async def receive(self) -> str:
+        return await self.queue.get()
+
+
+class QueueOutput(OutputChannel):
+    """Collects system turns in a queue for another task to consume."""
+    def __init__(self, maxsize: int = 0):
+        self.queue = asyncio.Queue(maxsize)
+
+    async def send(self, text: str):
+        await self.queue.put(text)
+
+    async def get(self) -> str:
+        return await self.queue.get()
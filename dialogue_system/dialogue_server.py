@@ -0,0 +1,192 @@
+import asyncio
+import itertools
+import json
+import uuid
+
+from dialogue_system.channels import InputChannel, OutputChannel
+from dialogue_system.finite_state_machine_initializor import initialize_fsm
+from models.classification_service import BatchingClassifier
+from utils.dialogue_logger import DialogueLogger
+from utils.metrics import metrics
+
+
+class SessionClosed(Exception):
+    """The client disconnected or was idle for too long."""
+
+
+class BoundedClassifier:
+    """
+    Limits the number of classification requests in flight. Sessions beyond the limit wait on a semaphore (and
+    stop reading from their socket meanwhile), so a saturated NLU queue pushes back on the clients instead of growing.
+    """
+    def __init__(self, service, max_pending=256):
+        self.service = service
+        self.max_pending = max_pending
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_pending)
+
+    async def aclassify(self, text):
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            return await self.service.aclassify(text)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {**self.service.stats(), "max_pending": self.max_pending, "waiting": self.waiting}
+
+
+class StreamInput(InputChannel):
+    """User turns read line by line from a client connection, with an idle timeout."""
+    def __init__(self, session, reader, idle_timeout):
+        self.session = session
+        self.reader = reader
+        self.idle_timeout = idle_timeout
+
+    async def receive(self) -> str:
+        while True:
+            try:
+                raw_line = await asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                raise SessionClosed("idle timeout")
+            if not raw_line:
+                raise SessionClosed("client disconnected")
+            text = raw_line.decode("utf-8").strip()
+            if text == "!stats":
+                await self.session.send({"stats": self.session.server.stats()})
+            elif text == "!metrics":
+                await self.session.send({"prometheus": metrics.prometheus_text()})
+            elif text:
+                return text
+
+
+class StreamOutput(OutputChannel):
+    """System turns written to the client connection as JSON lines."""
+    def __init__(self, session):
+        self.session = session
+
+    async def send(self, text: str):
+        await self.session.send({"system": text})
+
+
+class DialogueSession:
+    """One client connection: its own FSM (context, logger) on top of the server's shared components."""
+    def __init__(self, server, session_id, reader, writer):
+        self.server = server
+        self.session_id = session_id
+        self.writer = writer
+        self.fsm = initialize_fsm(server.restaurant_searcher, server.classifier, server.restaurant_manager,
+                                  use_asr=False, use_tts=False, response_mode=server.response_mode,
+                                  input_channel=StreamInput(self, reader, server.idle_timeout),
+                                  output_channel=StreamOutput(self),
+                                  logger=DialogueLogger(session_id, server.transcript_writer))
+
+    async def send(self, message):
+        self.writer.write((json.dumps({"session": self.session_id, **message}) + "\n").encode("utf-8"))
+        # Waits while the client is not reading, instead of buffering without bound
+        await self.writer.drain()
+
+
+class DialogueServer:
+    """
+    Hosts many concurrent dialogue sessions in one process over a local TCP socket, one asyncio task per session.
+    The classifier, restaurant manager and searcher are loaded once and shared by all sessions (read-only).
+
+    Line protocol: the client sends one user turn per line, the server answers with JSON lines
+    ({"session": id, "system": text}, and {"session": id, "event": "end" | "timeout" | "disconnected"} at the end).
+    The line '!stats' returns server statistics (and the latency metrics if enabled), '!metrics' the metrics in
+    Prometheus text format.
+    """
+    def __init__(self, model, restaurant_manager, restaurant_searcher, host="127.0.0.1", port=8766,
+                 max_sessions=1000, idle_timeout=300.0, max_pending=256, response_mode="humanlike", save_transcripts=False,
+                 transcript_writer=None):
+        self.restaurant_manager = restaurant_manager
+        self.restaurant_searcher = restaurant_searcher
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.response_mode = response_mode
+        self.save_transcripts = save_transcripts
+        # Optional TranscriptWriter: every turn of every session is streamed to rotating JSONL files
+        self.transcript_writer = transcript_writer
+        # Plain pipelines get a batching service of their own, so concurrent sessions share predict calls
+        self._owns_service = not hasattr(model, "aclassify")
+        self.service = BatchingClassifier(model) if self._owns_service else model
+        self.classifier = None
+        self.sessions = {}
+        self.counts = {"started": 0, "completed": 0, "timed_out": 0, "disconnected": 0, "rejected": 0, "failed": 0}
+        self._max_pending = max_pending
+        # Session ids name the transcript files and group the JSONL records, so they must not repeat across server
+        # processes or restarts: a random id per server, then a counter
+        self._run_id = uuid.uuid4().hex[:8]
+        self._ids = itertools.count(1)
+        self._server = None
+
+    async def start(self):
+        # Created on the server's event loop (the semaphore belongs to it)
+        self.service.start()
+        self.classifier = BoundedClassifier(self.service, self._max_pending)
+        # A listen backlog as large as the session limit, so bursts of new clients are queued instead of reset
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=max(100, self.max_sessions))
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._owns_service:
+            await asyncio.to_thread(self.service.stop)
+
+    async def _handle(self, reader, writer):
+        if len(self.sessions) >= self.max_sessions:
+            self.counts["rejected"] += 1
+            writer.write((json.dumps({"error": "server full", "max_sessions": self.max_sessions}) + "\n").encode("utf-8"))
+            await writer.drain()
+            writer.close()
+            return
+
+        session = DialogueSession(self, f"{self._run_id}-s{next(self._ids)}", reader, writer)
+        self.sessions[session.session_id] = session
+        self.counts["started"] += 1
+        event = "end"
+        try:
+            await session.fsm.run()
+            self.counts["completed"] += 1
+        except SessionClosed as e:
+            event = "timeout" if str(e) == "idle timeout" else "disconnected"
+            self.counts["timed_out" if event == "timeout" else "disconnected"] += 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            event = "disconnected"
+            self.counts["disconnected"] += 1
+        except Exception as e:
+            event = "error"
+            self.counts["failed"] += 1
+            print(f"[Dialogue server] Session {session.session_id} failed: {e!r}")
+        finally:
+            del self.sessions[session.session_id]
+            if self.save_transcripts:
+                session.fsm.logger.save()
+            try:
+                if event != "disconnected":
+                    await session.send({"event": event})
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    def stats(self):
+        return {"active_sessions": len(self.sessions), "max_sessions": self.max_sessions, **self.counts,
+                "classifier": self.classifier.stats() if self.classifier else {},
+                "metrics": metrics.snapshot()["stages"] if metrics.enabled else None}
@@ -0,0 +1,124 @@
+import os
+import time
+import wave
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from dialogue_system.audio_capture import AudioCapture, Endpointer, FileReplaySource, HANGOVER_SECONDS, RATE
+
+# Endpointer configurations compared by default: the original fixed threshold/2 s silence and the adaptive one
+ENDPOINTERS = {
+    "fixed (300, 2.0s)": Endpointer.fixed,
+    f"adaptive ({HANGOVER_SECONDS}s)": Endpointer,
+}
+
+
+# Synthetic fixtures: (name, seed, noise RMS, speech RMS, seconds of room tone before the speech, (min, max) pause between words)
+FIXTURES = [(f"quiet_{i}", i, 30, 3000, 1.0, (0.12, 0.3)) for i in range(5)] + \
+           [(f"noisy_{i}", 10 + i, 450, 4000, 1.0, (0.12, 0.3)) for i in range(5)] + \
+           [(f"soft_{i}", 20 + i, 15, 250, 1.0, (0.12, 0.3)) for i in range(3)] + \
+           [(f"pauses_{i}", 30 + i, 30, 3000, 1.0, (0.3, 0.45)) for i in range(3)] + \
+           [("no_lead_quiet", 40, 30, 3000, 0.0, (0.12, 0.3)), ("no_lead_noisy", 41, 450, 4000, 0.0, (0.12, 0.3))]
+
+
+def _synthetic_speech(rng, words, level, pause):
+    """Voiced 'words' (a harmonic tone under a syllable envelope) at RMS `level`, separated by silent pauses."""
+    parts = []
+    for index in range(words):
+        t = np.arange(int(rng.uniform(0.2, 0.45) * RATE)) / RATE
+        envelope = np.abs(np.sin(np.pi * t / t[-1])) ** 0.5
+        f0 = rng.uniform(110, 220)
+        word = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6)) * envelope
+        parts.append(word / np.sqrt(np.mean(word ** 2)) * level)
+        if index < words - 1:
+            parts.append(np.zeros(int(rng.uniform(*pause) * RATE)))
+    return np.concatenate(parts)
+
+
+def write_synthetic_fixtures(directory, fixtures=FIXTURES, words=6, tail_seconds=3.0):
+    """
+    Writes one wav fixture per FIXTURES entry: room tone (white noise), a six-word synthetic utterance and
+    `tail_seconds` of room tone. The fixtures are deterministic (seeded), so benchmark results are comparable. Returns the paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, seed, noise, level, lead_seconds, pause in fixtures:
+        rng = np.random.default_rng(seed)
+        speech = _synthetic_speech(rng, words, level, pause)
+        audio = np.concatenate([np.zeros(int(lead_seconds * RATE)), speech, np.zeros(int(tail_seconds * RATE))])
+        audio += rng.normal(0, noise, len(audio))
+        path = os.path.join(directory, name + ".wav")
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(RATE)
+            wf.writeframes(np.clip(audio, -32768, 32767).astype(np.int16).tobytes())
+        paths.append(path)
+    return paths
+
+
+@dataclass
+class FileResult:
+    path: str
+    reasons: List[str] = field(default_factory=list)  # Why each utterance ended ("silence", "max_duration", "end_of_audio")
+    endpoint_delays: List[float] = field(default_factory=list)  # Seconds of audio from the end of speech to the endpoint
+    transcription_seconds: List[float] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def benchmark_file(path, endpointer, transcribe=None):
+    """
+    Cuts one wav fixture (one utterance followed by room tone) into utterances like a live session would, without
+    skipping audio between them. The endpoint delay is measured in audio time, so the replay runs as fast as possible.
+    With `transcribe` (e.g. channels.transcribe) every utterance is also transcribed and timed.
+    """
+    capture = AudioCapture(FileReplaySource([path], trailing_silence=0.0), endpointer)
+    result = FileResult(path)
+    while True:
+        try:
+            utterance = capture.next_utterance(skip_buffered=False)
+        except EOFError:
+            break
+        if not len(utterance.audio):
+            continue  # The file ended without an utterance
+        result.reasons.append(utterance.reason)
+        result.endpoint_delays.append(utterance.endpoint_delay)
+        if transcribe is not None:
+            started = time.perf_counter()
+            result.texts.append(transcribe(utterance.audio))
+            result.transcription_seconds.append(time.perf_counter() - started)
+    return result
+
+
+def benchmark_endpointing(paths, endpointers=None, transcribe=None):
+    """Runs every endpointer configuration ({name: factory}) over the wav fixtures; returns {name: [FileResult, ...]}."""
+    endpointers = endpointers or ENDPOINTERS
+    return {name: [benchmark_file(path, factory(), transcribe) for path in paths] for name, factory in endpointers.items()}
+
+
+def print_benchmark(results):
+    """
+    One row per configuration. A fixture is 'split' when it gave more than one utterance and 'missed' when its
+    utterance only ended with the audio (no endpoint in the room tone, e.g. a fixed threshold below the noise).
+    The latency is the endpoint delay plus the transcription time.
+    """
+    print("\n--- Endpointing benchmark ---")
+    print(f"{'Endpointer':<22}{'Files':>6}{'Utts':>6}{'Split':>7}{'Missed':>8}{'Delay s':>9}{'Max s':>7}{'ASR s':>7}{'Latency s':>11}")
+    for name, file_results in results.items():
+        delays = [delay for result in file_results for delay, reason in zip(result.endpoint_delays, result.reasons) if reason == "silence"]
+        transcription = [seconds for result in file_results for seconds in result.transcription_seconds]
+        split = sum(len(result.reasons) > 1 for result in file_results)
+        missed = sum(not result.reasons or result.reasons[-1] != "silence" for result in file_results)
+        print(f"{name:<22}{len(file_results):>6}{sum(len(result.reasons) for result in file_results):>6}{split:>7}{missed:>8}"
+              f"{_mean(delays):>9.2f}{max(delays, default=0.0):>7.2f}{_mean(transcription):>7.2f}{_mean(delays) + _mean(transcription):>11.2f}")
+
+    for name, file_results in results.items():
+        for result in file_results:
+            if result.texts:
+                print(f"  [{name}] {os.path.basename(result.path)}: {' | '.join(result.texts)}")
@@ -1,10 +1,14 @@
 from __future__ import annotations
+import asyncio
+import inspect
 from typing import Callable, List, Optional
 from dataclasses import dataclass, field
 
 from dialogue_system import keyword_searcher
+from dialogue_system.channels import InputChannel, OutputChannel, ConsoleInput, ASRInput, ConsoleOutput
 from dialogue_system.restaurant_manager import RestaurantManager
 from utils.dialogue_logger import DialogueLogger
+from utils.metrics import metrics, NOOP_SPAN
 
 
 # --- Context ---
@@ -18,6 +22,7 @@ class Context:
     pricerange : Optional[str] = None
     incorrect_part : Optional[str] = None
     restaurants_matches: List = field(default_factory=list)
+    extra_preferences: dict = field(default_factory=dict)  # Requested consequences (touristic=True, ...) for the reasoner
 
 
 # --- Actions ---
@@ -64,16 +69,21 @@ class State:
         """Add a transition from this state to another state."""
         self.transitions.append(transition)
 
-    def run(self,fsm: "FSM"):
-        """Execute the state's behavior."""
-        return self.action(fsm)
+    async def arun(self, fsm: "FSM"):
+        """Execute the state's behavior; the action may be a plain function or a coroutine function."""
+        result = self.action(fsm)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
 
     def possible_transitions(self, action: "Action", context: "Context") -> List["Transition"]:
         """Return all transitions triggered by the given action and context."""
         return [t for t in self.transitions if t.is_triggered(action, context)]
 
 class FSM:
-    def __init__(self, initial_state: State, context: Context, keyword_searcher: keyword_searcher, ML_model, restaurant_manager: RestaurantManager, use_asr: bool = False, use_tts: bool = False, response_mode: str = "humanlike") -> None:
+    def __init__(self, initial_state: State, context: Context, keyword_searcher: keyword_searcher, ML_model, restaurant_manager: RestaurantManager, use_asr: bool = False, use_tts: bool = False, response_mode: str = "humanlike",
+                 input_channel: Optional[InputChannel] = None, output_channel: Optional[OutputChannel] = None,
+                 logger: Optional[DialogueLogger] = None) -> None:
         self.current_state = initial_state
         self.context = context
         self.keyword_searcher = keyword_searcher
@@ -83,11 +93,48 @@ class FSM:
         self.use_asr = use_asr
         self.use_tts = use_tts
         self.response_mode = response_mode
-        self.logger = DialogueLogger()
+        self.logger = logger or DialogueLogger()
+        # Where user turns come from and system turns go to (console, ASR/TTS, a network connection, a simulator)
+        self.input_channel = input_channel or (ASRInput() if use_asr else ConsoleInput())
+        self.output_channel = output_channel or ConsoleOutput(use_tts)
+        # The channels' own spans (ASR, TTS) are tagged like the FSM's
+        self.input_channel.attach(self.metric_tags)
+        self.output_channel.attach(self.metric_tags)
+
+    def metric_tags(self):
+        """(state, session) that the spans of the current turn are tagged with."""
+        return self.current_state.name, self.logger.session_id
+
+    def span(self, stage: str):
+        """Timing span for one stage of the current turn, tagged with the state and session (no-op unless metrics are enabled)."""
+        if not metrics.enabled:
+            return NOOP_SPAN
+        return metrics.span(stage, *self.metric_tags())
+
+    async def classify(self, text: str) -> str:
+        """Predicts the dialogue act of `text` without blocking the event loop."""
+        with self.span("classify"):
+            if hasattr(self.ML_model, "aclassify"):
+                # Batching service: await its batch instead of occupying a thread
+                return (await self.ML_model.aclassify(text)).label
+            return (await asyncio.to_thread(self.ML_model.predict, [text]))[0]
+
+    async def run(self):
+        """Runs the dialogue until it ends."""
+        while self.is_active:
+            await self.astep()
+
+    def run_blocking(self):
+        """
+        Synchronous adapter for callers without an event loop: runs the whole dialogue on one loop (never one per turn,
+        so Ctrl+C cancels the pending input and raises KeyboardInterrupt here).
+        """
+        asyncio.run(self.run())
 
-    def step(self):
+    async def astep(self):
 
-        string_action = self.current_state.run(self)
+        with self.span("turn"):
+            string_action = await self.current_state.arun(self)
 
         action = None
 
@@ -1,127 +1,25 @@
 import random
-import asyncio
-import time
-import wave
-import threading
-import pyaudio
-import audioop
-import os
-from faster_whisper import WhisperModel
-import edge_tts
-from rich.progress import Progress, BarColumn, TimeRemainingColumn
-from colorama import Fore, Style, init
-from playsound import playsound
+from colorama import init
 
+from dialogue_system.channels import InputChannel, OutputChannel
 from dialogue_system.finite_state_machine import FSM, State, Transition, Context, Inform, Affirm, Deny, Hello, Null,Negate
 from dialogue_system import keyword_searcher
 from dialogue_system.restaurant_manager import RestaurantManager
-from dialogue_system.reasoner import reason_about_restaurants
+from dialogue_system.reasoner import explain_inference
 from dialogue_system.types import SearchThemes
 from dialogue_system.response_templates import HUMANLIKE_TEMPLATES, SYSTEM_TEMPLATES
 
-# --- ASR and TTS Helper Functions ---
+# --- User and system turns ---
 
 init(autoreset=True)
 
-CHUNK = 1024
-FORMAT = pyaudio.paInt16
-CHANNELS = 1
-RATE = 16000
-SILENCE_THRESHOLD = 300
-SILENT_CHUNKS = 2 * (RATE // CHUNK)
-AUDIO_DIR = "audio"
+async def get_user_input(fsm: FSM) -> str:
+    with fsm.span("input"):
+        text_input = await fsm.input_channel.receive()
+    fsm.logger.log_turn("User", text_input, fsm.current_state.name)
+    return text_input
 
-asr_model = WhisperModel("base", device="cpu", compute_type="int8")
-
-VOICE = "en-US-AvaNeural"
-
-def get_user_input(fsm: FSM) -> str:
-    if not fsm.use_asr:
-        text_input = input("You: ")
-        fsm.logger.log_turn("User", text_input, fsm.current_state.name)
-        return text_input
-
-    temp_wav_file = os.path.join(AUDIO_DIR, f"temp_recording_{time.time()}.wav")
-    p = pyaudio.PyAudio()
-    stream = p.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
-
-    print(Fore.GREEN + "[Listening...]")
-    
-    frames = []
-    silent_chunks = 0
-    is_speaking = False
-    
-    while True:
-        try:
-            data = stream.read(CHUNK)
-            frames.append(data)
-            rms = audioop.rms(data, 2)
-            
-            if rms > SILENCE_THRESHOLD:
-                is_speaking = True
-                silent_chunks = 0
-            elif is_speaking:
-                silent_chunks += 1
-
-            if is_speaking and silent_chunks > SILENT_CHUNKS:
-                break
-        except IOError:
-            break
-
-    print(Fore.BLUE + "[Processing...]")
-    
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
-
-    with wave.open(temp_wav_file, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
-
-    segments, _ = asr_model.transcribe(temp_wav_file, beam_size=5)
-    os.remove(temp_wav_file)
-    transcribed_text = " ".join([segment.text for segment in segments]).strip()
-    
-    fsm.logger.log_turn("User", transcribed_text, fsm.current_state.name)
-    print(f"You: {transcribed_text}")
-    return transcribed_text
-
-async def _generate_and_play_tts(text: str):
-    temp_audio_file = os.path.join(AUDIO_DIR, f"temp_tts_{time.time()}.mp3")
-    communicate = edge_tts.Communicate(text, VOICE)
-    with open(temp_audio_file, "wb") as file:
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                file.write(chunk["data"])
-
-    words_per_minute = 150
-    words = len(text.split())
-    duration = (words / words_per_minute) * 60
-
-    playback_thread = threading.Thread(target=playsound, args=(temp_audio_file,))
-    playback_thread.start()
-
-    with Progress(
-        "[progress.description]{task.description}",
-        BarColumn(),
-        "[progress.percentage]{task.percentage:>3.0f}%",
-        TimeRemainingColumn(),
-    ) as progress:
-        task = progress.add_task("[cyan]Speaking...", total=duration)
-        start_time = time.time()
-        while playback_thread.is_alive():
-            elapsed = time.time() - start_time
-            progress.update(task, completed=min(elapsed, duration))
-            time.sleep(0.1)
-        progress.update(task, completed=duration)
-
-    playback_thread.join()
-    os.remove(temp_audio_file)
-    print()
-
-def output_system_response(fsm: FSM, template_key: str, **kwargs):
+async def output_system_response(fsm: FSM, template_key: str, **kwargs):
     if fsm.response_mode == "humanlike":
         template = HUMANLIKE_TEMPLATES.get(template_key, "Error: Template not found.")
     else:
@@ -132,51 +30,57 @@ def output_system_response(fsm: FSM, template_key: str, **kwargs):
     else:
         text = template.format(**kwargs)
 
-    print(f"System: {text}")
     fsm.logger.log_turn("System", text, fsm.current_state.name)
-    if fsm.use_tts:
-        try:
-            asyncio.run(_generate_and_play_tts(text))
-        except Exception as e:
-            print(Fore.RED + f"[TTS Error] Could not play audio: {e}")
+    with fsm.span("output"):
+        await fsm.output_channel.send(text)
 
 # --- FSM Initialization and Actions ---
 
-def initialize_fsm(keyword_searcher: keyword_searcher, ML_model, restaurant_manager: RestaurantManager, use_asr: bool, use_tts: bool, confirm_matches: bool = False, response_mode: str = "humanlike") -> FSM:
+def initialize_fsm(keyword_searcher: keyword_searcher, ML_model, restaurant_manager: RestaurantManager, use_asr: bool, use_tts: bool, confirm_matches: bool = False, response_mode: str = "humanlike", verbose_reasoning: bool = False,
+                   input_channel: InputChannel = None, output_channel: OutputChannel = None, logger=None) -> FSM:
+    """
+    Builds the dialogue FSM. Its actions are coroutines: drive it with `await fsm.run()` (or `fsm.astep()`) on an event
+    loop. Turns go through the given channels (console/ASR and console/TTS by default).
+    """
 
     def _tokenize(text: str):
         return [t for t in ''.join(ch if ch.isalnum() or ch.isspace() else ' ' for ch in text.lower()).split() if t]
 
-    def _confirm_term(fsm: FSM, attribute: str, term: str) -> bool:
-        output_system_response(fsm, "confirm_term", term=term, attribute=attribute)
-        resp = get_user_input(fsm).strip().lower()
+    async def _confirm_term(fsm: FSM, attribute: str, term: str) -> bool:
+        await output_system_response(fsm, "confirm_term", term=term, attribute=attribute)
+        resp = (await get_user_input(fsm)).strip().lower()
         return resp in ["y", "yes"]
 
-    def _process_preferences(fsm: FSM, text_input: str):
-        area_output = fsm.keyword_searcher.search(text_input, SearchThemes.area)
-        food_output = fsm.keyword_searcher.search(text_input, SearchThemes.food)
-        pricerange_output = fsm.keyword_searcher.search(text_input, SearchThemes.pricerange)
+    async def _process_preferences(fsm: FSM, text_input: str):
+        # One tokenization and automaton pass for all three slots
+        with fsm.span("slot_extraction"):
+            slots = fsm.keyword_searcher.extract_slots(text_input, (SearchThemes.area, SearchThemes.food, SearchThemes.pricerange))
+        area_output = slots.value(SearchThemes.area)
+        food_output = slots.value(SearchThemes.food)
+        pricerange_output = slots.value(SearchThemes.pricerange)
 
         if area_output:
-            if not fsm.context.restaurants_matches or _confirm_term(fsm, "area", area_output):
+            if not fsm.context.restaurants_matches or await _confirm_term(fsm, "area", area_output):
                 fsm.context.area_known = True
                 fsm.context.area = area_output
         if food_output:
-            if not fsm.context.restaurants_matches or _confirm_term(fsm, "food", food_output):
+            if not fsm.context.restaurants_matches or await _confirm_term(fsm, "food", food_output):
                 fsm.context.food_known = True
                 fsm.context.food = food_output
         if pricerange_output:
-            if not fsm.context.restaurants_matches or _confirm_term(fsm, "pricerange", pricerange_output):
+            if not fsm.context.restaurants_matches or await _confirm_term(fsm, "pricerange", pricerange_output):
                 fsm.context.pricerange_known = True
                 fsm.context.pricerange = pricerange_output
         
         return area_output, food_output, pricerange_output
     
-    def _extra_process_preferences(fsm: FSM, text_input: str):
-        touristic_output = fsm.keyword_searcher.search(text_input, SearchThemes.touristic)
-        assigned_seats_output = fsm.keyword_searcher.search(text_input, SearchThemes.assigned_seats)
-        children_output = fsm.keyword_searcher.search(text_input, SearchThemes.children)
-        romantic_output = fsm.keyword_searcher.search(text_input, SearchThemes.romantic)
+    async def _extra_process_preferences(fsm: FSM, text_input: str):
+        with fsm.span("slot_extraction"):
+            slots = fsm.keyword_searcher.extract_slots(text_input, (SearchThemes.touristic, SearchThemes.assigned_seats, SearchThemes.children, SearchThemes.romantic))
+        touristic_output = slots.value(SearchThemes.touristic)
+        assigned_seats_output = slots.value(SearchThemes.assigned_seats)
+        children_output = slots.value(SearchThemes.children)
+        romantic_output = slots.value(SearchThemes.romantic)
 
         is_touristic = None
         is_assigned_seats = None
@@ -184,80 +88,85 @@ def initialize_fsm(keyword_searcher: keyword_searcher, ML_model, restaurant_mana
         is_romantic = None
 
         if touristic_output:
-            if not fsm.context.restaurants_matches or _confirm_term(fsm, "touristic", touristic_output):
+            if not fsm.context.restaurants_matches or await _confirm_term(fsm, "touristic", touristic_output):
                 is_touristic = True
         if assigned_seats_output:
-            if not fsm.context.restaurants_matches or _confirm_term(fsm, "assigned seats", assigned_seats_output):
+            if not fsm.context.restaurants_matches or await _confirm_term(fsm, "assigned seats", assigned_seats_output):
                 is_assigned_seats = True
         if children_output:
-            if not fsm.context.restaurants_matches or _confirm_term(fsm, "children", children_output):
+            if not fsm.context.restaurants_matches or await _confirm_term(fsm, "children", children_output):
                 has_children = True
         if romantic_output:
-            if not fsm.context.restaurants_matches or _confirm_term(fsm, "romantic", romantic_output):
+            if not fsm.context.restaurants_matches or await _confirm_term(fsm, "romantic", romantic_output):
                 is_romantic = True
         return is_touristic, is_assigned_seats, has_children, is_romantic
 
-    def welcome_action(fsm: FSM):
-        output_system_response(fsm, "welcome")
-        text = get_user_input(fsm)
-        _process_preferences(fsm, text)
-        return fsm.ML_model.predict([text])[0]
+    async def welcome_action(fsm: FSM):
+        await output_system_response(fsm, "welcome")
+        text = await get_user_input(fsm)
+        await _process_preferences(fsm, text)
+        return await fsm.classify(text)
 
-    def ask_area_action(fsm: FSM):
+    async def ask_area_action(fsm: FSM):
         valid_options = fsm.restaurant_manager.get_labels('area')
-        output_system_response(fsm, "ask_area")
+        await output_system_response(fsm, "ask_area")
         while True:
-            text_input = get_user_input(fsm)
-            area_found, _, _ = _process_preferences(fsm, text_input)
+            text_input = await get_user_input(fsm)
+            area_found, _, _ = await _process_preferences(fsm, text_input)
             if area_found:
                 break
             else:
-                output_system_response(fsm, "ask_area_invalid", hint_options=', '.join([opt for opt in valid_options if opt]))
+                await output_system_response(fsm, "ask_area_invalid", hint_options=', '.join([opt for opt in valid_options if opt]))
 
-        return fsm.ML_model.predict([text_input])[0]
+        return await fsm.classify(text_input)
 
-    def ask_food_action(fsm: FSM): 
-        output_system_response(fsm, "ask_food")
-        text_input = get_user_input(fsm)
-        _, food_found, _ = _process_preferences(fsm, text_input)
+    async def ask_food_action(fsm: FSM): 
+        await output_system_response(fsm, "ask_food")
+        text_input = await get_user_input(fsm)
+        _, food_found, _ = await _process_preferences(fsm, text_input)
 
         if not food_found:
-            output_system_response(fsm, "ask_food_invalid")
+            await output_system_response(fsm, "ask_food_invalid")
 
-        return fsm.ML_model.predict([text_input])[0]
+        return await fsm.classify(text_input)
 
-    def ask_pricerange_action(fsm: FSM):
+    async def ask_pricerange_action(fsm: FSM):
         valid_options = fsm.restaurant_manager.get_labels('pricerange')
-        output_system_response(fsm, "ask_pricerange")
-        text_input = get_user_input(fsm)
-        _, _, pricerange_found = _process_preferences(fsm, text_input)
+        await output_system_response(fsm, "ask_pricerange")
+        text_input = await get_user_input(fsm)
+        _, _, pricerange_found = await _process_preferences(fsm, text_input)
 
         if not pricerange_found:
-            output_system_response(fsm, "ask_pricerange_invalid", hint_options=', '.join([opt for opt in valid_options if opt]))
+            await output_system_response(fsm, "ask_pricerange_invalid", hint_options=', '.join([opt for opt in valid_options if opt]))
 
-        return fsm.ML_model.predict([text_input])[0]
+        return await fsm.classify(text_input)
 
-    def suggest_restaurant_action(fsm: FSM):
+    async def suggest_restaurant_action(fsm: FSM):
         if not fsm.context.restaurants_matches:
-            output_system_response(fsm, "no_results")
+            await output_system_response(fsm, "no_results")
             return "none" 
 
         suggestion = random.choice(fsm.context.restaurants_matches)
         fsm.context.restaurants_matches = [r for r in fsm.context.restaurants_matches if r != suggestion]
 
-        output_system_response(fsm, "suggest_restaurant", name=suggestion.name, area=suggestion.area, food=suggestion.food, pricerange=suggestion.pricerange)
+        await output_system_response(fsm, "suggest_restaurant", name=suggestion.name, area=suggestion.area, food=suggestion.food, pricerange=suggestion.pricerange)
+        if fsm.context.extra_preferences:
+            # Explanations are only built for the restaurant that is actually suggested
+            _, reasoning = explain_inference(suggestion, **fsm.context.extra_preferences)
+            if reasoning:
+                await output_system_response(fsm, "suggestion_reasoning", reasoning=" ".join(reasoning))
         return "inform"
     
-    def ask_conformation_action(fsm: FSM): 
-        output_system_response(fsm, "ask_conformation")
-        text_input = get_user_input(fsm)
-        action = fsm.ML_model.predict([text_input])[0]
+    async def ask_conformation_action(fsm: FSM): 
+        await output_system_response(fsm, "ask_conformation")
+        text_input = await get_user_input(fsm)
+        action = await fsm.classify(text_input)
         return action
     
-    def ask_part_incorrect_action(fsm: FSM): 
-        output_system_response(fsm, "ask_part_incorrect")
-        text_input = get_user_input(fsm)
-        action = fsm.ML_model.predict([text_input])[0]
+    async def ask_part_incorrect_action(fsm: FSM): 
+        await output_system_response(fsm, "ask_part_incorrect")
+        text_input = await get_user_input(fsm)
+        action = await fsm.classify(text_input)
 
         if "area" in text_input.lower():
             fsm.context.incorrect_part = "area"
@@ -269,7 +178,7 @@ def initialize_fsm(keyword_searcher: keyword_searcher, ML_model, restaurant_mana
             fsm.context.incorrect_part = "all"
         return action
     
-    def ask_preference_action(fsm: FSM): 
+    async def ask_preference_action(fsm: FSM): 
         fsm.context.area_known = False
         fsm.context.food_known = False
         fsm.context.pricerange_known = False
@@ -278,51 +187,54 @@ def initialize_fsm(keyword_searcher: keyword_searcher, ML_model, restaurant_mana
         fsm.context.pricerange = None
         fsm.context.incorrect_part = None
     
-        output_system_response(fsm, "ask_preference_again")
-        text_input = get_user_input(fsm)
-        _process_preferences(fsm, text_input)
-        return fsm.ML_model.predict([text_input])[0]
+        await output_system_response(fsm, "ask_preference_again")
+        text_input = await get_user_input(fsm)
+        await _process_preferences(fsm, text_input)
+        return await fsm.classify(text_input)
 
-    def bye_action(fsm: FSM): 
-        output_system_response(fsm, "bye")
+    async def bye_action(fsm: FSM): 
+        await output_system_response(fsm, "bye")
         fsm.is_active = False
         return "bye"
     
-    def show_possible_restaurants_action(fsm: FSM):
-        matches = fsm.restaurant_manager.find_restaurants(
-            area=fsm.context.area,
-            pricerange=fsm.context.pricerange,
-            food=fsm.context.food
-        )
+    async def show_possible_restaurants_action(fsm: FSM):
+        with fsm.span("find_restaurants"):
+            matches = fsm.restaurant_manager.find_restaurants(
+                area=fsm.context.area,
+                pricerange=fsm.context.pricerange,
+                food=fsm.context.food
+            )
 
         fsm.context.restaurants_matches = matches
+        fsm.context.extra_preferences = {}
 
         if not matches:
-            output_system_response(fsm, "no_results")
+            await output_system_response(fsm, "no_results")
             return "none" 
         else:
-            output_system_response(fsm, "show_possible_restaurants_count", count=len(matches))
+            await output_system_response(fsm, "show_possible_restaurants_count", count=len(matches))
             for r in matches:
-                output_system_response(fsm, "show_restaurant_details", name=r.name, food=r.food, pricerange=r.pricerange, area=r.area)
+                await output_system_response(fsm, "show_restaurant_details", name=r.name, food=r.food, pricerange=r.pricerange, area=r.area)
 
         return "inform"     
     
-    def ask_extra_preference_action(fsm: FSM):
-        output_system_response(fsm, "ask_extra_preference")
-        text_input = get_user_input(fsm)
+    async def ask_extra_preference_action(fsm: FSM):
+        await output_system_response(fsm, "ask_extra_preference")
+        text_input = await get_user_input(fsm)
 
-        is_touristic, is_assigned_seats, has_children, is_romantic = _extra_process_preferences(fsm, text_input)
+        is_touristic, is_assigned_seats, has_children, is_romantic = await _extra_process_preferences(fsm, text_input)
 
         if not any([is_touristic, is_assigned_seats, has_children, is_romantic]):
             return "affirm"
 
-        fsm.context.restaurants_matches = reason_about_restaurants(
-            fsm.context.restaurants_matches,
-            touristic=is_touristic,
-            assigned_seats=is_assigned_seats,
-            children=has_children,
-            romantic=is_romantic
-        )
+        fsm.context.extra_preferences = dict(touristic=is_touristic, assigned_seats=is_assigned_seats,
+                                             children=has_children, romantic=is_romantic)
+        with fsm.span("reasoning"):
+            fsm.context.restaurants_matches = fsm.restaurant_manager.reasoner.reason(
+                fsm.context.restaurants_matches,
+                verbose=verbose_reasoning,
+                **fsm.context.extra_preferences
+            )
 
         return "inform"
 
@@ -377,7 +289,6 @@ def initialize_fsm(keyword_searcher: keyword_searcher, ML_model, restaurant_mana
     ask_preference.add_transition(Transition(ask_area, lambda a, c: isinstance(a, (Inform, Hello, Null)) and not c.area_known))
 
     def no_matches_condition(a, c):
-        print(f"{len(c.restaurants_matches)} restaurants match the preferences.")
         return len(c.restaurants_matches) == 0
 
     ask_extra_preference.add_transition(
@@ -401,7 +312,8 @@ def initialize_fsm(keyword_searcher: keyword_searcher, ML_model, restaurant_mana
     suggest_restaurant.add_transition(Transition(ask_preference, lambda a, c: isinstance(a, Null)))
 
     ctx = Context()
-    fsm = FSM(welcome, ctx, keyword_searcher, ML_model, restaurant_manager, use_asr=use_asr, use_tts=use_tts, response_mode=response_mode)
+    fsm = FSM(welcome, ctx, keyword_searcher, ML_model, restaurant_manager, use_asr=use_asr, use_tts=use_tts, response_mode=response_mode,
+              input_channel=input_channel, output_channel=output_channel, logger=logger)
     fsm.confirm_matches = bool(confirm_matches)
 
     return fsm
@@ -0,0 +1,68 @@
+from functools import lru_cache
+
+import Levenshtein
+
+
+class FuzzyIndex:
+    """
+    BK-tree over a list of domain terms for finding the term closest to a word by Levenshtein distance
+    (case-insensitive) without comparing the word to every term. The triangle inequality lets a query skip every
+    subtree whose distance to the current node differs from the word's distance by more than the search radius.
+
+    Results of closest() are memoized in a bounded LRU cache, so the index can be shared by all dialogue sessions.
+    """
+    def __init__(self, terms, max_distance=3, memo_size=4096):
+        self.terms = list(terms)
+        self.max_distance = max_distance
+        self._root = None
+        # Node: [lowercased term, position of its first occurrence in terms, {distance: child node}]
+        for position, term in enumerate(self.terms):
+            self._add(term.lower(), position)
+        self.closest = lru_cache(maxsize=memo_size)(self._closest)
+
+    def _add(self, key, position):
+        if self._root is None:
+            self._root = [key, position, {}]
+            return
+        node = self._root
+        while True:
+            distance = Levenshtein.distance(key, node[0])
+            if distance == 0:
+                # Same term in a different case, the first occurrence wins
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, position, {}]
+                return
+            node = child
+
+    def _closest(self, word):
+        """
+        Returns (term, distance) of the term closest to `word` within max_distance, or None.
+        On ties the term that comes first in the domain list wins.
+        """
+        if self._root is None:
+            return None
+        word = word.lower()
+        best = None  # (distance, position)
+        radius = self.max_distance
+        stack = [self._root]
+        while stack:
+            key, position, children = stack.pop()
+            # Distances beyond the largest child edge + radius cannot lead anywhere, so the computation may stop there
+            cutoff = radius + (max(children) if children else 0)
+            distance = Levenshtein.distance(word, key, score_cutoff=cutoff)
+            if distance <= radius and (best is None or (distance, position) < best):
+                best = (distance, position)
+                radius = distance
+                if distance == 0:
+                    break
+            if distance > cutoff:
+                continue
+            # Visit the children closest to the node's distance first, they are the most likely to shrink the radius
+            for child_distance in sorted(children, key=lambda d: -abs(d - distance)):
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(children[child_distance])
+        if best is None:
+            return None
+        return self.terms[best[1]], best[0]
@@ -1,7 +1,9 @@
 import re
-import Levenshtein
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import math
+from collections import Counter
+from sklearn.feature_extraction.text import CountVectorizer
+from dialogue_system.fuzzy_index import FuzzyIndex
+from dialogue_system.slot_extractor import SlotExtractor
 from dialogue_system.types import SearchThemes
 
 def preprocess(text): 
@@ -10,26 +12,82 @@ def preprocess(text):
     tokens = text.split() 
     return tokens
 
-def tfidf_ranking(utterance, domain_list):
-    vectorizer = TfidfVectorizer()
-    corpus = domain_list + [utterance]
-    tfidf_matrix = vectorizer.fit_transform(corpus)
+class TfidfIndex:
+    """
+    TF-IDF cosine similarity between an utterance and one list of domain terms, precompiled once instead of
+    fitting a TfidfVectorizer on the terms + [utterance] for every query.
 
-    sims = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1])
+    In that fit the utterance only changes the document frequency (and thus the IDF) of its own terms. The index
+    keeps the term counts, document frequencies and squared norms of the domain terms and, per query, corrects the
+    norms of the few domain terms that share a token with it; the query norm includes its out-of-vocabulary tokens.
+    The scores are the same as the per-query fit's (tests/test_keyword_searcher.py compares them).
+    """
+    def __init__(self, terms):
+        self.terms = list(terms)
+        counter = CountVectorizer()
+        self._analyzer = counter.build_analyzer()
+        try:
+            counts = counter.fit_transform(self.terms)
+        except ValueError:
+            # None of the terms has a token TF-IDF would use
+            counts = None
 
-    ranked = sorted(zip(domain_list, sims[0]), key=lambda x: x[1], reverse=True)
-    return ranked
+        # n documents = the domain terms plus the query, smoothed IDF like TfidfVectorizer: ln((1 + n) / (1 + df)) + 1
+        self._numerator = len(self.terms) + 2
+        self._vocabulary = counter.vocabulary_ if counts is not None else {}
+        self._document_frequencies = {}
+        self._postings = {}  # token column -> [(term row, count)]
+        self._squared_norms = [0.0] * len(self.terms)
+        if counts is not None:
+            counts = counts.tocsc()
+            for column in range(counts.shape[1]):
+                start, end = counts.indptr[column], counts.indptr[column + 1]
+                self._postings[column] = list(zip(counts.indices[start:end].tolist(), counts.data[start:end].tolist()))
+                self._document_frequencies[column] = end - start
+                idf = self._idf(end - start)
+                for row, count in self._postings[column]:
+                    self._squared_norms[row] += (count * idf) ** 2
+        self._oov_idf = self._idf(0, in_query=True)
+
+    def _idf(self, document_frequency, in_query=False):
+        return math.log(self._numerator / (document_frequency + in_query + 1)) + 1
+
+    def best_match(self, utterance):
+        """(term, score) of the domain term most similar to the utterance (the first one on ties), None if there are no terms."""
+        return self.best_match_counts(Counter(self._analyzer(utterance)))
+
+    def best_match_counts(self, token_counts):
+        """best_match for an utterance that is already analyzed into token counts (shared by several indexes)."""
+        if not self.terms:
+            return None
+
+        dots = {}
+        norm_corrections = {}
+        query_squared_norm = 0.0
+        for token, count in token_counts.items():
+            column = self._vocabulary.get(token)
+            if column is None:
+                query_squared_norm += (count * self._oov_idf) ** 2
+                continue
+            base_idf = self._idf(self._document_frequencies[column])
+            idf = self._idf(self._document_frequencies[column], in_query=True)
+            query_weight = count * idf
+            query_squared_norm += query_weight ** 2
+            for row, term_count in self._postings[column]:
+                dots[row] = dots.get(row, 0.0) + term_count * idf * query_weight
+                norm_corrections[row] = norm_corrections.get(row, 0.0) + term_count ** 2 * (idf ** 2 - base_idf ** 2)
+
+        best_row, best_score = 0, 0.0
+        for row in sorted(dots):
+            norm = math.sqrt(self._squared_norms[row] + norm_corrections[row])
+            score = dots[row] / (norm * math.sqrt(query_squared_norm))
+            if score > best_score:
+                best_row, best_score = row, score
+        return self.terms[best_row], best_score
 
 class RestaurantSearcher:
     def __init__(self, restaurant_manager):
         self.restaurant_manager = restaurant_manager
-        self.unique_pricerange = None
-        self.unique_area = None
-        self.unique_food = None
-        self.unique_touristic = None
-        self.unique_assigned_seats = None
-        self.unique_children = None
-        self.unique_romantic = None
         self.keywords = {
             SearchThemes.food: ["food", "restaurant", "serves"],
             SearchThemes.area: ["area", "part", "region", "side"],
@@ -39,92 +97,47 @@ class RestaurantSearcher:
             SearchThemes.children: ["children", "kids", "child", "family"], 
             SearchThemes.romantic: ["romantic", "romance", "couple", "date"],
         }
+        # Precompiled fuzzy (Levenshtein) and TF-IDF fallback indexes per attribute, rebuilt only when its domain terms change
+        self._fuzzy_indexes = {}
+        self._tfidf_indexes = {}
+        self._slot_extractor = None
+        self.slot_extractor()
+
+    def _domain_list(self, attribute):
+        if attribute in [SearchThemes.pricerange, SearchThemes.area, SearchThemes.food]:
+            return self.restaurant_manager.get_labels(attribute.value)
+        # The other themes are matched against the words of their own name (e.g. 'assigned seats')
+        return attribute.value.split()
+
+    def _get_index(self, indexes, index_class, attribute, domain_list):
+        index = indexes.get(attribute)
+        if index is None or index.terms != domain_list:
+            index = indexes[attribute] = index_class(domain_list)
+        return index
+
+    def _fuzzy_index(self, attribute, domain_list):
+        return self._get_index(self._fuzzy_indexes, FuzzyIndex, attribute, domain_list)
+
+    def _tfidf_index(self, attribute, domain_list):
+        return self._get_index(self._tfidf_indexes, TfidfIndex, attribute, domain_list)
+
+    def slot_extractor(self):
+        """The single-pass slot extractor over all attributes, rebuilt when a domain list changes."""
+        domains = {attribute: self._domain_list(attribute) for attribute in SearchThemes}
+        if self._slot_extractor is None or self._slot_extractor.domains != domains:
+            self._slot_extractor = SlotExtractor(
+                domains, self.keywords,
+                {attribute: self._fuzzy_index(attribute, terms) for attribute, terms in domains.items()},
+                {attribute: self._tfidf_index(attribute, terms) for attribute, terms in domains.items()},
+                preprocess)
+        return self._slot_extractor
+
+    def extract_slots(self, utterance, attributes=tuple(SearchThemes), window_size=2):
+        """Values of several attributes from one tokenization and automaton pass over the utterance (see SlotExtractor)."""
+        return self.slot_extractor().extract(utterance, attributes, window_size)
 
     def search(self, utterance, attribute, window_size=2):
         if attribute not in [SearchThemes.pricerange, SearchThemes.area, SearchThemes.food, SearchThemes.touristic, SearchThemes.assigned_seats, SearchThemes.children, SearchThemes.romantic]:
             raise ValueError("Attribute must be one of 'pricerange', 'area', or 'food', 'touristic', 'assigned_seats', 'children', 'romantic'.")
 
-        tokens = preprocess(utterance)
-
-        domain_list = []
-
-        if attribute in [SearchThemes.pricerange, SearchThemes.area, SearchThemes.food]:
-            domain_list = self.restaurant_manager.get_labels(attribute.value)
-        else:
-            if attribute == SearchThemes.touristic:
-                domain_list = SearchThemes.touristic.value.split()
-            elif attribute == SearchThemes.assigned_seats:
-                domain_list = SearchThemes.assigned_seats.value.split()
-            elif attribute == SearchThemes.children:
-                domain_list = SearchThemes.children.value.split()
-            elif attribute == SearchThemes.romantic:
-                domain_list = SearchThemes.romantic.value.split()
-
-        for token in tokens:
-            lower_domain_list = [d.lower() for d in domain_list]
-            if token.lower() in lower_domain_list:
-                if attribute == SearchThemes.food:
-                    self.unique_food = token
-                elif attribute == SearchThemes.area:
-                    self.unique_area = token
-                elif attribute == SearchThemes.pricerange:
-                    self.unique_pricerange = token
-                return token
-
-        context_words = set()
-        for i, token in enumerate(tokens):
-            if token in self.keywords[attribute]:
-                start = max(i - window_size, 0)
-                end = min(i + window_size + 1, len(tokens))
-                for j in range(start, end):
-                    if i != j:
-                        context_words.add(tokens[j])
-
-        best_match = None
-        min_distance = float("inf")
-
-        for context_word in context_words:
-            for term in domain_list:
-                distance = Levenshtein.distance(context_word.lower(), term.lower())
-                if distance < min_distance:
-                    min_distance = distance
-                    best_match = term
-
-        if best_match and min_distance <= 3:
-            if attribute == SearchThemes.food:
-                self.unique_food = best_match
-            elif attribute == SearchThemes.area:
-                self.unique_area = best_match
-            elif attribute == SearchThemes.pricerange:
-                self.unique_pricerange = best_match
-            elif attribute == SearchThemes.touristic:
-                self.unique_touristic = best_match
-            elif attribute == SearchThemes.assigned_seats:
-                self.unique_assigned_seats = best_match
-            elif attribute == SearchThemes.children:
-                self.unique_children = best_match
-            elif attribute == SearchThemes.romantic:
-                self.unique_romantic = best_match
-            return best_match
-
-        ranked = tfidf_ranking(utterance.lower(), domain_list)
-        if ranked:
-            top_term, score = ranked[0]
-            if score >= 0.5:
-                if attribute == SearchThemes.food:
-                    self.unique_food = top_term
-                elif attribute == SearchThemes.area:
-                    self.unique_area = top_term
-                elif attribute == SearchThemes.pricerange:
-                    self.unique_pricerange = top_term
-                elif attribute == SearchThemes.touristic:
-                    self.unique_touristic = top_term
-                elif attribute == SearchThemes.assigned_seats:
-                    self.unique_assigned_seats = top_term
-                elif attribute == SearchThemes.children:
-                    self.unique_children = top_term
-                elif attribute == SearchThemes.romantic:
-                    self.unique_romantic = top_term
-                return top_term
-            
-        return None
+        return self.extract_slots(utterance, (attribute,), window_size).value(attribute)
@@ -1,5 +1,8 @@
+import numpy as np
+
 from dialogue_system.types import InferenceTypes, ConsequenceTypes
-from dialogue_system.restaurant import Restaurant 
+from dialogue_system.restaurant import Restaurant
+from dialogue_system.restaurant_store import RestaurantStore
 
 
 def apply_inference(restaurant: Restaurant, touristic=None, assigned_seats=None, children=None, romantic=None):
@@ -39,52 +42,116 @@ def apply_inference(restaurant: Restaurant, touristic=None, assigned_seats=None,
     return inferred, contradictions
 
 
+def explain_inference(restaurant: Restaurant, touristic=None, assigned_seats=None, children=None, romantic=None):
+    """Returns (is_recommended, reasoning lines) for one restaurant, e.g. the one that is shown to the user."""
+    inferred, contradictions = apply_inference(restaurant, touristic, assigned_seats, children, romantic)
+    reasoning = []
+
+    is_recommended = True
+
+    if inferred.get(ConsequenceTypes.touristic) == True:
+        reasoning.append("It is cheap and has good food, so it attracts tourists.")
+    elif inferred.get(ConsequenceTypes.touristic) == False:
+        reasoning.append("The food is Romanian, so it is not touristic.")
+        is_recommended = False
+    if inferred.get(ConsequenceTypes.assigned_seats) == True:
+        reasoning.append("It is usually busy, so the waiter assigns seats.")
+
+    if inferred.get(ConsequenceTypes.romantic) == True:
+        reasoning.append("Guests tend to stay long, which makes it romantic.")
+    elif inferred.get(ConsequenceTypes.romantic) == False:
+        reasoning.append("It is busy, so it is not romantic.")
+        is_recommended = False
+
+    if inferred.get(ConsequenceTypes.children) == False:
+        reasoning.append("Long stays make it less suitable for children.")
+        is_recommended = False
+
+    if contradictions:
+        reasoning.append("Contradictions found: " + "; ".join(contradictions.values()))
+        is_recommended = False
+    return is_recommended, reasoning
+
+
+def print_inference(restaurant: Restaurant, touristic=None, assigned_seats=None, children=None, romantic=None):
+    is_recommended, reasoning = explain_inference(restaurant, touristic, assigned_seats, children, romantic)
+    if not is_recommended:
+        print(f"Not recommended: {restaurant.name}")
+    elif reasoning:
+        print(f"Recommended: {restaurant.name}")
+    else:
+        print(f"Recommended (no inferences): {restaurant.name}")
+    print("Reasoning:")
+    for r in reasoning:
+        print(f"- {r}")
+    print("\n" + "-"*40 + "\n")
+
+
+class RestaurantReasoner:
+    """
+    The rules of apply_inference evaluated once for every row of a RestaurantStore. Their inputs (price range, food,
+    food quality, crowdedness, length of stay) are fixed per restaurant, so per consequence the store gets a column
+    with the inferred value (1 = True, -1 = False, 0 = nothing inferred) and a column with the contradiction flags.
+    Reasoning about a set of candidates is then a mask lookup; explanations are only built on request.
+    """
+    def __init__(self, store: RestaurantStore):
+        self.store = store
+        cheap_good_food = (store.mask("pricerange", [InferenceTypes.cheap.value]) &
+                           store.mask("food_quality", [InferenceTypes.good_food.value]))
+        romanian = store.mask("food", [InferenceTypes.romanian.value])
+        busy = store.mask("crowdedness", [InferenceTypes.busy.value])
+        long_stay = store.mask("length_of_stay", [InferenceTypes.long_stay.value, "long"])
+
+        no_contradiction = np.zeros(len(store), dtype=bool)
+        # Later rules override earlier ones, like in apply_inference
+        self.inferred = {
+            ConsequenceTypes.touristic: np.where(romanian, -1, np.where(cheap_good_food, 1, 0)).astype(np.int8),
+            ConsequenceTypes.assigned_seats: busy.astype(np.int8),
+            ConsequenceTypes.children: -long_stay.astype(np.int8),
+            ConsequenceTypes.romantic: np.where(long_stay, 1, np.where(busy, -1, 0)).astype(np.int8),
+        }
+        self.contradictions = {
+            ConsequenceTypes.touristic: cheap_good_food & romanian,
+            ConsequenceTypes.assigned_seats: no_contradiction,
+            ConsequenceTypes.children: no_contradiction,
+            ConsequenceTypes.romantic: busy & long_stay,
+        }
+        # Rows that are not recommended when the user asks for a consequence
+        self.rejected = {consequence: (self.inferred[consequence] == -1) | self.contradictions[consequence]
+                         for consequence in ConsequenceTypes}
+
+    def recommended_mask(self, rows, touristic=None, assigned_seats=None, children=None, romantic=None):
+        """Boolean mask over `rows` of the restaurants that are recommended for the requested consequences."""
+        keep = np.ones(len(rows), dtype=bool)
+        for consequence, requested in ((ConsequenceTypes.touristic, touristic), (ConsequenceTypes.assigned_seats, assigned_seats),
+                                       (ConsequenceTypes.children, children), (ConsequenceTypes.romantic, romantic)):
+            if requested is not None:
+                keep &= ~self.rejected[consequence][rows]
+        return keep
+
+    def reason(self, candidates: list[Restaurant], touristic=None, assigned_seats=None, children=None, romantic=None, verbose=False):
+        """The recommended candidates (in their order); verbose=True prints the reasoning for every candidate."""
+        rows = self.store.rows_of(candidates)
+        keep = self.recommended_mask(rows, touristic, assigned_seats, children, romantic)
+        if verbose:
+            for restaurant in candidates:
+                print_inference(restaurant, touristic, assigned_seats, children, romantic)
+        return [candidates[i] for i in np.flatnonzero(keep)]
+
+
 def reason_about_restaurants(
     candidates: list[Restaurant],
     touristic=None,
     assigned_seats=None,
     children=None,
-    romantic=None
+    romantic=None,
+    reasoner: RestaurantReasoner = None,
+    verbose=False
 ):
-    possible_recommendations = []
-    for restaurant in candidates:
-        inferred, contradictions = apply_inference(restaurant, touristic, assigned_seats, children, romantic)
-        reasoning = []
-
-        is_recommended = True
-
-        if inferred.get(ConsequenceTypes.touristic) == True:
-            reasoning.append("It is cheap and has good food, so it attracts tourists.")
-        elif inferred.get(ConsequenceTypes.touristic) == False:
-            reasoning.append("The food is Romanian, so it is not touristic.")
-            is_recommended = False
-        if inferred.get(ConsequenceTypes.assigned_seats) == True:
-            reasoning.append("It is usually busy, so the waiter assigns seats.")
-
-        if inferred.get(ConsequenceTypes.romantic) == True:
-            reasoning.append("Guests tend to stay long, which makes it romantic.")
-        elif inferred.get(ConsequenceTypes.romantic) == False:
-            reasoning.append("It is busy, so it is not romantic.")
-            is_recommended = False
-
-        if inferred.get(ConsequenceTypes.children) == False:
-            reasoning.append("Long stays make it less suitable for children.")
-            is_recommended = False
-
-        if contradictions:
-            reasoning.append("Contradictions found: " + "; ".join(contradictions.values()))
-            print(f"Not recommended: {restaurant.name}")
-        elif not is_recommended:
-            print(f"Not recommended: {restaurant.name}")
-        else:
-            if inferred:
-                print(f"Recommended: {restaurant.name}")
-            else:
-                print(f"Recommended (no inferences): {restaurant.name}")
-        print("Reasoning:")
-        for r in reasoning:
-            print(f"- {r}")
-            possible_recommendations.append(restaurant)
-        print("\n" + "-"*40 + "\n")
-    return possible_recommendations
-
+    """
+    Returns the candidates that are recommended for the requested consequences. Pass the reasoner of the restaurant
+    database the candidates come from (RestaurantManager.reasoner) to use its precomputed columns.
+    """
+    if reasoner is None:
+        reasoner = RestaurantReasoner(RestaurantStore.from_restaurants(candidates))
+    return reasoner.reason(candidates, touristic, assigned_seats, children, romantic, verbose)
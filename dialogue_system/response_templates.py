@@ -31,7 +31,8 @@ HUMANLIKE_TEMPLATES = {
     "show_possible_restaurants_count": "Okay, I found {count} restaurants that match what you're looking for:",
     "show_restaurant_details": "- There's {name}, which serves {food} food in the {pricerange} price range in the {area} area.",
     "ask_extra_preference": "Before I make a final suggestion, do you have any other requirements? For example, are you looking for a place that is touristic, romantic, good for children, or has assigned seating?",
-    "confirm_term": "Just to be sure, did you mean '{term}' for {attribute}?"
+    "confirm_term": "Just to be sure, did you mean '{term}' for {attribute}?",
+    "suggestion_reasoning": "Here's why I think it fits: {reasoning}"
 }
 
 SYSTEM_TEMPLATES = {
@@ -51,5 +52,6 @@ SYSTEM_TEMPLATES = {
     "show_possible_restaurants_count": "Query returned {count} results:",
     "show_restaurant_details": "- Restaurant: {name}. Attributes: food={food}, pricerange={pricerange}, area={area}.",
     "ask_extra_preference": "Specify additional preferences from the available options: touristic, assigned seats, romantic, children.",
-    "confirm_term": "Confirm {attribute}: '{term}'? (yes/no)"
+    "confirm_term": "Confirm {attribute}: '{term}'? (yes/no)",
+    "suggestion_reasoning": "Reasoning: {reasoning}"
 }
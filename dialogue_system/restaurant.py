@@ -1,18 +1,54 @@
-import random
+import hashlib
+import sys
+
+# Possible values of the attributes that are not in the restaurant database
+FOOD_QUALITY_VALUES = ("poor", "average", "good")
+CROWDEDNESS_VALUES = ("empty", "moderate", "busy")
+LENGTH_OF_STAY_VALUES = ("short", "medium", "long")
+
+# Seed of the hash the synthetic attributes are derived from; changing it gives every restaurant new values
+SYNTHETIC_SEED = 0
+
+
+def synthetic_codes(name, seed=SYNTHETIC_SEED):
+    """
+    Indexes into FOOD_QUALITY_VALUES, CROWDEDNESS_VALUES and LENGTH_OF_STAY_VALUES for a restaurant, derived from a
+    seeded hash of its name, so every process (and every run) assigns the same values to the same restaurant.
+    """
+    digest = hashlib.blake2b((name or "").encode("utf-8"), digest_size=8, key=seed.to_bytes(8, "little")).digest()
+    value = int.from_bytes(digest, "little")
+    return (value % len(FOOD_QUALITY_VALUES),
+            value // len(FOOD_QUALITY_VALUES) % len(CROWDEDNESS_VALUES),
+            value // (len(FOOD_QUALITY_VALUES) * len(CROWDEDNESS_VALUES)) % len(LENGTH_OF_STAY_VALUES))
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
 
 class Restaurant:
-    def __init__(self, name, pricerange, area, food, phone, addr, postcode):
+    # No per-instance __dict__; the categorical strings are interned, so all restaurants share one copy of each label
+    __slots__ = ("name", "pricerange", "area", "food", "phone", "addr", "postcode",
+                 "food_quality", "crowdedness", "length_of_stay")
+
+    def __init__(self, name, pricerange, area, food, phone, addr, postcode, food_quality=None, crowdedness=None, length_of_stay=None):
         self.name = name
-        self.pricerange = pricerange
-        self.area = area
-        self.food = food
+        self.pricerange = _intern(pricerange)
+        self.area = _intern(area)
+        self.food = _intern(food)
         self.phone = phone
         self.addr = addr
         self.postcode = postcode
 
-        self.food_quality = random.choice(["poor", "average", "good"])
-        self.crowdedness = random.choice(["empty", "moderate", "busy"])
-        self.length_of_stay = random.choice(["short", "medium", "long"])
+        # Derived from the name unless given (e.g. by the restaurant store, which keeps them in its columns)
+        if food_quality is None or crowdedness is None or length_of_stay is None:
+            quality_code, crowdedness_code, stay_code = synthetic_codes(name)
+            food_quality = FOOD_QUALITY_VALUES[quality_code] if food_quality is None else food_quality
+            crowdedness = CROWDEDNESS_VALUES[crowdedness_code] if crowdedness is None else crowdedness
+            length_of_stay = LENGTH_OF_STAY_VALUES[stay_code] if length_of_stay is None else length_of_stay
+        self.food_quality = _intern(food_quality)
+        self.crowdedness = _intern(crowdedness)
+        self.length_of_stay = _intern(length_of_stay)
 
     def __repr__(self):
-        return f"<Restaurant {self.name} ({self.food}, {self.area}, {self.pricerange})>"
\ No newline at end of file
+        return f"<Restaurant {self.name} ({self.food}, {self.area}, {self.pricerange})>"
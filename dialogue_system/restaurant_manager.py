@@ -1,19 +1,42 @@
 from __future__ import annotations
+import numpy as np
+from dialogue_system.reasoner import RestaurantReasoner
 from dialogue_system.restaurant import Restaurant
+from dialogue_system.restaurant_store import RestaurantStore
 from dialogue_system.types import SearchThemes
 
+# Attributes that can be searched on, each backed by an inverted index
+INDEXED_ATTRIBUTES = (SearchThemes.area.value, SearchThemes.pricerange.value, SearchThemes.food.value)
+
+
+def _as_values(value):
+    """Normalizes a constraint to a tuple of case-folded values (a str or an iterable of str). None/'any' means no constraint."""
+    if value is None:
+        return ()
+    values = (value,) if isinstance(value, str) else tuple(value)
+    values = tuple(v.casefold() for v in values if v)
+    return () if "any" in values else values
+
 
 class RestaurantManager:
     def __init__(self, restaurants):
-        self.restaurants = restaurants
+        # Accepts a RestaurantStore or a list of Restaurant objects
+        self.store = restaurants if isinstance(restaurants, RestaurantStore) else RestaurantStore.from_restaurants(restaurants)
         self.unique_priceranges = self._get_unique(SearchThemes.pricerange.value)
         self.unique_areas = self._get_unique(SearchThemes.area.value)
         self.unique_foods = self._get_unique(SearchThemes.food.value)
+        # Inferred attributes (touristic, romantic, ...) of every restaurant, computed once
+        self.reasoner = RestaurantReasoner(self.store)
+
+    @property
+    def restaurants(self):
+        """All restaurants as Restaurant objects (created on demand, prefer find_restaurants for large databases)."""
+        return self.store.restaurants()
 
     def _get_unique(self, attribute):
         """Helper method to get unique values for a given Restaurant attribute"""
-        return sorted(list({getattr(r, attribute) for r in self.restaurants}))
-    
+        return self.store.unique_labels(attribute)
+
     def get_labels(self,label):
         if label == SearchThemes.pricerange.value:
             return self.unique_priceranges
@@ -24,7 +47,7 @@ class RestaurantManager:
         else:
             raise ValueError("Label must be one of 'pricerange', 'area', or 'food'.")
 
-    def find_restaurants(self, area: str = None, pricerange: str = None, food: str = None) -> list[Restaurant]:
+    def find_restaurants(self, area: str = None, pricerange: str = None, food: str = None, exclude: dict = None) -> list[Restaurant]:
         """
         Filters the list of restaurants based on specified criteria.
 
@@ -32,23 +55,39 @@ class RestaurantManager:
             area: The desired area.
             pricerange: The desired price range.
             food: The desired food type.
+            exclude: Optional negated constraints, e.g. {"food": "chinese"} or {"area": ["north", "south"]}.
+
+        Each criterion may be a single value or a list of alternatives ("italian or chinese"),
+        matching is case-insensitive and None or "any" means 'don't care'.
 
         Returns:
-            A list of Restaurant objects that match all specified criteria.
+            A list of Restaurant objects that match all specified criteria, in the order they were loaded.
             Returns an empty list if no matches are found.
         """
-        
-        potential_matches = self.restaurants
+        constraints = [(attribute, _as_values(value)) for attribute, value in
+                       ((SearchThemes.area.value, area), (SearchThemes.pricerange.value, pricerange), (SearchThemes.food.value, food))]
+        constraints = [(attribute, values) for attribute, values in constraints if values]
+        exclusions = []
+        for attribute, value in (exclude or {}).items():
+            if attribute not in INDEXED_ATTRIBUTES:
+                raise ValueError(f"Cannot exclude on '{attribute}', must be one of {', '.join(INDEXED_ATTRIBUTES)}.")
+            if _as_values(value):
+                exclusions.append((attribute, _as_values(value)))
 
-        # A 'don't care' preference can be represented by the value "any" or by the argument being None.
-        # We will filter step-by-step.
-        if area and area != "any":
-            potential_matches = [r for r in potential_matches if r.area.lower() == area.lower()]
-
-        if pricerange and pricerange != "any":
-            potential_matches = [r for r in potential_matches if r.pricerange.lower() == pricerange.lower()]
+        if constraints:
+            # Start from the smallest posting list and check the other constraints on those rows only,
+            # so the cost depends on the number of matches, not on the database size
+            postings = [self.store.postings(attribute, values) for attribute, values in constraints]
+            smallest = min(range(len(postings)), key=lambda i: len(postings[i]))
+            matches = postings[smallest]
+            for i, (attribute, values) in enumerate(constraints):
+                if i != smallest:
+                    matches = self.store.filter_rows(matches, attribute, values)
+        else:
+            matches = np.arange(len(self.store))
 
-        if food and food != "any":
-            potential_matches = [r for r in potential_matches if r.food.lower() == food.lower()]
+        for attribute, values in exclusions:
+            matches = self.store.filter_rows(matches, attribute, values, exclude=True)
 
-        return potential_matches
\ No newline at end of file
+        # Restaurant objects are only created for the matching rows
+        return self.store.restaurants(matches)
@@ -1,10 +1,16 @@
 from utils.csv_reader import CSVReader
 from dialogue_system.restaurant import Restaurant
+from dialogue_system.restaurant_store import RestaurantStore
 
 class RestaurantReader:
     def __init__(self, filepath):
+        self.filepath = filepath
         self.csv_reader = CSVReader(filepath)
 
+    def read_store(self):
+        """Reads the CSV in one bulk pass into a column-oriented RestaurantStore."""
+        return RestaurantStore.from_csv(self.filepath)
+
     def read_restaurants(self):
         """Reads the CSV and returns a list of Restaurant objects."""
         rows = self.csv_reader.read()
@@ -20,4 +26,4 @@ class RestaurantReader:
                 postcode=row.get("postcode")
             )
             restaurants.append(restaurant)
-        return restaurants
\ No newline at end of file
+        return restaurants
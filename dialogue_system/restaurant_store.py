@@ -0,0 +1,148 @@
+import csv
+
+import numpy as np
+
+from dialogue_system.restaurant import (Restaurant, FOOD_QUALITY_VALUES, CROWDEDNESS_VALUES, LENGTH_OF_STAY_VALUES,
+                                        SYNTHETIC_SEED, synthetic_codes)
+
+# Columns stored as int codes into a table of labels
+CATEGORICAL_COLUMNS = ("pricerange", "area", "food", "food_quality", "crowdedness", "length_of_stay")
+STRING_COLUMNS = ("name", "phone", "addr", "postcode")
+# Attributes that are not in the CSV, derived from the restaurant names when the store is loaded (in this order)
+SYNTHETIC_COLUMNS = {
+    "food_quality": FOOD_QUALITY_VALUES,
+    "crowdedness": CROWDEDNESS_VALUES,
+    "length_of_stay": LENGTH_OF_STAY_VALUES,
+}
+# CSV header of each column read from the file
+CSV_HEADERS = {"name": "restaurantname", "pricerange": "pricerange", "area": "area", "food": "food",
+               "phone": "phone", "addr": "addr", "postcode": "postcode"}
+
+
+class RestaurantStore:
+    """
+    Column-oriented restaurant database. Categorical attributes are int codes into per-column label tables and
+    the remaining attributes are string arrays, so filtering, unique labels and counts are vectorized operations.
+    Restaurant objects are only created (and then cached) for the rows that are actually handed out.
+    """
+    def __init__(self, codes, labels, strings):
+        self.codes = codes  # column -> int array of codes
+        self.labels = labels  # column -> tuple of labels, indexed by code
+        self.strings = strings  # column -> object array
+        self._restaurants = {}
+        self._rows = {}  # Restaurant object -> row
+        self._postings = {}
+        self._folded_codes = {}
+
+    def __len__(self):
+        return len(self.strings["name"])
+
+    @classmethod
+    def from_columns(cls, columns, seed=SYNTHETIC_SEED):
+        """Builds the store from lists of raw values per column; missing synthetic columns are derived from the names."""
+        n_rows = len(columns["name"])
+        codes, labels = {}, {}
+        synthetic = None
+        for column in CATEGORICAL_COLUMNS:
+            if column in columns:
+                table = {}
+                codes[column] = np.fromiter((table.setdefault(value, len(table)) for value in columns[column]),
+                                            dtype=np.int32, count=n_rows)
+                labels[column] = tuple(table)
+            else:
+                if synthetic is None:
+                    synthetic = np.array([synthetic_codes(name, seed) for name in columns["name"]],
+                                         dtype=np.int32).reshape(n_rows, len(SYNTHETIC_COLUMNS))
+                labels[column] = SYNTHETIC_COLUMNS[column]
+                codes[column] = np.ascontiguousarray(synthetic[:, list(SYNTHETIC_COLUMNS).index(column)])
+        strings = {column: np.array(columns[column], dtype=object) for column in STRING_COLUMNS}
+        return cls(codes, labels, strings)
+
+    @classmethod
+    def from_csv(cls, filepath):
+        """Loads the restaurant CSV in one pass straight into columns."""
+        with open(filepath, newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader)
+            positions = {column: header.index(name) for column, name in CSV_HEADERS.items()}
+            columns = {column: [] for column in positions}
+            appenders = [(position, columns[column].append) for column, position in positions.items()]
+            for row in reader:
+                for position, append in appenders:
+                    append(row[position] if position < len(row) else None)
+        return cls.from_columns(columns)
+
+    @classmethod
+    def from_restaurants(cls, restaurants):
+        """Builds the store from existing Restaurant objects (keeping their synthetic attributes)."""
+        columns = {column: [getattr(r, column) for r in restaurants] for column in STRING_COLUMNS + CATEGORICAL_COLUMNS}
+        store = cls.from_columns(columns)
+        store._restaurants = dict(enumerate(restaurants))
+        store._rows = {restaurant: row for row, restaurant in store._restaurants.items()}
+        return store
+
+    # --- Values ---
+    def value(self, column, row):
+        if column in self.codes:
+            return self.labels[column][self.codes[column][row]]
+        return self.strings[column][row]
+
+    def restaurant(self, row):
+        """The Restaurant object of a row, created on first use."""
+        restaurant = self._restaurants.get(row)
+        if restaurant is None:
+            restaurant = self._restaurants[row] = Restaurant(**{column: self.value(column, row) for column in STRING_COLUMNS + CATEGORICAL_COLUMNS})
+            self._rows[restaurant] = row
+        return restaurant
+
+    def rows_of(self, restaurants):
+        """Row numbers of Restaurant objects handed out by this store."""
+        return np.fromiter((self._rows[restaurant] for restaurant in restaurants), dtype=np.intp, count=len(restaurants))
+
+    def restaurants(self, rows=None):
+        """Restaurant objects for the given rows (all rows by default), in row order."""
+        rows = range(len(self)) if rows is None else rows
+        return [self.restaurant(int(row)) for row in rows]
+
+    # --- Queries ---
+    def unique_labels(self, column):
+        """Sorted labels of a categorical column that occur in at least one row."""
+        present = np.flatnonzero(np.bincount(self.codes[column], minlength=len(self.labels[column])))
+        return sorted(self.labels[column][code] for code in present)
+
+    def counts(self, column, rows=None):
+        """Number of rows (optionally only of `rows`) per label of a categorical column."""
+        codes = self.codes[column] if rows is None else self.codes[column][rows]
+        counts = np.bincount(codes, minlength=len(self.labels[column]))
+        return {label: int(count) for label, count in zip(self.labels[column], counts) if count}
+
+    def codes_for(self, column, values):
+        """Codes of the labels that equal any of the (case-folded) values."""
+        folded = self._folded_codes.get(column)
+        if folded is None:
+            folded = self._folded_codes[column] = {}
+            for code, label in enumerate(self.labels[column]):
+                folded.setdefault(label.casefold() if label else "", []).append(code)
+        return [code for value in values for code in folded.get(value, ())]
+
+    def mask(self, column, values):
+        """Boolean mask of the rows whose label equals any of the (case-folded) values."""
+        return np.isin(self.codes[column], self.codes_for(column, values))
+
+    def filter_rows(self, rows, column, values, exclude=False):
+        """Keeps the rows whose label equals any of the (case-folded) values (or none of them with exclude=True)."""
+        keep = np.isin(self.codes[column][rows], self.codes_for(column, values), invert=exclude)
+        return rows[keep]
+
+    def postings(self, column, values):
+        """Sorted row numbers whose label equals any of the (case-folded) values, from a per-column inverted index."""
+        if column not in self._postings:
+            # Rows grouped by code (stable, so each group is in row order), with the start of every group
+            order = np.argsort(self.codes[column], kind="stable")
+            starts = np.searchsorted(self.codes[column][order], np.arange(len(self.labels[column]) + 1))
+            self._postings[column] = (order, starts)
+        order, starts = self._postings[column]
+        parts = [order[starts[code]:starts[code + 1]] for code in self.codes_for(column, values)]
+        if not parts:
+            return np.empty(0, dtype=order.dtype)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
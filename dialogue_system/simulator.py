@@ -0,0 +1,281 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from dialogue_system.channels import InputChannel, OutputChannel
+from dialogue_system.finite_state_machine_initializor import initialize_fsm
+from dialogue_system.response_templates import HUMANLIKE_TEMPLATES, SYSTEM_TEMPLATES
+from dialogue_system.types import SearchThemes
+from models.classification_service import BatchingClassifier
+from utils.dialogue_logger import DialogueLogger
+
+# Start of the confirmation question (_confirm_term) in both response modes, to recognize it in the system output
+CONFIRM_PREFIXES = tuple(templates["confirm_term"].split("{")[0] for templates in (HUMANLIKE_TEMPLATES, SYSTEM_TEMPLATES))
+
+REQUEST_SENTENCES = (
+    "i want a {pricerange} restaurant in the {area} part of town serving {food} food",
+    "i'm looking for {food} food in the {area} area, {pricerange} price range",
+    "{pricerange} {food} restaurant in the {area}",
+)
+SLOT_SENTENCES = {
+    "area": ("the {area} part of town", "{area} area", "in the {area}"),
+    "food": ("{food} food", "i would like {food} food", "{food}"),
+    "pricerange": ("{pricerange} price range", "something {pricerange}", "{pricerange}"),
+}
+
+
+class ScriptExhausted(Exception):
+    """A scripted user has no turns left (the dialogue did not end within the script)."""
+
+
+@dataclass
+class UserGoal:
+    area: str
+    food: str
+    pricerange: str
+    extra: Optional[str] = None  # touristic, romantic, children, assigned seats
+
+
+@dataclass
+class DialogueResult:
+    success: bool
+    turns: int
+    duration: float
+    state_latencies: dict  # state name -> [seconds per step]
+    error: Optional[str] = None
+
+
+def random_goal(restaurant_manager, rng=random, solvable=True, max_tries=100):
+    """
+    A user goal with area, food and price range values from RestaurantManager.get_labels. With solvable=True the
+    combination is redrawn (up to max_tries times) until at least one restaurant matches it.
+    """
+    labels = {attribute: [label for label in restaurant_manager.get_labels(attribute) if label]
+              for attribute in (SearchThemes.area.value, SearchThemes.food.value, SearchThemes.pricerange.value)}
+    for _ in range(max_tries):
+        goal = UserGoal(**{attribute: rng.choice(values) for attribute, values in labels.items()},
+                        extra=rng.choice((None, None, "touristic", "romantic", "children", "assigned seats")))
+        if not solvable or restaurant_manager.find_restaurants(area=goal.area, pricerange=goal.pricerange, food=goal.food):
+            return goal
+    return goal
+
+
+def read_transcript(filepath):
+    """The user utterances of a transcript saved by DialogueLogger, in order."""
+    utterances = []
+    speaker = None
+    with open(filepath, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("Speaker: "):
+                speaker = line[len("Speaker: "):].strip()
+            elif line.startswith("Utterance: ") and speaker == "User":
+                utterances.append(line[len("Utterance: "):].rstrip("\n"))
+    return utterances
+
+
+class SimulatorOutput(OutputChannel):
+    """Keeps the last system turn for the simulated user (nothing is printed or spoken)."""
+    def __init__(self):
+        self.last = ""
+        self.turns = 0
+
+    async def send(self, text: str):
+        self.last = text
+        self.turns += 1
+
+
+class GoalDrivenUser(InputChannel):
+    """Answers the FSM's questions from a UserGoal, based on the current state and the last system turn."""
+    def __init__(self, goal: UserGoal, output: SimulatorOutput, rng=random, max_turns=30):
+        self.goal = goal
+        self.output = output
+        self.rng = rng
+        self.max_turns = max_turns
+        self.turns = 0
+        self.fsm = None
+
+    def _slot(self, attribute):
+        return self.rng.choice(SLOT_SENTENCES[attribute]).format(**{attribute: getattr(self.goal, attribute)})
+
+    def understood(self):
+        context = self.fsm.context
+        return (context.area, context.food, context.pricerange) == (self.goal.area, self.goal.food, self.goal.pricerange)
+
+    def _wrong_part(self):
+        context = self.fsm.context
+        wrong = [attribute for attribute in ("area", "food", "pricerange") if getattr(context, attribute) != getattr(self.goal, attribute)]
+        return "all of them" if len(wrong) != 1 else {"area": "the area", "food": "the food", "pricerange": "the price"}[wrong[0]]
+
+    async def receive(self) -> str:
+        self.turns += 1
+        if self.turns > self.max_turns:
+            raise ScriptExhausted(f"no success within {self.max_turns} user turns")
+
+        state = self.fsm.current_state.name
+        if self.output.last.startswith(CONFIRM_PREFIXES):
+            term = self.output.last.split("'")[1] if "'" in self.output.last else ""
+            return "yes" if term in (self.goal.area, self.goal.food, self.goal.pricerange, self.goal.extra) else "no"
+        if state in ("welcome", "ask_to_express_preference"):
+            return self.rng.choice(REQUEST_SENTENCES).format(area=self.goal.area, food=self.goal.food, pricerange=self.goal.pricerange)
+        if state == "ask_area":
+            return self._slot("area")
+        if state == "ask_food":
+            return self._slot("food")
+        if state == "ask_pricerange":
+            return self._slot("pricerange")
+        if state == "ask_extra_preference":
+            return f"i want a {self.goal.extra} place" if self.goal.extra else "no thanks"
+        if state == "ask_conformation":
+            return "yes" if self.understood() else "no"
+        if state == "ask_part_incorrect":
+            return f"{self._wrong_part()} was wrong"
+        return "yes"
+
+
+class ScriptedUser(InputChannel):
+    """Replays a fixed list of user utterances (e.g. from a saved transcript)."""
+    def __init__(self, utterances: List[str]):
+        self.utterances = list(utterances)
+        self.turns = 0
+        self.fsm = None
+
+    async def receive(self) -> str:
+        if self.turns >= len(self.utterances):
+            raise ScriptExhausted(f"script ended after {len(self.utterances)} user turns")
+        self.turns += 1
+        return self.utterances[self.turns - 1]
+
+
+def _percentiles(values, percentiles=(50, 90, 99)):
+    """Nearest-rank percentiles, like BatchingClassifier.latency_percentiles."""
+    values = sorted(values)
+    if not values:
+        return {f"p{p}": 0.0 for p in percentiles}
+    return {f"p{p}": values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))] for p in percentiles}
+
+
+@dataclass
+class SimulationReport:
+    results: List[DialogueResult] = field(default_factory=list)
+    wall_time: float = 0.0
+
+    def summary(self):
+        n = len(self.results)
+        state_latencies = defaultdict(list)
+        for result in self.results:
+            for state, latencies in result.state_latencies.items():
+                state_latencies[state].extend(latencies)
+        errors = defaultdict(int)
+        for result in self.results:
+            if result.error:
+                errors[result.error.split(":")[0]] += 1
+        return {
+            "dialogues": n,
+            "wall_time_s": self.wall_time,
+            "dialogues_per_s": n / self.wall_time if self.wall_time else 0.0,
+            "success_rate": sum(result.success for result in self.results) / n if n else 0.0,
+            "turns_per_dialogue": {"mean": sum(result.turns for result in self.results) / n if n else 0.0,
+                                   **_percentiles([result.turns for result in self.results])},
+            "state_latency_ms": {state: {"steps": len(latencies), **{p: v * 1000 for p, v in _percentiles(latencies).items()}}
+                                 for state, latencies in sorted(state_latencies.items())},
+            "errors": dict(errors),
+        }
+
+    def print_report(self):
+        summary = self.summary()
+        print("\n--- Dialogue simulation ---")
+        print(f"Dialogues: {summary['dialogues']} in {summary['wall_time_s']:.2f}s ({summary['dialogues_per_s']:.1f} dialogues/s)")
+        print(f"Task success rate: {summary['success_rate']:.1%}")
+        turns = summary["turns_per_dialogue"]
+        print(f"User turns per dialogue: mean {turns['mean']:.1f}, p50 {turns['p50']}, p90 {turns['p90']}, p99 {turns['p99']}")
+        print(f"{'State':<28}{'Steps':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+        for state, latency in summary["state_latency_ms"].items():
+            print(f"{state:<28}{latency['steps']:>8}{latency['p50']:>10.2f}{latency['p90']:>10.2f}{latency['p99']:>10.2f}")
+        if summary["errors"]:
+            print(f"Unfinished dialogues: {summary['errors']}")
+
+
+class DialogueSimulator:
+    """
+    Runs many headless dialogues concurrently on one event loop, with simulated users instead of input()/ASR and a
+    silent output channel instead of print/TTS. The classifier, restaurant manager and searcher are shared, like in
+    the dialogue server; a plain pipeline is wrapped in a BatchingClassifier.
+
+    The per-state latency is the time the FSM spends in one step (the system's side of the turn, including waiting
+    for the classifier batch), the simulated users answer instantly.
+    """
+    def __init__(self, model, restaurant_manager, restaurant_searcher, concurrency=500, response_mode="humanlike", seed=None,
+                 transcript_writer=None):
+        self.model = model
+        self.restaurant_manager = restaurant_manager
+        self.restaurant_searcher = restaurant_searcher
+        self.concurrency = concurrency
+        self.response_mode = response_mode
+        self.rng = random.Random(seed)
+        self.transcript_writer = transcript_writer
+
+    def _new_fsm(self, user, output):
+        fsm = initialize_fsm(self.restaurant_searcher, self.service, self.restaurant_manager, use_asr=False, use_tts=False,
+                             response_mode=self.response_mode, input_channel=user, output_channel=output,
+                             logger=DialogueLogger(writer=self.transcript_writer))
+        user.fsm = fsm
+        return fsm
+
+    async def _run_dialogue(self, user, output, is_success):
+        fsm = self._new_fsm(user, output)
+        state_latencies = defaultdict(list)
+        started = time.perf_counter()
+        error = None
+        try:
+            while fsm.is_active:
+                state = fsm.current_state.name
+                step_started = time.perf_counter()
+                await fsm.astep()
+                state_latencies[state].append(time.perf_counter() - step_started)
+        except Exception as e:
+            # ScriptExhausted (turn limit or end of script) or a failure in the FSM/NLU stack
+            error = f"{type(e).__name__}: {e}"
+        success = error is None and is_success(fsm)
+        return DialogueResult(success, user.turns, time.perf_counter() - started, dict(state_latencies), error)
+
+    async def _run_all(self, make_dialogues):
+        owns_service = not hasattr(self.model, "aclassify")
+        self.service = BatchingClassifier(self.model).start() if owns_service else self.model
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def limited(dialogue):
+            async with slots:
+                return await dialogue()
+
+        report = SimulationReport()
+        started = time.perf_counter()
+        try:
+            report.results = await asyncio.gather(*(limited(dialogue) for dialogue in make_dialogues()))
+        finally:
+            report.wall_time = time.perf_counter() - started
+            if owns_service:
+                await asyncio.to_thread(self.service.stop)
+        return report
+
+    async def run_goals(self, n_dialogues=None, goals=None, solvable=True, max_turns=30):
+        """Simulates dialogues for the given goals (or n_dialogues random ones); success = the system understood the goal and the user accepted."""
+        goals = goals or [random_goal(self.restaurant_manager, self.rng, solvable) for _ in range(n_dialogues)]
+
+        def make_dialogues():
+            for goal in goals:
+                output = SimulatorOutput()
+                user = GoalDrivenUser(goal, output, random.Random(self.rng.random()), max_turns)
+                yield lambda user=user, output=output: self._run_dialogue(user, output, lambda fsm, user=user: user.understood())
+        return await self._run_all(make_dialogues)
+
+    async def run_scripts(self, scripts):
+        """Replays lists of user utterances (e.g. read_transcript output); success = the dialogue ended within its script."""
+        def make_dialogues():
+            for utterances in scripts:
+                output = SimulatorOutput()
+                user = ScriptedUser(utterances)
+                yield lambda user=user, output=output: self._run_dialogue(user, output, lambda fsm: not fsm.is_active)
+        return await self._run_all(make_dialogues)
@@ -0,0 +1,153 @@
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sklearn.feature_extraction.text import CountVectorizer
+
+from dialogue_system.types import SearchThemes
+
+# Tokens as seen by the TF-IDF fallback indexes (TfidfVectorizer's default analyzer), computed once per utterance
+_tfidf_analyzer = CountVectorizer().build_analyzer()
+
+VALUE = "value"
+KEYWORD = "keyword"
+
+
+class TokenAutomaton:
+    """
+    Aho-Corasick automaton over token sequences: finds every occurrence of every pattern
+    (single- or multi-word) in one left-to-right pass over the tokens of an utterance.
+    """
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]  # state -> [(pattern length, payload)]
+
+    def add(self, tokens, payload):
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = self._goto[state][token] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append((len(tokens), payload))
+
+    def compile(self):
+        """Computes the failure links (breadth first) and merges the outputs along them."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(token, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+        return self
+
+    def find(self, tokens):
+        """Yields (start, end, payload) for every pattern occurrence, `end` exclusive."""
+        state = 0
+        for position, token in enumerate(tokens):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for length, payload in self._outputs[state]:
+                yield position + 1 - length, position + 1, payload
+
+
+@dataclass
+class Slot:
+    attribute: SearchThemes
+    value: str
+    span: Optional[Tuple[int, int]]  # [start, end) token positions in SlotExtraction.tokens, None for TF-IDF matches
+    match_type: str  # "exact", "fuzzy" or "tfidf"
+    score: float  # exact: 1.0, fuzzy: Levenshtein distance, tfidf: cosine similarity
+
+
+@dataclass
+class SlotExtraction:
+    """All slots found in one utterance, plus its tokens (so later steps do not tokenize it again)."""
+    utterance: str
+    tokens: List[str]
+    slots: Dict[SearchThemes, Slot] = field(default_factory=dict)
+
+    def value(self, attribute):
+        slot = self.slots.get(attribute)
+        return slot.value if slot else None
+
+
+class SlotExtractor:
+    """
+    Extracts the values of several attributes from an utterance in one pass, using the same three strategies as
+    RestaurantSearcher.search: exact matches of (multi-word) domain terms, the closest domain term to the words around
+    an attribute's keywords (Levenshtein, via the attribute's fuzzy index) and the TF-IDF fallback.
+    The utterance is tokenized once and all domain terms and keywords are found by a single automaton pass.
+    """
+    def __init__(self, domains, keywords, fuzzy_indexes, tfidf_indexes, tokenize):
+        self.domains = domains
+        self.fuzzy_indexes = fuzzy_indexes
+        self.tfidf_indexes = tfidf_indexes
+        self.tokenize = tokenize
+        self._automaton = TokenAutomaton()
+        for attribute, terms in domains.items():
+            for term in terms:
+                tokens = tokenize(term)
+                if tokens:
+                    self._automaton.add(tokens, (attribute, VALUE, term))
+        for attribute, words in keywords.items():
+            for word in words:
+                self._automaton.add(tokenize(word), (attribute, KEYWORD, word))
+        self._automaton.compile()
+
+    def extract(self, utterance, attributes=tuple(SearchThemes), window_size=2):
+        tokens = self.tokenize(utterance)
+        extraction = SlotExtraction(utterance, tokens)
+
+        # Exact matches (earliest, then longest, per attribute) and keyword positions, all from one pass
+        exact = {}
+        keyword_spans = {attribute: [] for attribute in attributes}
+        for start, end, (attribute, kind, term) in self._automaton.find(tokens):
+            if attribute not in keyword_spans:
+                continue
+            if kind == KEYWORD:
+                keyword_spans[attribute].append((start, end))
+            elif attribute not in exact or (start, start - end) < exact[attribute][:2]:
+                exact[attribute] = (start, start - end, term)
+
+        tfidf_counts = None
+        for attribute in attributes:
+            if attribute in exact:
+                start, negative_length, term = exact[attribute]
+                extraction.slots[attribute] = Slot(attribute, term, (start, start - negative_length), "exact", 1.0)
+                continue
+
+            # Words around the attribute's keywords, in utterance order (first position of each word)
+            context_words = {}
+            for start, end in sorted(keyword_spans[attribute]):
+                for j in range(max(start - window_size, 0), min(end + window_size, len(tokens))):
+                    if not start <= j < end:
+                        context_words.setdefault(tokens[j], j)
+
+            best_match, min_distance, best_position = None, float("inf"), None
+            fuzzy_index = self.fuzzy_indexes[attribute]
+            for word, position in context_words.items():
+                match = fuzzy_index.closest(word)
+                if match and match[1] < min_distance:
+                    (best_match, min_distance), best_position = match, position
+            if best_match and min_distance <= fuzzy_index.max_distance:
+                extraction.slots[attribute] = Slot(attribute, best_match, (best_position, best_position + 1), "fuzzy", min_distance)
+                continue
+
+            # Fallback: the most similar domain term by TF-IDF cosine similarity
+            if tfidf_counts is None:
+                tfidf_counts = Counter(_tfidf_analyzer(utterance.lower()))
+            ranked = self.tfidf_indexes[attribute].best_match_counts(tfidf_counts)
+            if ranked and ranked[1] >= 0.5:
+                extraction.slots[attribute] = Slot(attribute, ranked[0], None, "tfidf", ranked[1])
+
+        return extraction
@@ -0,0 +1,156 @@
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class ResourceLoadReport:
+    """Timing and memory information for a single loaded resource."""
+    name: str
+    seconds: float
+    rss_delta_bytes: int
+
+    def __str__(self):
+        return f"{self.name}: loaded in {self.seconds:.2f}s ({self.rss_delta_bytes / (1024 * 1024):+.1f} MB RSS)"
+
+
+def current_rss_bytes():
+    """
+    Returns the resident set size of the current process in bytes.
+    Uses /proc on Linux and falls back to the peak RSS reported by `resource` elsewhere (0 if unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux/BSD report kilobytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SpeechResources:
+    """
+    Lazily loads the heavy ASR/TTS dependencies (Whisper model, PyAudio and the microphone stream, edge-tts, playsound).
+    Each resource is loaded at most once per process and shared by every dialogue session.
+    Resources can optionally be warmed on a background thread while the welcome prompt is shown.
+    """
+    def __init__(self, asr_model_size="base", device="cpu", compute_type="int8"):
+        self.asr_model_size = asr_model_size
+        self.device = device
+        self.compute_type = compute_type
+        # Creates the Endpointer of the microphone capture (default: adaptive) and whether Whisper's VAD filter is applied
+        self.endpointer_factory = None
+        self.vad_filter = False
+        self.reports = []
+
+        self._resources = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def _get(self, name, loader):
+        """Returns the named resource, loading it first if needed. Concurrent callers wait for a single load."""
+        if name in self._resources:
+            return self._resources[name]
+
+        with self._registry_lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+
+        with lock:
+            if name not in self._resources:
+                rss_before = current_rss_bytes()
+                start = time.perf_counter()
+                self._resources[name] = loader()
+                self.reports.append(ResourceLoadReport(name, time.perf_counter() - start, current_rss_bytes() - rss_before))
+        return self._resources[name]
+
+    def is_loaded(self, name):
+        return name in self._resources
+
+    # --- Individual resources ---
+    def asr_model(self):
+        """The shared faster-whisper model used for speech recognition."""
+        def load():
+            from faster_whisper import WhisperModel
+            return WhisperModel(self.asr_model_size, device=self.device, compute_type=self.compute_type)
+        return self._get("asr_model", load)
+
+    def pyaudio(self):
+        """The `pyaudio` module (microphone access)."""
+        def load():
+            import pyaudio
+            return pyaudio
+        return self._get("pyaudio", load)
+
+    def microphone(self):
+        """The process-wide AudioCapture on the microphone: one input stream, opened on first use and kept open (closed at exit)."""
+        def load():
+            import atexit
+            from dialogue_system.audio_capture import AudioCapture, Endpointer, MicrophoneSource
+            capture = AudioCapture(MicrophoneSource(), (self.endpointer_factory or Endpointer)())
+            atexit.register(capture.close)
+            return capture
+        return self._get("microphone", load)
+
+    def edge_tts(self):
+        """The `edge_tts` module (speech synthesis)."""
+        def load():
+            import edge_tts
+            return edge_tts
+        return self._get("edge_tts", load)
+
+    def playsound(self):
+        """The `playsound` function (audio playback)."""
+        def load():
+            from playsound import playsound
+            return playsound
+        return self._get("playsound", load)
+
+    # --- Warm-up and reporting ---
+    def warm_up(self, use_asr=False, use_tts=False, background=True):
+        """
+        Loads the resources a session will need. With background=True the loading happens on a daemon thread
+        and the thread is returned; any later getter call simply waits for the in-flight load to finish.
+        """
+        loaders = []
+        if use_asr:
+            loaders += [self.pyaudio, self.microphone, self.asr_model]
+        if use_tts:
+            loaders += [self.edge_tts, self.playsound]
+
+        def run():
+            for loader in loaders:
+                try:
+                    loader()
+                except Exception as e:
+                    # Surface the error when the session actually requests the resource
+                    print(f"[Resources] Could not warm up {loader.__name__}: {e}")
+
+        if not loaders:
+            return None
+        if not background:
+            run()
+            return None
+
+        thread = threading.Thread(target=run, name="speech-resources-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def print_report(self):
+        """Prints how long each loaded resource took to load and how much memory it added."""
+        if not self.reports:
+            return
+        print("\n--- Speech resources ---")
+        for report in self.reports:
+            print(f"  {report}")
+
+
+# One instance per process, shared by all dialogue sessions
+speech_resources = SpeechResources()
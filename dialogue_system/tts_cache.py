@@ -0,0 +1,158 @@
+import asyncio
+import os
+import string
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from dialogue_system import response_templates
+from dialogue_system.response_templates import HUMANLIKE_TEMPLATES, SYSTEM_TEMPLATES
+from dialogue_system.speech_resources import speech_resources
+from utils.artifact_store import ArtifactStore
+
+VOICE = "en-US-AvaNeural"
+TTS_CACHE_DIR = os.path.join("audio", "tts_cache")
+
+
+# --- Synthesizers: async callables (text, voice, path) that write the audio of `text` to `path` ---
+
+async def synthesize_edge_tts(text: str, voice: str, path: str):
+    """Streams the edge-tts synthesis of `text` into an mp3 file."""
+    communicate = speech_resources.edge_tts().Communicate(text, voice)
+    with open(path, "wb") as file:
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                file.write(chunk["data"])
+
+
+async def synthesize_tone(text: str, voice: str, path: str, rate=16000, seconds_per_word=0.05):
+    """Local stand-in synthesizer: a wav tone whose length and pitch depend on the text, no network or TTS backend needed."""
+    samples = np.arange(int(rate * seconds_per_word * max(1, len(text.split()))))
+    frequency = 220 + sum(text.encode("utf-8")) % 440
+    audio = (0.3 * 32767 * np.sin(2 * np.pi * frequency * samples / rate)).astype(np.int16)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(audio.tobytes())
+
+
+class TTSCache:
+    """
+    On-disk cache of synthesized speech, filed in an ArtifactStore under a key of (text, voice, audio format), so a
+    repeated system turn is played from disk instead of being synthesized again. The store evicts the least recently
+    used audio files once it grows beyond `max_bytes`; a hit marks the file as recently used.
+
+    Concurrent requests for the same uncached text share one synthesis. prerender() fills the cache offline
+    (see static_texts() for the texts the dialogue system can produce ahead of time).
+    """
+    def __init__(self, root=TTS_CACHE_DIR, max_bytes=256 * 1024 ** 2, voice=VOICE, synthesizer=synthesize_edge_tts,
+                 audio_format="mp3", enabled=True):
+        self.store = ArtifactStore(root, max_bytes)
+        self.voice = voice
+        self.synthesizer = synthesizer
+        self.audio_format = audio_format
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.prerendered = 0
+        self.synthesis_seconds = 0.0
+        self._in_flight = {}
+
+    def key_for(self, text):
+        return ArtifactStore.key_for(text=text, voice=self.voice, format=self.audio_format)
+
+    def path_for(self, text):
+        return self.store.path_for(self.key_for(text), suffix="." + self.audio_format)
+
+    async def get(self, text: str, count=True) -> str:
+        """Path of the audio of `text`, synthesized and stored first on a miss. The file stays in the cache (do not delete it)."""
+        key = self.key_for(text)
+        path = self.store.path_for(key, suffix="." + self.audio_format)
+        if os.path.exists(path):
+            self.hits += count
+            # The manifest update only matters for eviction, playback does not wait for it
+            asyncio.get_running_loop().run_in_executor(None, self.store.touch, key)
+            return path
+
+        pending = self._in_flight.get(key)
+        if pending is None:
+            self.misses += count
+            pending = self._in_flight[key] = asyncio.ensure_future(self._synthesize(key, text, path))
+            pending.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def _synthesize(self, key, text, path):
+        os.makedirs(self.store.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.store.root, prefix=".tmp-", suffix="." + self.audio_format)
+        os.close(fd)
+        started = time.perf_counter()
+        try:
+            await self.synthesizer(text, self.voice, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.synthesis_seconds += time.perf_counter() - started
+        await asyncio.to_thread(self.store.register, key, "tts", path, {"text": text, "voice": self.voice})
+        return path
+
+    async def prerender(self, texts, concurrency=4):
+        """Synthesizes every text that is not cached yet (at most `concurrency` at a time). Returns (rendered, already cached)."""
+        texts = list(dict.fromkeys(texts))
+        missing = [text for text in texts if not os.path.exists(self.path_for(text))]
+        slots = asyncio.Semaphore(concurrency)
+
+        async def render(text):
+            async with slots:
+                await self.get(text, count=False)
+
+        await asyncio.gather(*(render(text) for text in missing))
+        self.prerendered += len(missing)
+        return len(missing), len(texts) - len(missing)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0, "prerendered": self.prerendered,
+                "synthesis_s": self.synthesis_seconds, "entries": len(self.store.entries()),
+                "size_mb": self.store.total_size() / (1024 * 1024)}
+
+    def print_report(self):
+        stats = self.stats()
+        if not stats["hits"] and not stats["misses"] and not stats["prerendered"]:
+            return
+        print("\n--- TTS cache ---")
+        print(f"  {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), {stats['prerendered']} pre-rendered, "
+              f"{stats['synthesis_s']:.2f}s spent synthesizing; {stats['entries']} entries, {stats['size_mb']:.1f} MB in {self.store.root}")
+
+
+def static_texts(restaurant_manager, templates=(HUMANLIKE_TEMPLATES, SYSTEM_TEMPLATES)):
+    """
+    Every system turn that can be known before a dialogue starts: the fixed templates, the food hints, the invalid-input
+    hints (listing the labels, like the FSM does) and the suggestion and details lines of every restaurant.
+    """
+    texts = list(response_templates.humanlike_food_hints) + list(response_templates.system_food_hints)
+    for mode_templates in templates:
+        for key, template in mode_templates.items():
+            if callable(template):
+                continue
+            fields = {field for _, field, _, _ in string.Formatter().parse(template) if field}
+            if not fields:
+                texts.append(template)
+            elif fields == {"hint_options"}:
+                # ask_<attribute>_invalid
+                attribute = key[len("ask_"):-len("_invalid")]
+                texts.append(template.format(hint_options=', '.join([opt for opt in restaurant_manager.get_labels(attribute) if opt])))
+
+        for restaurant in restaurant_manager.restaurants:
+            for key in ("suggest_restaurant", "show_restaurant_details"):
+                texts.append(mode_templates[key].format(name=restaurant.name, food=restaurant.food,
+                                                        pricerange=restaurant.pricerange, area=restaurant.area))
+    return texts
+
+
+# One cache per process, shared by all dialogue sessions that use TTS
+tts_cache = TTSCache()
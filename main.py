@@ -1,150 +1,164 @@
 import os
-
-from data.data import load_and_preprocess_data, split_data
-from utils.stats_retriever import SystemsOverview
-from sklearn.metrics import accuracy_score
-from cli import start_cli
-
-import models.baseline_systems as baseline
-from models.logistic_regression import run_logreg_optimization
-from models.multinomial_naive_bayes import run_nb_optimization
-from models.svm import run_svm_optimization
-from models.decision_tree import run_dt_optimization
-
-from dialogue_system.keyword_searcher import RestaurantSearcher
-from dialogue_system.restaurant_manager import RestaurantManager
-from dialogue_system.restaurant_reader import RestaurantReader
-
-
-if __name__ == "__main__":
-
-    systems_overview = SystemsOverview()
-
-    # ---- CONSTANTS ------
-    DASHED_LINE = "-" * 100
-
-    # Start  of script
-    data_filepath = os.path.join(os.path.dirname(__file__), './data/dialog_acts.dat')
-
-    # Load and preprocess the data
+import argparse
+
+from utils.timing import StageTimer
+
+# ---- CONSTANTS ------
+DASHED_LINE = "-" * 100
+MODEL_CHOICES = {
+    "logreg": "Logistic Regression",
+    "nb": "Multinomial Naive Bayes",
+    "svm": "SVM",
+    "dt": "Decision Tree"
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dialogue act classification and restaurant dialogue system.")
+    parser.add_argument("--serve", action="store_true",
+                        help="Skip training and evaluation, start straight from the cached model pipelines.")
+    parser.add_argument("--model", choices=MODEL_CHOICES.keys(),
+                        help="Skip the main menu and start the dialogue system with this model.")
+    parser.add_argument("--asr", action="store_true", help="With --model: enable ASR (Speech-to-Text).")
+    parser.add_argument("--tts", action="store_true", help="With --model: enable TTS (Text-to-Speech).")
+    parser.add_argument("--asr-hangover", type=float, default=0.5,
+                        help="ASR: seconds of silence (relative to the calibrated noise floor) that end an utterance.")
+    parser.add_argument("--asr-fixed-endpointing", action="store_true",
+                        help="ASR: end utterances after 2 s below a fixed energy threshold (the original endpointing) instead of adaptively.")
+    parser.add_argument("--asr-vad", action="store_true", help="ASR: apply Whisper's VAD filter to drop non-speech before decoding.")
+    parser.add_argument("--asr-benchmark", nargs="*", metavar="WAV",
+                        help="Compare the fixed and adaptive endpointing on wav fixtures (one utterance plus room tone each) and exit. "
+                             "Without files, synthetic fixtures are generated into audio/endpoint_fixtures/. "
+                             "With --asr each utterance is also transcribed and timed.")
+    parser.add_argument("--asr-replay", nargs="+", metavar="WAV",
+                        help="With --model: take the user turns from these wav files (one per turn) through the ASR path instead of the microphone.")
+    parser.add_argument("--n-jobs", type=int, default=1,
+                        help="Number of worker processes per Optuna study (studies are stored in model_tuning/artifacts/ and resume after interruption).")
+    parser.add_argument("--study-timeout", type=float,
+                        help="Wall-clock limit in seconds for each Optuna study.")
+    parser.add_argument("--workers", type=int,
+                        help="Number of processes for independent pipeline stages (default: all cores, 1 runs the stages sequentially).")
+    parser.add_argument("--nlu-port", type=int,
+                        help="With --model: run the batching dialogue-act classification service on this localhost port instead of the CLI.")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Classification service: maximum requests per predict call.")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="Classification service: maximum time a request waits for its batch.")
+    parser.add_argument("--dialogue-port", type=int,
+                        help="With --model: host concurrent dialogue sessions on this localhost port instead of the CLI.")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="Dialogue server: maximum concurrent sessions.")
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="Dialogue server: seconds of client inactivity before a session is closed.")
+    parser.add_argument("--max-pending", type=int, default=256,
+                        help="Dialogue server: maximum classification requests in flight, further sessions wait (backpressure).")
+    parser.add_argument("--simulate", type=int, metavar="N",
+                        help="With --model: run N headless dialogues with simulated users from random goals and print a report.")
+    parser.add_argument("--replay", nargs="+", metavar="TRANSCRIPT",
+                        help="With --model: replay the user turns of saved transcripts headlessly and print a report.")
+    parser.add_argument("--sim-concurrency", type=int, default=500, help="Simulator: dialogues run concurrently.")
+    parser.add_argument("--seed", type=int, help="Simulator: seed for the random user goals.")
+    parser.add_argument("--jsonl-transcripts", action="store_true",
+                        help="Also stream every dialogue turn to rotating JSONL files in saved_transcripts/ (background writer).")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Time every stage of each dialogue turn (type '!stats' in a dialogue to see the latencies).")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="With --metrics: write the metrics on exit, in Prometheus text format (or JSON if PATH ends in .json).")
+    parser.add_argument("--prerender-tts", action="store_true",
+                        help="Synthesize all fixed system prompts and restaurant descriptions into the TTS cache (audio/tts_cache/) and exit.")
+    parser.add_argument("--tts-cache-mb", type=float, default=256.0,
+                        help="Size of the TTS cache; the least recently played audio is evicted beyond it.")
+    parser.add_argument("--no-tts-cache", action="store_true", help="With --tts: synthesize every system turn again instead of using the TTS cache.")
+    parser.add_argument("--list-artifacts", action="store_true", help="List the stored models and studies and exit.")
+    parser.add_argument("--prune-artifacts", type=float, metavar="MAX_MB",
+                        help="Evict the least recently used models and studies until the store is at most MAX_MB, then exit.")
+    return parser.parse_args()
+
+
+#* ---------------- Pipeline stages ----------------
+# Each stage is a module-level function so the pipeline runner can execute it in a worker process.
+# Training dependencies are imported inside the stages so that serve mode never pays for them.
+
+def load_data_stage(data_filepath):
+    from data.corpus_cache import load_corpus, SPLIT_VARIANTS
+
+    # Load and preprocess the data, remove duplicates and split both variants
+    # (parsed once, later runs memory-map the cached corpus and split indices)
     print(f"Loading and preprocessing data... \n")
-    df_with_duplicates = load_and_preprocess_data(data_filepath)
-
-    # Remove duplicates
-    df_without_duplicates = df_with_duplicates.drop_duplicates(subset=['utterance'])
-    print(f"Created a copy of the data without duplicates. Total rows: {df_without_duplicates.shape[0]}")
+    corpus = load_corpus(data_filepath)
 
-    # Split the original data (with duplicates) ---------- Here is the data we use WITH duplicates ----------
-    print("\nSplitting original data (with duplicates)...")
-    (X_train_orig, X_val_orig, X_test_orig,
-     y_train_orig, y_val_orig, y_test_orig) = split_data(df_with_duplicates)
-    print(f"Original data split: Train={len(X_train_orig)}, Val={len(X_val_orig)}, Test={len(X_test_orig)}")
+    splits = []
+    for label in SPLIT_VARIANTS:
+        X_train, X_val, X_test = (corpus.indices(label, part) for part in ("train", "val", "test"))
+        print(f"{label.capitalize()} data split: Train={len(X_train)}, Val={len(X_val)}, Test={len(X_test)}")
+        splits.append(corpus.handle(label))
+    return tuple(splits)
 
-    # Split the deduplicated data ---------- Data WITHOUT duplicates ----------
-    print("\nSplitting deduplicated data...")
-    (X_train_dedup, X_val_dedup, X_test_dedup,
-     y_train_dedup, y_val_dedup, y_test_dedup) = split_data(df_without_duplicates)
-    print(f"Deduplicated data split: Train={len(X_train_dedup)}, Val={len(X_val_dedup)}, Test={len(X_test_dedup)}")
 
+def baselines_stage(split, label):
+    from sklearn.metrics import accuracy_score
+    import models.baseline_systems as baseline
 
-    #* ------------- Baselines ---------------
-    print("\n" + DASHED_LINE + "\nBaselines\n" + DASHED_LINE)
+    X_train, X_val, X_test, y_train, y_val, y_test = split.load()
+    print("\n" + DASHED_LINE + f"\nBaselines ({label})\n" + DASHED_LINE)
 
     # --- Majority Baseline ---
-    print("--- Majority Baseline ---")
-
-    # On original data
-    majority_model_orig = baseline.MajorityBaseline()
-    majority_model_orig.fit(y_train_orig)
-    y_pred_maj_orig = majority_model_orig.predict(X_test_orig)
-    accuracy_maj_orig = accuracy_score(y_test_orig, y_pred_maj_orig)
-    print(f"Majority Baseline Accuracy (original): {accuracy_maj_orig:.4f}")
-
-    # On deduplicated data
-    majority_model_dedup = baseline.MajorityBaseline()
-    majority_model_dedup.fit(y_train_dedup)
-    y_pred_maj_dedup = majority_model_dedup.predict(X_test_dedup)
-    accuracy_maj_dedup = accuracy_score(y_test_dedup, y_pred_maj_dedup)
-    print(f"Majority Baseline Accuracy (deduplicated): {accuracy_maj_dedup:.4f}")
+    majority_model = baseline.MajorityBaseline()
+    majority_model.fit(y_train)
+    accuracy_majority = accuracy_score(y_test, majority_model.predict(X_test))
+    print(f"Majority Baseline Accuracy ({label}): {accuracy_majority:.4f}")
 
     # --- Rule-Based Baseline ---
-    print("\n--- Rule-Based Baseline ---")
-    # On original data
-    rule_model_orig = baseline.RuleBasedBaseline()
-    y_pred_rule_orig = rule_model_orig.predict(X_test_orig)
-    accuracy_rule_orig = accuracy_score(y_test_orig, y_pred_rule_orig)
-    print(f"Rule-Based Baseline Accuracy (original): {accuracy_rule_orig:.4f}")
+    rule_model = baseline.RuleBasedBaseline()
+    accuracy_rule = accuracy_score(y_test, rule_model.predict(X_test))
+    print(f"Rule-Based Baseline Accuracy ({label}): {accuracy_rule:.4f}")
 
-    # On deduplicated data
-    rule_model_dedup = baseline.RuleBasedBaseline()
-    y_pred_rule_dedup = rule_model_dedup.predict(X_test_dedup)
-    accuracy_rule_dedup = accuracy_score(y_test_dedup, y_pred_rule_dedup)
-    print(f"Rule-Based Baseline Accuracy (deduplicated): {accuracy_rule_dedup:.4f}")
+    return {"majority": accuracy_majority, "rule": accuracy_rule}
 
 
+def logreg_stage(split, label, n_jobs, study_timeout):
     #* --------- Classifier 1: Logistic Regression ------------
-    print("\n" + DASHED_LINE + "\nClassifier 1: Logistic Regression\n" + DASHED_LINE)
+    from models.logistic_regression import run_logreg_optimization
 
-    # Run with original data
-    logreg_original_model, logreg_metrics_original = run_logreg_optimization(
-        X_train_orig, X_val_orig, X_test_orig,
-        y_train_orig, y_val_orig, y_test_orig,
-        "original"
-    )
-
-    # Run with deduplicated data
-    logreg_deduplicated_model, logreg_metrics_deduplicated = run_logreg_optimization(
-        X_train_dedup, X_val_dedup, X_test_dedup,
-        y_train_dedup, y_val_dedup, y_test_dedup,
-        "deduplicated"
-    )
+    X_train, X_val, X_test, y_train, y_val, y_test = split.load()
+    print("\n" + DASHED_LINE + "\nClassifier 1: Logistic Regression\n" + DASHED_LINE)
+    return run_logreg_optimization(X_train, X_val, X_test, y_train, y_val, y_test, label, n_jobs=n_jobs, timeout=study_timeout)
 
-    systems_overview.add_system_results("Logistic Regression", logreg_metrics_original, logreg_metrics_deduplicated)
 
+def nb_stage(split, label, n_jobs, study_timeout):
     #* --------- Classifier 2: Multinomial Naive Bayes ------------
-    print("\n" + DASHED_LINE + "\nClassifier 2: Multinomial Naive Bayes\n" + DASHED_LINE)
-
-    # On the original data
-    multinomial_nb_model_original, multinomial_nb_metrics_original = run_nb_optimization(
-        X_train_orig, y_train_orig, X_val_orig, y_val_orig, X_test_orig, y_test_orig, "original"
-    )
+    from models.multinomial_naive_bayes import run_nb_optimization
 
-    # On the deduplicated data
-    multinomial_nb_model_deduplicated, multinomial_nb_metrics_deduplicated = run_nb_optimization(
-        X_train_dedup, y_train_dedup, X_val_dedup, y_val_dedup, X_test_dedup, y_test_dedup, "deduplicated"
-    )
+    X_train, X_val, X_test, y_train, y_val, y_test = split.load()
+    print("\n" + DASHED_LINE + "\nClassifier 2: Multinomial Naive Bayes\n" + DASHED_LINE)
+    return run_nb_optimization(X_train, y_train, X_val, y_val, X_test, y_test, label, n_jobs=n_jobs, timeout=study_timeout)
 
-    systems_overview.add_system_results("Multinomial Naive Bayes", multinomial_nb_metrics_original, multinomial_nb_metrics_deduplicated)
 
+def svm_stage(split, label, n_jobs, study_timeout):
     #* --------- Classifier 3: Support Vector Machine (SVM) ------------
+    from models.svm import run_svm_optimization
+
+    X_train, X_val, X_test, y_train, y_val, y_test = split.load()
     print("\n" + DASHED_LINE + "\nClassifier 3: Support Vector Machine\n" + DASHED_LINE)
+    return run_svm_optimization(X_train, X_val, X_test, y_train, y_val, y_test, label, n_jobs=n_jobs, timeout=study_timeout)
+
 
-    # Call the function for the original data
-    svm_original_model, svm_metrics_original = run_svm_optimization(
-        X_train_orig, X_val_orig, X_test_orig,
-        y_train_orig, y_val_orig, y_test_orig,
-        "original"
-    )
-
-    # Call the function for the deduplicated data
-    svm_deduplicated_model, svm_metrics_deduplicated = run_svm_optimization(
-        X_train_dedup, X_val_dedup, X_test_dedup,
-        y_train_dedup, y_val_dedup, y_test_dedup,
-        "deduplicated"
-    )
-
-    systems_overview.add_system_results("SVM", svm_metrics_original, svm_metrics_deduplicated)
-    
+def dt_stage(split, label, n_jobs, study_timeout):
     #* --------- Classifier 4: Decision Tree ------------
-    print("\n" + DASHED_LINE +"\nClassifier 4: Decision Tree\n" + DASHED_LINE)
+    from models.decision_tree import run_dt_optimization
 
-    # Once for the original data
-    decision_tree_model_original, decision_tree_metrics_original = run_dt_optimization(X_train_orig, y_train_orig, X_val_orig, y_val_orig, X_test_orig, y_test_orig, "original")
+    X_train, X_val, X_test, y_train, y_val, y_test = split.load()
+    print("\n" + DASHED_LINE + "\nClassifier 4: Decision Tree\n" + DASHED_LINE)
+    return run_dt_optimization(X_train, y_train, X_val, y_val, X_test, y_test, label, n_jobs=n_jobs, timeout=study_timeout)
 
-    # Once for deduplicated data
-    decision_tree_model_deduplicated, decision_tree_metrics_deduplicated = run_dt_optimization(X_train_dedup, y_train_dedup, X_val_dedup, y_val_dedup, X_test_dedup, y_test_dedup, "deduplicated")
 
-    systems_overview.add_system_results("Decision Tree", decision_tree_metrics_original, decision_tree_metrics_deduplicated)
+def summary_stage(baselines_original, baselines_deduplicated, logreg_original, logreg_deduplicated, nb_original, nb_deduplicated,
+                  svm_original, svm_deduplicated, dt_original, dt_deduplicated):
+    from utils.stats_retriever import SystemsOverview
+
+    systems_overview = SystemsOverview()
+    systems_overview.add_baseline_results("Majority Baseline", baselines_original["majority"], baselines_deduplicated["majority"])
+    systems_overview.add_baseline_results("Rule-Based Baseline", baselines_original["rule"], baselines_deduplicated["rule"])
+    systems_overview.add_system_results("Logistic Regression", logreg_original[1], logreg_deduplicated[1])
+    systems_overview.add_system_results("Multinomial Naive Bayes", nb_original[1], nb_deduplicated[1])
+    systems_overview.add_system_results("SVM", svm_original[1], svm_deduplicated[1])
+    systems_overview.add_system_results("Decision Tree", dt_original[1], dt_deduplicated[1])
 
     #* ------ Evaluation ---------
     print("\nEvaluation on custom test set:\n" + DASHED_LINE)
@@ -156,36 +170,251 @@ if __name__ == "__main__":
     X_test = [item[0] for item in custom_test_set]
     y_test = [item[1] for item in custom_test_set]
 
-    y_pred_decision_tree_custom = decision_tree_model_deduplicated.predict(X_test)
+    y_pred_decision_tree_custom = dt_deduplicated[0].predict(X_test)
     print("Decision Tree (input output):", y_test, y_pred_decision_tree_custom)
 
     print("\n" + DASHED_LINE + "\nFinal results summary:")
     systems_overview.print_results_table()
 
-    #*---------------------- Interactive Dialogue System --------------------------
     # Store of the trained models (on DEDUPLICATED data)
-    models = {
-        "Logistic Regression": logreg_deduplicated_model,
-        "Multinomial Naive Bayes": multinomial_nb_model_deduplicated,
-        "SVM": svm_deduplicated_model,
-        "Decision Tree": decision_tree_model_deduplicated
+    return {
+        "Logistic Regression": logreg_deduplicated[0],
+        "Multinomial Naive Bayes": nb_deduplicated[0],
+        "SVM": svm_deduplicated[0],
+        "Decision Tree": dt_deduplicated[0]
     }
 
-    # Initialize all the components for the dialogue system
-    print("\n" + DASHED_LINE)
-    print("Initializing dialogue system components...")
-    
+
+def build_training_stages(data_filepath, n_jobs=1, study_timeout=None):
+    """Declares the training/evaluation pipeline as a DAG of stages with named inputs and outputs."""
+    from utils.pipeline_runner import Stage
+
+    def source(*paths):
+        return tuple(os.path.join(os.path.dirname(__file__), path) for path in paths)
+
+    # Trainer modules share the feature store and the tuning helper, so changes there invalidate the cached results too
+    shared_code = source("models/feature_store.py", "models/tuning.py", "models/model_loader.py",
+                         "utils/artifact_store.py", "utils/stats_retriever.py")
+    study_options = {"n_jobs": n_jobs, "study_timeout": study_timeout}
+    stages = [
+        # The corpus cache is keyed by the data file and split parameters itself and the stage output is only a pair of
+        # references into it, so this stage always runs (it takes milliseconds once the corpus is cached)
+        Stage("load_data", load_data_stage, inputs=(), outputs=("split_original", "split_deduplicated"),
+              kwargs={"data_filepath": data_filepath}, cache=False),
+    ]
+    for label in ("original", "deduplicated"):
+        split = f"split_{label}"
+        stages += [
+            Stage(f"baselines_{label}", baselines_stage, inputs=(split,), outputs=(f"baselines_{label}",),
+                  kwargs={"label": label}, code=source("models/baseline_systems.py")),
+            Stage(f"logreg_{label}", logreg_stage, inputs=(split,), outputs=(f"logreg_{label}",),
+                  kwargs={"label": label}, options=study_options, code=source("models/logistic_regression.py") + shared_code),
+            Stage(f"nb_{label}", nb_stage, inputs=(split,), outputs=(f"nb_{label}",),
+                  kwargs={"label": label}, options=study_options, code=source("models/multinomial_naive_bayes.py") + shared_code),
+            Stage(f"svm_{label}", svm_stage, inputs=(split,), outputs=(f"svm_{label}",),
+                  kwargs={"label": label}, options=study_options, code=source("models/svm.py") + shared_code),
+            Stage(f"dt_{label}", dt_stage, inputs=(split,), outputs=(f"dt_{label}",),
+                  kwargs={"label": label}, options=study_options, code=source("models/decision_tree.py") + shared_code),
+        ]
+    stages.append(Stage("summary", summary_stage, outputs=("models",), cache=False, inputs=tuple(
+        f"{model}_{label}" for model in ("baselines", "logreg", "nb", "svm", "dt") for label in ("original", "deduplicated")
+    )))
+    return stages
+
+
+def run_training_pipeline(n_jobs=1, study_timeout=None, workers=None):
+    """
+    Loads the data, runs the baselines, trains/evaluates all four classifiers and prints the summary.
+    Independent stages run concurrently on `workers` processes and unchanged stages are skipped.
+    n_jobs and study_timeout are passed on to the Optuna studies.
+    Returns the models trained on the deduplicated data.
+    """
+    from utils.pipeline_runner import PipelineRunner
+
+    data_filepath = os.path.join(os.path.dirname(__file__), './data/dialog_acts.dat')
+    runner = PipelineRunner(build_training_stages(data_filepath, n_jobs, study_timeout), max_workers=workers)
+    values = runner.run()
+    runner.print_report()
+    return values["models"]
+
+
+def build_dialogue_components():
+    """Creates the restaurant manager and searcher used by the dialogue system."""
+    from dialogue_system.keyword_searcher import RestaurantSearcher
+    from dialogue_system.restaurant_manager import RestaurantManager
+    from dialogue_system.restaurant_reader import RestaurantReader
+
     # Create the restaurant reader
     restaurant_reader = RestaurantReader(os.path.join(os.path.dirname(__file__), './data/restaurant_info.csv'))
-    
-    # Load restaurants and create the manager
-    restaurant_manager = RestaurantManager(restaurant_reader.read_restaurants())
-    
+
+    # Load restaurants (column-oriented) and create the manager
+    restaurant_manager = RestaurantManager(restaurant_reader.read_store())
+
     # Create the searcher
     restaurant_searcher = RestaurantSearcher(restaurant_manager)
-    
-    print("Components initialized for Dialogue System.")
-    
-    # Start the main CLI, passing all components
-    start_cli(models, restaurant_manager, restaurant_searcher)
 
+    return restaurant_manager, restaurant_searcher
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    timer = StageTimer()
+
+    if args.list_artifacts or args.prune_artifacts is not None:
+        from utils.artifact_store import artifact_store
+
+        if args.prune_artifacts is not None:
+            removed = artifact_store.prune(int(args.prune_artifacts * 1024 * 1024))
+            print(f"Removed {len(removed)} artifact(s).")
+        artifact_store.print_entries()
+        raise SystemExit(0)
+
+    from dialogue_system.tts_cache import tts_cache
+    tts_cache.store.max_bytes = int(args.tts_cache_mb * 1024 * 1024)
+    tts_cache.enabled = not args.no_tts_cache
+
+    from functools import partial
+    from dialogue_system.audio_capture import Endpointer, HANGOVER_SECONDS
+    from dialogue_system.speech_resources import speech_resources
+    speech_resources.vad_filter = args.asr_vad
+    speech_resources.endpointer_factory = Endpointer.fixed if args.asr_fixed_endpointing else partial(Endpointer, hangover_seconds=args.asr_hangover)
+
+    if args.asr_benchmark is not None:
+        # Offline: needs only the wav fixtures (and the Whisper model with --asr)
+        from dialogue_system.endpoint_benchmark import benchmark_endpointing, print_benchmark, write_synthetic_fixtures, ENDPOINTERS
+
+        endpointers = dict(ENDPOINTERS)
+        if not args.asr_fixed_endpointing and args.asr_hangover != HANGOVER_SECONDS:
+            endpointers[f"adaptive ({args.asr_hangover}s)"] = speech_resources.endpointer_factory
+        transcribe = None
+        if args.asr:
+            from dialogue_system.channels import transcribe
+        paths = args.asr_benchmark or write_synthetic_fixtures(os.path.join("audio", "endpoint_fixtures"))
+        print_benchmark(benchmark_endpointing(paths, endpointers, transcribe))
+        raise SystemExit(0)
+
+    if args.prerender_tts:
+        # Offline: needs only the restaurant database, not the classifiers
+        import asyncio
+        from dialogue_system.tts_cache import static_texts
+
+        restaurant_manager, _ = build_dialogue_components()
+        try:
+            rendered, cached = asyncio.run(tts_cache.prerender(static_texts(restaurant_manager)))
+        except ImportError as e:
+            raise SystemExit(f"Cannot pre-render TTS: {e}")
+        print(f"Pre-rendered {rendered} system turns ({cached} were already cached).")
+        tts_cache.print_report()
+        raise SystemExit(0)
+
+    if args.serve:
+        # Serve mode: go straight from the latest stored pipelines to the CLI, the training data is never read
+        from models.model_loader import load_cached_models
+
+        with timer.stage("Load cached models"):
+            try:
+                models = load_cached_models("deduplicated")
+            except FileNotFoundError as e:
+                raise SystemExit(str(e))
+    else:
+        with timer.stage("Training and evaluation"):
+            models = run_training_pipeline(n_jobs=args.n_jobs, study_timeout=args.study_timeout, workers=args.workers)
+
+    #*---------------------- Interactive Dialogue System --------------------------
+    # Initialize all the components for the dialogue system
+    print("\n" + DASHED_LINE)
+    print("Initializing dialogue system components...")
+
+    with timer.stage("Dialogue system components"):
+        restaurant_manager, restaurant_searcher = build_dialogue_components()
+
+    with timer.stage("CLI imports"):
+        from cli import start_cli, start_dialogue_system
+
+    if args.metrics:
+        from utils.metrics import metrics
+        metrics.enable()
+        if args.metrics_file:
+            import atexit
+
+            def write_metrics_file():
+                with open(args.metrics_file, "w") as f:
+                    f.write(metrics.to_json() if args.metrics_file.endswith(".json") else metrics.prometheus_text())
+            atexit.register(write_metrics_file)
+
+    transcript_writer = None
+    if args.jsonl_transcripts:
+        from utils.transcript_writer import TranscriptWriter
+        transcript_writer = TranscriptWriter().start()
+
+    print("Components initialized for Dialogue System.")
+    timer.print_breakdown()
+
+    if args.model and args.nlu_port:
+        from models.classification_service import BatchingClassifier, ClassificationServer
+
+        model_name = MODEL_CHOICES[args.model]
+        service = BatchingClassifier(models[model_name], max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms).start()
+        with ClassificationServer(service, port=args.nlu_port) as server:
+            print(f"Serving '{model_name}' classifications on 127.0.0.1:{args.nlu_port} (Ctrl+C to stop)")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                print(f"\nClassification service stats: {service.stats()}")
+        service.stop()
+    elif args.model and args.dialogue_port:
+        import asyncio
+        from models.classification_service import BatchingClassifier
+        from dialogue_system.dialogue_server import DialogueServer
+
+        model_name = MODEL_CHOICES[args.model]
+        service = BatchingClassifier(models[model_name], max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+        server = DialogueServer(service, restaurant_manager, restaurant_searcher, port=args.dialogue_port,
+                                max_sessions=args.max_sessions, idle_timeout=args.idle_timeout, max_pending=args.max_pending,
+                                transcript_writer=transcript_writer)
+
+        async def serve_dialogues():
+            await server.start()
+            print(f"Serving dialogue sessions with '{model_name}' on 127.0.0.1:{server.port} (Ctrl+C to stop)")
+            await server.serve_forever()
+
+        try:
+            asyncio.run(serve_dialogues())
+        except KeyboardInterrupt:
+            print(f"\nDialogue server stats: {server.stats()}")
+        service.stop()
+    elif args.model and (args.simulate or args.replay):
+        import asyncio
+        from dialogue_system.simulator import DialogueSimulator, read_transcript
+
+        model_name = MODEL_CHOICES[args.model]
+        simulator = DialogueSimulator(models[model_name], restaurant_manager, restaurant_searcher,
+                                      concurrency=args.sim_concurrency, seed=args.seed,
+                                      transcript_writer=transcript_writer)
+        if args.replay:
+            from utils.transcript_writer import read_jsonl_transcripts
+
+            # .txt transcripts hold one dialogue, JSONL files (possibly gzipped and rotated) many sessions
+            jsonl_paths = [path for path in args.replay if path.endswith((".jsonl", ".jsonl.gz"))]
+            scripts = [read_transcript(path) for path in args.replay if path not in jsonl_paths]
+            scripts.extend(read_jsonl_transcripts(*jsonl_paths).values())
+            report = asyncio.run(simulator.run_scripts(scripts))
+        else:
+            report = asyncio.run(simulator.run_goals(args.simulate))
+        report.print_report()
+        if args.metrics:
+            print()
+            metrics.print_table()
+    elif args.model:
+        model_name = MODEL_CHOICES[args.model]
+        print(f"(Using '{model_name}' for dialogue act classification)")
+        input_channel = None
+        if args.asr_replay:
+            from dialogue_system.audio_capture import AudioCapture, FileReplaySource
+            from dialogue_system.channels import ASRInput
+            input_channel = ASRInput(AudioCapture(FileReplaySource(args.asr_replay), speech_resources.endpointer_factory()))
+        start_dialogue_system(models[model_name], restaurant_manager, restaurant_searcher, use_asr=args.asr, use_tts=args.tts,
+                              transcript_writer=transcript_writer, input_channel=input_channel)
+    else:
+        # Start the main CLI, passing all components
+        start_cli(models, restaurant_manager, restaurant_searcher, transcript_writer)
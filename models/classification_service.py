@@ -0,0 +1,177 @@
+import asyncio
+import json
+import queue
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+
+@dataclass
+class ClassificationResult:
+    """The predicted dialogue act for one request, with its end-to-end latency and the size of the batch it ran in."""
+    label: str
+    latency_ms: float
+    batch_size: int
+
+
+class BatchingClassifier:
+    """
+    In-process micro-batching service around a trained sklearn pipeline (or any object with a `predict` method).
+    Requests from many sessions are queued and classified together with a single `predict` call,
+    so the vectorizer/classifier overhead is paid once per batch instead of once per utterance.
+
+    A batch is run as soon as it holds `max_batch_size` requests or the oldest request has waited `max_wait_ms`.
+    """
+    def __init__(self, model, max_batch_size=32, max_wait_ms=2.0, latency_window=10000):
+        if not hasattr(model, "predict"):
+            raise TypeError("model must provide a predict method")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.requests_served = 0
+        self.batches_run = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._stats_lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="batching-classifier", daemon=True)
+                self._worker.start()
+        return self
+
+    def stop(self):
+        """Stops the worker after the already queued requests have been served."""
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # --- Requests ---
+    def submit(self, text):
+        """Queues a single utterance and returns a Future resolving to a ClassificationResult."""
+        future = Future()
+        self._queue.put((text, time.perf_counter(), future))
+        if self._worker is None or not self._worker.is_alive():
+            self.start()
+        return future
+
+    def classify(self, text):
+        """Classifies a single utterance, blocking until its batch has run."""
+        return self.submit(text).result()
+
+    async def aclassify(self, text):
+        """Classifies a single utterance from a coroutine, suspending it (not the event loop) until its batch has run."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def predict(self, X):
+        """sklearn-compatible predict, so the service can be used wherever a pipeline is expected."""
+        futures = [self.submit(text) for text in X]
+        return [future.result().label for future in futures]
+
+    # --- Worker ---
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = first[1] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Re-queue the stop marker so the main loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            # Requests whose caller gave up (e.g. a cancelled aclassify) are dropped; the rest can no longer be cancelled
+            batch = [item for item in self._collect_batch(first) if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for text, _, _ in batch]
+            try:
+                labels = self.model.predict(texts)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            latencies = [(finished - submitted) * 1000 for _, submitted, _ in batch]
+            with self._stats_lock:
+                self.batches_run += 1
+                self.requests_served += len(batch)
+                self._latencies.extend(latencies)
+
+            for (_, _, future), label, latency_ms in zip(batch, labels, latencies):
+                future.set_result(ClassificationResult(str(label), latency_ms, len(batch)))
+
+    # --- Statistics ---
+    def latency_percentiles(self, percentiles=(50, 90, 99)):
+        """Returns the nearest-rank latency percentiles (ms) over the most recent requests."""
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return {f"p{p}": 0.0 for p in percentiles}
+        return {f"p{p}": latencies[min(len(latencies) - 1, max(0, int(round(p / 100 * len(latencies))) - 1))] for p in percentiles}
+
+    def stats(self):
+        with self._stats_lock:
+            requests_served, batches_run = self.requests_served, self.batches_run
+        return {
+            "requests": requests_served,
+            "batches": batches_run,
+            "mean_batch_size": requests_served / batches_run if batches_run else 0.0,
+            "latency_ms": self.latency_percentiles(),
+        }
+
+
+class _ClassificationRequestHandler(socketserver.StreamRequestHandler):
+    """Line protocol: each line is an utterance, each reply one JSON line. The line '!stats' returns service statistics."""
+    def handle(self):
+        for raw_line in self.rfile:
+            text = raw_line.decode("utf-8").strip()
+            if not text:
+                continue
+            if text == "!stats":
+                reply = self.server.service.stats()
+            else:
+                result = self.server.service.classify(text.lower())
+                reply = {"label": result.label, "latency_ms": result.latency_ms, "batch_size": result.batch_size}
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+
+class ClassificationServer(socketserver.ThreadingTCPServer):
+    """Exposes a BatchingClassifier over a local TCP socket, one thread per connected client."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, service, host="127.0.0.1", port=8765):
+        super().__init__((host, port), _ClassificationRequestHandler)
+        self.service = service
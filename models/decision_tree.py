@@ -1,72 +1,77 @@
-import os
-import joblib
 from sklearn.tree import DecisionTreeClassifier
-from sklearn.metrics import  classification_report, accuracy_score
+from sklearn.metrics import  classification_report
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import GridSearchCV
-from sklearn.model_selection import KFold
 import pandas as pd
+from models.feature_store import feature_store
+from models.tuning import run_stored_study, evaluate_with_budgets, BUDGET_FRACTIONS
+from models.model_loader import model_artifact_name, trainer_artifact_keys
+from utils.artifact_store import artifact_store
 from utils.stats_retriever import get_stats
 
+
+def dt_objective(trial, X_train_tfidf, y_train, X_val_tfidf, y_val):
+    """Objective function for Optuna (module level so the parallel study workers can run it)."""
+    # Same hyperparameters as the former grid search, searched over the full ranges
+    max_depth = trial.suggest_int('max_depth', 1, 15)
+    min_samples_split = trial.suggest_int('min_samples_split', 2, 5)
+    criterion = trial.suggest_categorical('criterion', ['gini', 'entropy'])
+
+    def make_tree():
+        return DecisionTreeClassifier(max_depth=max_depth, min_samples_split=min_samples_split, criterion=criterion, random_state=42)
+
+    # Trained on growing subsets of the train set, pruned early when falling behind
+    return evaluate_with_budgets(trial, make_tree, X_train_tfidf, y_train, X_val_tfidf, y_val)
+
+
 # Convert text (sentences) into TF-IDF vectors because decision trees do not handle text input directly but need numerical input
-# https://machinelearningmastery.com/making-sense-of-text-with-decision-trees/ 
-def run_dt_optimization(X_train, y_train, X_val, y_val, X_test, y_test, label):
+# https://machinelearningmastery.com/making-sense-of-text-with-decision-trees/
+def run_dt_optimization(X_train, y_train, X_val, y_val, X_test, y_test, label, n_trials=30, n_jobs=1, timeout=None):
     print(f"\n--- Running Decision Tree for '{label}' data ---")
 
-    model_filename = f"dt_model_{label}.pkl"
-    model_filepath = os.path.join(os.path.dirname(__file__), model_filename)
-    study_filename = f"grid_search_dt_{label}.pkl"
-    study_filepath = os.path.join("model_tuning", study_filename)
+    model_name = model_artifact_name("dt", label)
     model_type = "Decision Tree"
+    # Content-addressed: the key changes with the data split, search settings and trainer code, so stale models are never reused
+    model_key, study_key = trainer_artifact_keys("dt", __file__, X_train, y_train, X_val, y_val,
+                                                 n_trials=n_trials, budgets=BUDGET_FRACTIONS)
 
-    # Check if the final trained model already exists
-    if os.path.exists(model_filepath):
-        print(f"Loading pre-trained model from {model_filepath}")
-        best_model = joblib.load(model_filepath)
+    # Check if a model trained on exactly these inputs already exists
+    if artifact_store.has(model_key):
+        print(f"Loading pre-trained model {model_name} ({model_key})")
+        best_model = artifact_store.load(model_key)
     else:
-        print(f"No pre-trained model found at {model_filepath}. Training a new one.")
+        print(f"No pre-trained model {model_name} for the current inputs ({model_key}). Training a new one.")
         # Ensure text data has no NaN values
         X_train = pd.Series(X_train).fillna("").astype(str).tolist()
         X_val = pd.Series(X_val).fillna("").astype(str).tolist()
-        
+
+        # Vectorize through the shared feature store: fit on train, transform val
+        _, (X_train_tfidf, X_val_tfidf) = feature_store.featurize(TfidfVectorizer(), X_train, X_val)
+
+        # Run (or resume) the study on the shared multi-fidelity tuning engine
+        print(f"Running Optuna optimization for {model_type} on {label} data with {n_trials} trials...")
+        study = run_stored_study("dt", label, study_key, dt_objective, X_train_tfidf, y_train, X_val_tfidf, y_val, n_trials=n_trials, n_jobs=n_jobs, timeout=timeout)
+        print(f"\nBest parameters for {label}: {study.best_params}")
+
         # Merge train + val
         X_combined = X_train + X_val
         y_combined = list(y_train) + list(y_val)
 
-        pipeline = Pipeline([
-            ("tfidf", TfidfVectorizer()),
-            ("clf", DecisionTreeClassifier(random_state=42))
+        # Retrain the best tree on train + val, reusing the cached TF-IDF features
+        vectorizer, (X_combined_tfidf,) = feature_store.featurize(TfidfVectorizer(), X_combined)
+        clf = DecisionTreeClassifier(random_state=42, **study.best_params)
+        clf.fit(X_combined_tfidf, y_combined)
+        best_model = Pipeline([
+            ("tfidf", vectorizer),
+            ("clf", clf)
         ])
 
-        # Caching: load previous study if available
-        if os.path.exists(study_filepath):
-            print(f"Loading existing study for {model_type} on {label} from {study_filepath}")
-            grid_search = joblib.load(study_filepath)
-        else:
-            print(f"No cached study found. Creating a new GridSearch study for {model_type} on {label} data.")
-            # Define hyperparameters to tune
-            param_grid = {
-                'clf__max_depth': [1, 5, 10, 15],
-                'clf__min_samples_split': [2, 3, 5],
-                'clf__criterion': ['gini', 'entropy']
-            }
-
-            grid_search = GridSearchCV(pipeline, param_grid, cv=KFold(5), scoring='accuracy', n_jobs=1) # Use 1 core to conserve memory
-            grid_search.fit(X_combined, y_combined)
-
-            joblib.dump(grid_search, study_filepath)
-            print(f"Saved GridSearch study to {study_filepath}")
-
-        best_model = grid_search.best_estimator_
-        print(f"\nBest parameters for {label}: {grid_search.best_params_}")
-
-        print(f"Saving newly trained model to {model_filepath}")
-        joblib.dump(best_model, model_filepath)
+        print(f"Saving newly trained model {model_name} ({model_key})")
+        artifact_store.save(model_key, model_name, best_model, metadata={"best_params": study.best_params})
 
     print(f"Evaluating best Decision Tree on {label} test set...")
     y_pred = best_model.predict(X_test)
-    
+
     # Generate report dictionary
     report = classification_report(y_test, y_pred, zero_division=0, output_dict=True)
 
@@ -0,0 +1,140 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+import joblib
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def fingerprint_texts(texts):
+    """Content hash of a sequence of strings (order-sensitive)."""
+    digest = hashlib.blake2b(digest_size=16)
+    count = 0
+    for text in texts:
+        digest.update(str(text).encode("utf-8"))
+        digest.update(b"\x00")
+        count += 1
+    digest.update(str(count).encode("ascii"))
+    return digest.hexdigest()
+
+
+def vectorizer_config_key(vectorizer):
+    """Stable identifier of an (unfitted) vectorizer's class and hyperparameters."""
+    config = {"class": type(vectorizer).__name__, "params": vectorizer.get_params()}
+    return hashlib.blake2b(json.dumps(config, sort_keys=True, default=repr).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def save_csr(directory, matrix):
+    """Writes a sparse matrix as compact CSR arrays (float32 data, int32 indices) that can be memory-mapped."""
+    matrix = csr_matrix(matrix)
+    index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "data.npy"), matrix.data.astype(np.float32, copy=False))
+    np.save(os.path.join(directory, "indices.npy"), matrix.indices.astype(index_dtype, copy=False))
+    np.save(os.path.join(directory, "indptr.npy"), matrix.indptr.astype(index_dtype, copy=False))
+    np.save(os.path.join(directory, "shape.npy"), np.asarray(matrix.shape, dtype=np.int64))
+
+
+def load_csr(directory, mmap=True):
+    """Loads a matrix written by save_csr. With mmap=True the arrays are shared, read-only pages of the file."""
+    mmap_mode = "r" if mmap else None
+    data = np.load(os.path.join(directory, "data.npy"), mmap_mode=mmap_mode)
+    indices = np.load(os.path.join(directory, "indices.npy"), mmap_mode=mmap_mode)
+    indptr = np.load(os.path.join(directory, "indptr.npy"), mmap_mode=mmap_mode)
+    shape = tuple(int(n) for n in np.load(os.path.join(directory, "shape.npy")))
+    return csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+class FeatureStore:
+    """
+    Caches fitted vectorizers and the sparse feature matrices they produce, keyed by
+    (vectorizer config, fingerprint of the fitting texts[, fingerprint of the transformed texts]).
+    Entries are kept in memory for the current run and persisted on disk for later runs,
+    so every trainer that uses the same vectorizer settings on the same data tokenizes it only once.
+    """
+    def __init__(self, cache_dir=os.path.join("model_tuning", "features")):
+        self.cache_dir = cache_dir
+        self._memory = {}
+        self._locations = {}
+        self._lock = threading.Lock()
+
+    def _load(self, directory):
+        matrix = load_csr(directory)
+        self._locations[id(matrix)] = directory
+        return matrix
+
+    def location_of(self, matrix):
+        """The on-disk directory of a matrix returned by this store (None for other matrices)."""
+        return self._locations.get(id(matrix))
+
+    def _entry_dir(self, *key_parts):
+        return os.path.join(self.cache_dir, *key_parts)
+
+    def _write_atomically(self, target_dir, write):
+        """Writes into a temporary sibling directory and renames it into place, so readers never see partial entries."""
+        os.makedirs(os.path.dirname(target_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(target_dir), prefix=".tmp-")
+        try:
+            write(tmp_dir)
+            os.replace(tmp_dir, target_dir)
+        except OSError:
+            # Another process published the same entry first, which is just as good
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(target_dir):
+                raise
+
+    def _fit(self, vectorizer, X_fit, fit_key):
+        fit_dir = self._entry_dir(fit_key)
+        if os.path.exists(os.path.join(fit_dir, "vectorizer.joblib")):
+            return joblib.load(os.path.join(fit_dir, "vectorizer.joblib")), self._load(os.path.join(fit_dir, "matrix"))
+
+        print(f"[FeatureStore] Fitting {type(vectorizer).__name__} on {len(X_fit)} texts ({fit_key})")
+        matrix = vectorizer.fit_transform(X_fit)
+
+        def write(directory):
+            joblib.dump(vectorizer, os.path.join(directory, "vectorizer.joblib"))
+            save_csr(os.path.join(directory, "matrix"), matrix)
+
+        self._write_atomically(fit_dir, write)
+        return vectorizer, self._load(os.path.join(fit_dir, "matrix"))
+
+    def _transform(self, vectorizer, X, fit_key, text_key):
+        matrix_dir = self._entry_dir(fit_key, "transform", text_key)
+        if not os.path.isdir(matrix_dir):
+            matrix = vectorizer.transform(X)
+            self._write_atomically(matrix_dir, lambda directory: save_csr(directory, matrix))
+        return self._load(matrix_dir)
+
+    def featurize(self, vectorizer, X_fit, *X_transform):
+        """
+        Fits `vectorizer` on X_fit (or reuses a cached fit) and returns (fitted_vectorizer, [X_fit_matrix, *transformed]).
+        The returned matrices are float32 CSR matrices backed by read-only memory maps.
+        """
+        fit_fingerprint = fingerprint_texts(X_fit)
+        fit_key = f"{vectorizer_config_key(vectorizer)}-{fit_fingerprint}"
+
+        with self._lock:
+            if fit_key not in self._memory:
+                self._memory[fit_key] = self._fit(vectorizer, X_fit, fit_key)
+            fitted_vectorizer, fit_matrix = self._memory[fit_key]
+
+            matrices = [fit_matrix]
+            for X in X_transform:
+                text_key = fingerprint_texts(X)
+                if text_key == fit_fingerprint:
+                    matrices.append(fit_matrix)
+                    continue
+                memory_key = (fit_key, text_key)
+                if memory_key not in self._memory:
+                    self._memory[memory_key] = self._transform(fitted_vectorizer, X, fit_key, text_key)
+                matrices.append(self._memory[memory_key])
+
+        return fitted_vectorizer, matrices
+
+
+# Shared by all trainers in this process
+feature_store = FeatureStore()
@@ -1,99 +1,91 @@
-import os
-import joblib
-import optuna
 import pandas as pd
 
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.pipeline import Pipeline
 from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import classification_report, accuracy_score
-from scipy.sparse import vstack
+from sklearn.metrics import classification_report
+from models.feature_store import feature_store
+from models.tuning import run_stored_study, evaluate_with_budgets, BUDGET_FRACTIONS
+from models.model_loader import model_artifact_name, trainer_artifact_keys
+from utils.artifact_store import artifact_store
 from utils.stats_retriever import get_stats
 
-def run_logreg_optimization(X_train, X_val, X_test, y_train, y_val, y_test, data_type_name, n_trials=50):
+def logreg_objective(trial, X_train_bow, y_train, X_val_bow, y_val):
+    """Optuna objective (module level so the parallel study workers can run it)."""
+    # Hyperparameter search space
+    c = trial.suggest_float("C", 1e-3, 1e2, log=True)   # Regularization strength
+    penalty = trial.suggest_categorical("penalty", ["l1", "l2"])  
+    solver = "liblinear" if penalty == "l1" else "lbfgs"
+
+    def make_logreg():
+        return LogisticRegression(
+            C=c,
+            penalty=penalty,
+            solver=solver,
+            random_state=42,
+            max_iter=1000,
+            class_weight="balanced"  # to handle class imbalance
+        )
+
+    # Trained on growing subsets of the train set, pruned early when falling behind
+    return evaluate_with_budgets(trial, make_logreg, X_train_bow, y_train, X_val_bow, y_val)
+
+def run_logreg_optimization(X_train, X_val, X_test, y_train, y_val, y_test, data_type_name, n_trials=50, n_jobs=1, timeout=None):
     """
     Performs hyperparameter optimization using Optuna for a Logistic Regression classifier.
     Includes vectorization, optimization, training, and evaluation.
-    Saves and loads studies for reproducibility.
+    Studies are kept in the local study storage, so they are reproducible and resumable;
+    n_jobs sets the number of worker processes and timeout the wall-clock limit (seconds) of the study.
     """
     print(f"\n--- Running Logistic Regression for '{data_type_name}' data ---")
 
-    model_filename = f"logreg_model_{data_type_name}.pkl"
-    model_filepath = os.path.join(os.path.dirname(__file__), model_filename)
-    study_filename = f"optuna_study_logreg_{data_type_name}.pkl"
-    study_filepath = os.path.join("model_tuning", study_filename)
+    model_name = model_artifact_name("logreg", data_type_name)
     model_type = "Logistic Regression"
-
-    # Check if the final trained model already exists
-    if os.path.exists(model_filepath):
-        print(f"Loading pre-trained model from {model_filepath}")
-        pipeline = joblib.load(model_filepath)
+    # Content-addressed: the key changes with the data split, search settings and trainer code, so stale models are never reused
+    model_key, study_key = trainer_artifact_keys("logreg", __file__, X_train, y_train, X_val, y_val,
+                                                 n_trials=n_trials, budgets=BUDGET_FRACTIONS)
+
+    # Check if a model trained on exactly these inputs already exists
+    if artifact_store.has(model_key):
+        print(f"Loading pre-trained model {model_name} ({model_key})")
+        pipeline = artifact_store.load(model_key)
     else:
-        print(f"No pre-trained model found at {model_filepath}. Training a new one.")
-        # Vectorize text
-        vectorizer = CountVectorizer()
-        X_train_bow = vectorizer.fit_transform(X_train)
-        X_val_bow = vectorizer.transform(X_val)
-
-        # Caching: load previous study if available
-        if os.path.exists(study_filepath):
-            print(f"Loading existing study for {model_type} on {data_type_name} from {study_filepath}")
-            study = joblib.load(study_filepath)
-        else:
-            print(f"No cached study found. Creating a new Optuna study for {model_type} on {data_type_name} data.")
-
-            def objective(trial):
-                # Hyperparameter search space
-                c = trial.suggest_float("C", 1e-3, 1e2, log=True)   # Regularization strength
-                penalty = trial.suggest_categorical("penalty", ["l1", "l2"])  
-                solver = "liblinear" if penalty == "l1" else "lbfgs"
-
-                logreg = LogisticRegression(
-                    C=c,
-                    penalty=penalty,
-                    solver=solver,
-                    random_state=42,
-                    max_iter=1000,
-                    class_weight="balanced"  # to handle class imbalance
-                )
-
-                logreg.fit(X_train_bow, y_train)
-                y_pred = logreg.predict(X_val_bow)
-                return accuracy_score(y_val, y_pred)
-
-            study = optuna.create_study(direction="maximize")
-            print(f"Running Optuna optimization with {n_trials} trials...")
-            study.optimize(objective, n_trials=n_trials)
-
-            joblib.dump(study, study_filepath)
-            print(f"Saved Optuna study to {study_filepath}")
+        print(f"No pre-trained model {model_name} for the current inputs ({model_key}). Training a new one.")
+        # Vectorize text (shared with the other trainers through the feature store)
+        _, (X_train_bow, X_val_bow) = feature_store.featurize(CountVectorizer(), X_train, X_val)
+
+        # Run (or resume) the study
+        print(f"Running Optuna optimization for {model_type} on {data_type_name} data with {n_trials} trials...")
+        study = run_stored_study("logreg", data_type_name, study_key, logreg_objective, X_train_bow, y_train, X_val_bow, y_val, n_trials=n_trials, n_jobs=n_jobs, timeout=timeout)
 
         print(f"\nBest parameters for {data_type_name}: {study.best_params}")
 
         # Retrain best model on train+val
         print("Retraining Logistic Regression with best params on combined train+val...")
 
-        # Create a new pipeline with a vectorizer and the best Logistic Regression model
-        pipeline = Pipeline([
-            ('vectorizer', CountVectorizer()),
-            ('classifier', LogisticRegression(
-                random_state=42,
-                max_iter=1000,
-                class_weight="balanced",
-                **study.best_params,
-                solver="liblinear" if study.best_params.get("penalty") == "l1" else "lbfgs"
-            ))
-        ])
-
         # Combine the raw text data for final training
         X_train_val = pd.concat([X_train, X_val])
         y_train_val = pd.concat([y_train, y_val])
 
-        # Fit the entire pipeline on the combined raw text data
-        pipeline.fit(X_train_val, y_train_val)
+        # Reuse the cached vectorizer/features for train+val and only fit the classifier
+        vectorizer, (X_train_val_bow,) = feature_store.featurize(CountVectorizer(), X_train_val)
+        classifier = LogisticRegression(
+            random_state=42,
+            max_iter=1000,
+            class_weight="balanced",
+            **study.best_params,
+            solver="liblinear" if study.best_params.get("penalty") == "l1" else "lbfgs"
+        )
+        classifier.fit(X_train_val_bow, y_train_val)
+
+        # Create a new pipeline with the fitted vectorizer and the best Logistic Regression model
+        pipeline = Pipeline([
+            ('vectorizer', vectorizer),
+            ('classifier', classifier)
+        ])
 
-        print(f"Saving newly trained model to {model_filepath}")
-        joblib.dump(pipeline, model_filepath)
+        print(f"Saving newly trained model {model_name} ({model_key})")
+        artifact_store.save(model_key, model_name, pipeline, metadata={"best_params": study.best_params})
 
     # Evaluate on test set
     print(f"Evaluating best Logistic Regression on {data_type_name} test set...")
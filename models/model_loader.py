@@ -0,0 +1,54 @@
+import os
+
+from models.feature_store import fingerprint_texts
+from utils.artifact_store import ArtifactStore, artifact_store, source_version
+
+# Display name -> artifact name prefix used by the run_*_optimization functions when storing their final pipeline
+MODEL_FILE_PREFIXES = {
+    "Logistic Regression": "logreg",
+    "Multinomial Naive Bayes": "nb",
+    "SVM": "svm",
+    "Decision Tree": "dt",
+}
+
+# Code every trainer depends on besides its own module; editing any of these invalidates all trained models
+SHARED_TRAINER_CODE = tuple(
+    os.path.join(os.path.dirname(__file__), filename) for filename in ("feature_store.py", "tuning.py", "model_loader.py")
+)
+
+
+def model_artifact_name(prefix, data_type_name):
+    """Name of a trained pipeline in the artifact store, e.g. 'svm_model_deduplicated'."""
+    return f"{prefix}_model_{data_type_name}"
+
+
+def trainer_artifact_keys(prefix, trainer_file, X_train, y_train, X_val, y_val, **search_config):
+    """
+    Returns the (model_key, study_key) for a trainer run. Both hash the trainer code version, the exact train/val
+    split (texts and labels, so any change to the data file or split parameters changes the key) and the search settings.
+    """
+    components = {
+        "trainer": prefix,
+        "code": source_version(trainer_file, *SHARED_TRAINER_CODE),
+        "data": [fingerprint_texts(X_train), fingerprint_texts(y_train), fingerprint_texts(X_val), fingerprint_texts(y_val)],
+        "search": search_config,
+    }
+    return ArtifactStore.key_for(kind="model", **components), ArtifactStore.key_for(kind="study", **components)
+
+
+def load_cached_models(data_type_name="deduplicated"):
+    """
+    Loads the latest trained pipelines of all four classifiers from the artifact store without touching the training data.
+    Fails fast (before loading anything) with a FileNotFoundError listing every missing artifact.
+    """
+    keys = {name: artifact_store.latest(model_artifact_name(prefix, data_type_name)) for name, prefix in MODEL_FILE_PREFIXES.items()}
+
+    missing = [model_artifact_name(MODEL_FILE_PREFIXES[name], data_type_name) for name, key in keys.items()
+               if key is None or not artifact_store.has(key)]
+    if missing:
+        raise FileNotFoundError(
+            f"Cannot start in serve mode, missing trained model(s) in {artifact_store.root}:\n  " + "\n  ".join(missing) +
+            "\nRun `python main.py` once without --serve to train them."
+        )
+
+    return {name: artifact_store.load(key) for name, key in keys.items()}
@@ -1,90 +1,78 @@
-import os
-import joblib
-import optuna
 import pandas as pd
 
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
-from sklearn.metrics import classification_report, accuracy_score
+from sklearn.metrics import classification_report
+from models.feature_store import feature_store
+from models.tuning import run_stored_study, evaluate_with_budgets, BUDGET_FRACTIONS
+from models.model_loader import model_artifact_name, trainer_artifact_keys
+from utils.artifact_store import artifact_store
 from utils.stats_retriever import get_stats
 
 
-def run_nb_optimization(X_train, y_train, X_val, y_val, X_test, y_test, data_type_name, n_trials=50):
+def nb_objective(trial, X_train_bow, y_train, X_val_bow, y_val):
+    """Objective function for Optuna to optimize (module level so the parallel study workers can run it)."""
+    # Define hyperparameter search space for the classifier's alpha
+    alpha = trial.suggest_float('alpha', 1e-2, 10.0, log=True)
+
+    # Fit on growing subsets of the (transformed) train set and optimize on val set
+    return evaluate_with_budgets(trial, lambda: MultinomialNB(alpha=alpha), X_train_bow, y_train, X_val_bow, y_val)
+
+
+def run_nb_optimization(X_train, y_train, X_val, y_val, X_test, y_test, data_type_name, n_trials=50, n_jobs=1, timeout=None):
     """
     Performs hyperparameter optimization using Optuna for a Multinomial Naive Bayes classifier.
-    Caches the Optuna study and the final trained model to avoid re-computation.
+    The Optuna study lives in the local study storage (resumable, n_jobs worker processes, timeout in seconds)
+    and the final trained model is cached to avoid re-computation.
     """
     print(f"\n--- Running Multinomial Naive Bayes for '{data_type_name}' data ---")
 
-    model_filename = f"nb_model_{data_type_name}.pkl"
-    model_filepath = os.path.join(os.path.dirname(__file__), model_filename)
-    study_filename = f"optuna_study_nb_{data_type_name}.pkl"
-    study_filepath = os.path.join("model_tuning", study_filename)
+    model_name = model_artifact_name("nb", data_type_name)
     model_type = "Multinomial Naive Bayes"
-
-    # Check if the final trained model already exists
-    if os.path.exists(model_filepath):
-        print(f"Loading pre-trained model from {model_filepath}")
-        pipeline = joblib.load(model_filepath)
+    # Content-addressed: the key changes with the data split, search settings and trainer code, so stale models are never reused
+    model_key, study_key = trainer_artifact_keys("nb", __file__, X_train, y_train, X_val, y_val,
+                                                 n_trials=n_trials, budgets=BUDGET_FRACTIONS)
+
+    # Check if a model trained on exactly these inputs already exists
+    if artifact_store.has(model_key):
+        print(f"Loading pre-trained model {model_name} ({model_key})")
+        pipeline = artifact_store.load(model_key)
     else:
-        print(f"No pre-trained model found at {model_filepath}. Training a new one.")
+        print(f"No pre-trained model {model_name} for the current inputs ({model_key}). Training a new one.")
         # Vectorize text data using the same settings as before
-        vectorizer = CountVectorizer(lowercase=True, ngram_range=(1, 2), min_df=2)
-        X_train_bow = vectorizer.fit_transform(X_train)
-        X_val_bow = vectorizer.transform(X_val)
-
-        # Caching logic: Check if study exists
-        if os.path.exists(study_filepath):
-            print(f"Loading existing study for {model_type} on {data_type_name} data from {study_filepath}")
-            study = joblib.load(study_filepath)
-        else:
-            print(f"No cached study found. Creating a new Optuna study for {model_type} on {data_type_name} data.")
-
-            def objective(trial):
-                """Objective function for Optuna to optimize."""
-                # Define hyperparameter search space for the classifier's alpha
-                alpha = trial.suggest_float('alpha', 1e-2, 10.0, log=True)
-
-                # Instantiate model
-                clf = MultinomialNB(alpha=alpha)
-                
-                # Fit on (transformed) train set
-                clf.fit(X_train_bow, y_train)
-
-                # Optimize on val set
-                y_pred = clf.predict(X_val_bow)
-
-                return accuracy_score(y_val, y_pred)
+        _, (X_train_bow, X_val_bow) = feature_store.featurize(
+            CountVectorizer(lowercase=True, ngram_range=(1, 2), min_df=2), X_train, X_val
+        )
 
-            study = optuna.create_study(direction='maximize')
-            print(f"Running Optuna optimization for {data_type_name} data with {n_trials} trials...")
-            study.optimize(objective, n_trials=n_trials)
-
-            # Save the completed study
-            joblib.dump(study, study_filepath)
-            print(f"Saved new study to {study_filepath}")
+        # Run (or resume) the study
+        print(f"Running Optuna optimization for {model_type} on {data_type_name} data with {n_trials} trials...")
+        study = run_stored_study("nb", data_type_name, study_key, nb_objective, X_train_bow, y_train, X_val_bow, y_val, n_trials=n_trials, n_jobs=n_jobs, timeout=timeout)
 
         print(f"\nBest parameters found for {data_type_name} data: {study.best_params}")
 
         # Retrain the best model on the combined training and validation set
         print("Retraining best model on combined train and validation data...")
 
-        # Create a new pipeline with the best found hyperparameters
-        pipeline = Pipeline([
-            ("bow", CountVectorizer(lowercase=True, ngram_range=(1, 2), min_df=2)),
-            ("clf", MultinomialNB(**study.best_params))
-        ])
-
         # Combine the raw text data for final training
         X_train_val = pd.concat([pd.Series(X_train), pd.Series(X_val)])
         y_train_val = pd.concat([y_train, y_val])
 
-        # Fit the entire pipeline on the combined raw text data
-        pipeline.fit(X_train_val, y_train_val)
+        # Reuse the cached vectorizer/features for train+val and only fit the classifier
+        vectorizer, (X_train_val_bow,) = feature_store.featurize(
+            CountVectorizer(lowercase=True, ngram_range=(1, 2), min_df=2), X_train_val
+        )
+        clf = MultinomialNB(**study.best_params)
+        clf.fit(X_train_val_bow, y_train_val)
+
+        # Create a new pipeline with the best found hyperparameters
+        pipeline = Pipeline([
+            ("bow", vectorizer),
+            ("clf", clf)
+        ])
 
-        print(f"Saving newly trained model to {model_filepath}")
-        joblib.dump(pipeline, model_filepath)
+        print(f"Saving newly trained model {model_name} ({model_key})")
+        artifact_store.save(model_key, model_name, pipeline, metadata={"best_params": study.best_params})
 
     # Finally, evaluate the pipeline on the test set
     print(f"Evaluating best model on {data_type_name} data test set...")
@@ -1,107 +1,97 @@
-import os
-import joblib
-import optuna
 import pandas as pd
 
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.pipeline import Pipeline
 from sklearn.svm import SVC
-from sklearn.metrics import classification_report, accuracy_score
-from scipy.sparse import vstack
+from sklearn.metrics import classification_report
+from models.feature_store import feature_store
+from models.tuning import run_stored_study, evaluate_with_budgets, BUDGET_FRACTIONS
+from models.model_loader import model_artifact_name, trainer_artifact_keys
+from utils.artifact_store import artifact_store
 from utils.stats_retriever import get_stats
 
 
-def run_svm_optimization(X_train, X_val, X_test, y_train, y_val, y_test, data_type_name, n_trials=50):
+def svm_objective(trial, X_train_bow, y_train, X_val_bow, y_val):
+    """
+    Objective function for Optuna to optimize.
+    Defined at module level so it can be run by the parallel study workers.
+    """
+    kernel = trial.suggest_categorical('kernel', ['linear', 'rbf']) # Testing linear vs non-linear kernel
+    c = trial.suggest_float('C', 1e-2, 1e2, log=True) # Tuning C, which is our regularization param
+
+    # Default value (for linear models)
+    gamma = 'scale'
+    if kernel == 'rbf':
+        # For non-linear models tweak gamma to test for different sensitivity levels to individual data points
+        gamma = trial.suggest_float('gamma', 1e-2, 1e2, log=True)
+
+    def make_svm():
+        return SVC(
+            kernel=kernel,
+            C=c,
+            gamma=gamma,
+            random_state=42, # Seed for reproducability
+            class_weight='balanced' # Balance class weights to reduce bias
+        )
+
+    # Fitting on growing subsets of the TRAIN set and tuning on the validation set,
+    # hopeless (C, gamma) combinations are pruned before they are trained on the full set
+    return evaluate_with_budgets(trial, make_svm, X_train_bow, y_train, X_val_bow, y_val)
+
+
+def run_svm_optimization(X_train, X_val, X_test, y_train, y_val, y_test, data_type_name, n_trials=50, n_jobs=1, timeout=None):
     """
     Performs hyperparameter optimization using Optuna for an SVM classifier.
     This function encapsulates vectorization, optimization, and evaluation.
-    Caches the Optuna study and the final trained model to avoid re-computation.
+    The Optuna study is stored in the local study storage (resumable, optionally run by n_jobs worker processes,
+    limited to `timeout` seconds) and the final trained model is cached to avoid re-computation.
     """
     print(f"\n--- Running for '{data_type_name}' data ---")
 
-    model_filename = f"svm_model_{data_type_name}.pkl"
-    model_filepath = os.path.join(os.path.dirname(__file__), model_filename)
-    study_filename = f"optuna_study_svm_{data_type_name}.pkl"
-    study_filepath = os.path.join("model_tuning", study_filename)
+    model_name = model_artifact_name("svm", data_type_name)
     model_type = "SVM"
-
-    # Check if the final trained model already exists
-    if os.path.exists(model_filepath):
-        print(f"Loading pre-trained model from {model_filepath}")
-        pipeline = joblib.load(model_filepath)
+    # Content-addressed: the key changes with the data split, search settings and trainer code, so stale models are never reused
+    model_key, study_key = trainer_artifact_keys("svm", __file__, X_train, y_train, X_val, y_val,
+                                                 n_trials=n_trials, budgets=BUDGET_FRACTIONS)
+
+    # Check if a model trained on exactly these inputs already exists
+    if artifact_store.has(model_key):
+        print(f"Loading pre-trained model {model_name} ({model_key})")
+        pipeline = artifact_store.load(model_key)
     else:
-        print(f"No pre-trained model found at {model_filepath}. Training a new one.")
+        print(f"No pre-trained model {model_name} for the current inputs ({model_key}). Training a new one.")
         # Vectorize the text data, CountVectorizer handles out-of-vocab words by default
         # It does so by ignroring them during transformation
-        vectorizer = CountVectorizer()
-
-        # Fit vectroizer only on TRAIN data
-        X_train_bow = vectorizer.fit_transform(X_train)
-
-        # Transform val & test data just so they are numerical and compatible w/ SVM
-        X_val_bow = vectorizer.transform(X_val)
-
-        # Caching logic: Check if study exists
-        if os.path.exists(study_filepath):
-            print(f"Loading existing study for {model_type} on {data_type_name} data from {study_filepath}")
-            study = joblib.load(study_filepath)
-        else:
-            print(f"No cached study found. Creating a new Optuna study for {model_type} on {data_type_name} data.")
-            def objective(trial):
-                """
-                Objective function for Optuna to optimize.
-                """
-                kernel = trial.suggest_categorical('kernel', ['linear', 'rbf']) # Testing linear vs non-linear kernel
-                c = trial.suggest_float('C', 1e-2, 1e2, log=True) # Tuning C, which is our regularization param
-                
-                # Default value (for linear models)
-                gamma = 'scale'
-                if kernel == 'rbf':
-                    # For non-linear models tweak gamma to test for different sensitivity levels to individual data points
-                    gamma = trial.suggest_float('gamma', 1e-2, 1e2, log=True)
-
-                svm = SVC(
-                    kernel=kernel,
-                    C=c,
-                    gamma=gamma,
-                    random_state=42, # Seed for reproducability
-                    class_weight='balanced' # Balance class weights to reduce bias
-                )
-                
-                svm.fit(X_train_bow, y_train)   # Fitting model on TRAIN set
-                y_pred = svm.predict(X_val_bow) # Tuning on validation set
-                accuracy = accuracy_score(y_val, y_pred)
-                return accuracy
-
-            # Run the study to optimize hyperparams
-            study = optuna.create_study(direction='maximize')
-            print(f"Running Optuna optimization for {data_type_name} data with {n_trials} trials... (This may take a while)")
-            study.optimize(objective, n_trials=n_trials)
-
-            # Save the completed study
-            joblib.dump(study, study_filepath)
-            print(f"Saved new study to {study_filepath}")
+        # Fit vectroizer only on TRAIN data and transform val so it is numerical and compatible w/ SVM
+        # (the feature store shares this work with the Logistic Regression trainer, which uses the same settings)
+        _, (X_train_bow, X_val_bow) = feature_store.featurize(CountVectorizer(), X_train, X_val)
+
+        # Run (or resume) the study to optimize hyperparams
+        print(f"Running Optuna optimization for {model_type} on {data_type_name} data with {n_trials} trials... (This may take a while)")
+        study = run_stored_study("svm", data_type_name, study_key, svm_objective, X_train_bow, y_train, X_val_bow, y_val, n_trials=n_trials, n_jobs=n_jobs, timeout=timeout)
 
         print(f"\nBest parameters found for {data_type_name} data: {study.best_params}")
 
         # Retrain the best model on the combined training and validation set
         print("Retraining best model on combined train and validation data...")
 
-        # Create a new pipeline with a vectorizer and the best SVM model
-        pipeline = Pipeline([
-            ('vectorizer', CountVectorizer()),
-            ('classifier', SVC(random_state=42, class_weight='balanced', **study.best_params))
-        ])
-
         # Combine the raw text data for final training
         X_train_val = pd.concat([X_train, X_val])
         y_train_val = pd.concat([y_train, y_val])
 
-        # Fit the entire pipeline on the combined raw text data
-        pipeline.fit(X_train_val, y_train_val)
+        # Reuse the cached vectorizer/features for train+val and only fit the classifier
+        vectorizer, (X_train_val_bow,) = feature_store.featurize(CountVectorizer(), X_train_val)
+        classifier = SVC(random_state=42, class_weight='balanced', **study.best_params)
+        classifier.fit(X_train_val_bow, y_train_val)
+
+        # Create a new pipeline with the fitted vectorizer and the best SVM model
+        pipeline = Pipeline([
+            ('vectorizer', vectorizer),
+            ('classifier', classifier)
+        ])
 
-        print(f"Saving newly trained model to {model_filepath}")
-        joblib.dump(pipeline, model_filepath)
+        print(f"Saving newly trained model {model_name} ({model_key})")
+        artifact_store.save(model_key, model_name, pipeline, metadata={"best_params": study.best_params})
 
     # Evaluate the pipeline on the test set
     print(f"Evaluating best model on {data_type_name} data test set...")
@@ -0,0 +1,196 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import optuna
+from optuna.study import MaxTrialsCallback
+from optuna.trial import TrialState
+from sklearn.metrics import accuracy_score
+
+from models.feature_store import feature_store, save_csr, load_csr
+from utils.artifact_store import artifact_store
+
+STUDY_STORAGE_DIR = os.path.join("model_tuning", "studies")
+
+# Fractions of the training set a trial is trained on, in order. A trial only reaches the full
+# training set if it is still competitive at the smaller budgets (the pruner decides).
+BUDGET_FRACTIONS = (0.2, 0.5, 1.0)
+FINISHED_STATES = (TrialState.COMPLETE, TrialState.PRUNED)
+
+
+def get_storage_url(study_name):
+    # One SQLite file per study, so studies running concurrently never contend for the same database
+    return f"sqlite:///{os.path.join(STUDY_STORAGE_DIR, study_name + '.db')}"
+
+
+def _get_storage(storage_url):
+    # A generous busy timeout lets several worker processes write trials to the same SQLite file
+    return optuna.storages.RDBStorage(url=storage_url, engine_kwargs={"connect_args": {"timeout": 60}})
+
+
+def count_finished_trials(study):
+    return len(study.get_trials(deepcopy=False, states=FINISHED_STATES))
+
+
+def default_pruner():
+    """Hyperband over the training-set budgets in BUDGET_FRACTIONS (one step per budget)."""
+    return optuna.pruners.HyperbandPruner(min_resource=1, max_resource=len(BUDGET_FRACTIONS), reduction_factor=2)
+
+
+class PlateauStopper:
+    """Study callback that stops the study once the best value has not improved for `patience` finished trials."""
+    def __init__(self, patience):
+        self.patience = patience
+
+    def __call__(self, study, trial):
+        completed = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+        if not completed:
+            return
+        best_number = max(completed, key=lambda t: t.value).number
+        trials_since_best = sum(1 for t in study.get_trials(deepcopy=False, states=FINISHED_STATES) if t.number > best_number)
+        if trials_since_best >= self.patience:
+            study.stop()
+
+
+def evaluate_with_budgets(trial, estimator_factory, X_train, y_train, X_val, y_val, fractions=BUDGET_FRACTIONS, seed=42):
+    """
+    Multi-fidelity evaluation of one trial: fits `estimator_factory()` on growing, nested subsets of the training data,
+    reports the validation accuracy after each budget and stops early (optuna.TrialPruned) when the pruner
+    finds the trial is falling behind. Returns the validation accuracy on the full training set.
+    """
+    y_train = np.asarray(y_train)
+    order = np.random.RandomState(seed).permutation(X_train.shape[0])
+
+    accuracy = 0.0
+    for step, fraction in enumerate(fractions, start=1):
+        if fraction >= 1.0:
+            X_budget, y_budget = X_train, y_train
+        else:
+            subset = np.sort(order[:max(1, int(round(fraction * len(order))))])
+            X_budget, y_budget = X_train[subset], y_train[subset]
+        if len(np.unique(y_budget)) < 2:
+            # Too small to train a classifier on, go straight to the next budget
+            continue
+
+        estimator = estimator_factory()
+        estimator.fit(X_budget, y_budget)
+        accuracy = accuracy_score(y_val, estimator.predict(X_val))
+
+        if fraction < 1.0:
+            trial.report(accuracy, step)
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+    return accuracy
+
+
+def _optimize(study_name, storage_url, objective, X_train, y_train, X_val, y_val, n_trials, timeout, pruner, patience):
+    """Runs trials of an existing study until it holds n_trials finished trials, plateaus or the timeout expires."""
+    study = optuna.load_study(study_name=study_name, storage=_get_storage(storage_url), pruner=pruner)
+    callbacks = [MaxTrialsCallback(n_trials, states=FINISHED_STATES)]
+    if patience:
+        callbacks.append(PlateauStopper(patience))
+    study.optimize(
+        lambda trial: objective(trial, X_train, y_train, X_val, y_val),
+        timeout=timeout,
+        callbacks=callbacks
+    )
+
+
+def _ensure_completed_trial(study_name, storage_url, objective, X_train, y_train, X_val, y_val):
+    """
+    best_params/best_value need a completed trial. When the timeout or the pruner stopped every trial so far, one more
+    trial runs without pruning; RuntimeError (naming the study) if even that one does not complete.
+    """
+    study = optuna.load_study(study_name=study_name, storage=_get_storage(storage_url), pruner=optuna.pruners.NopPruner())
+    if study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,)):
+        return
+    print(f"Study '{study_name}' has no completed trial yet, running one more without pruning.")
+    study.optimize(lambda trial: objective(trial, X_train, y_train, X_val, y_val), n_trials=1)
+    if not study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,)):
+        raise RuntimeError(f"Study '{study_name}' has no completed trial, so it has no best parameters "
+                           f"(every trial was pruned or failed; see {storage_url})")
+
+
+def _optimize_worker(study_name, storage_url, objective, X_train_dir, y_train, X_val_dir, y_val, n_trials, timeout, pruner, patience):
+    """Worker process entry point: the sparse matrices are memory-mapped from disk instead of being pickled."""
+    _optimize(study_name, storage_url, objective, load_csr(X_train_dir), y_train, load_csr(X_val_dir), y_val, n_trials, timeout, pruner, patience)
+
+
+def run_study(study_name, objective, X_train, y_train, X_val, y_val, n_trials=50, n_jobs=1, timeout=None,
+              storage_url=None, pruner=None, patience=15):
+    """
+    Maximizes `objective(trial, X_train, y_train, X_val, y_val)` in a study persisted in the local SQLite storage.
+
+    - Every finished trial is stored immediately, so an interrupted run resumes where it stopped.
+    - With n_jobs > 1 the trials run in that many worker processes. `objective` must then be a module-level function,
+      and the sparse matrices are shared read-only through memory-mapped files rather than pickled into every worker.
+    - `timeout` is the wall-clock limit (in seconds) for this call.
+    - Objectives that report intermediate values (see evaluate_with_budgets) are pruned by `pruner`
+      (Hyperband over the training budgets by default), and the study stops early once the best value
+      has not improved for `patience` finished trials (None disables this).
+    """
+    storage_url = storage_url or get_storage_url(study_name)
+    pruner = pruner or default_pruner()
+    os.makedirs(STUDY_STORAGE_DIR, exist_ok=True)
+
+    # Created in this process first so the worker processes only ever load an existing schema/study
+    study = optuna.create_study(study_name=study_name, storage=_get_storage(storage_url), direction="maximize",
+                                pruner=pruner, load_if_exists=True)
+    finished = count_finished_trials(study)
+    if finished >= n_trials:
+        print(f"Study '{study_name}' already has {finished} finished trials, skipping optimization.")
+        _ensure_completed_trial(study_name, storage_url, objective, X_train, y_train, X_val, y_val)
+        return optuna.load_study(study_name=study_name, storage=_get_storage(storage_url), pruner=pruner)
+    if finished:
+        print(f"Resuming study '{study_name}' from {finished}/{n_trials} finished trials.")
+
+    y_train, y_val = list(y_train), list(y_val)
+
+    if n_jobs <= 1:
+        _optimize(study_name, storage_url, objective, X_train, y_train, X_val, y_val, n_trials, timeout, pruner, patience)
+    else:
+        # Reuse the feature store's files when possible, otherwise write the matrices to a temporary directory once
+        tmp_dir = None
+        matrix_dirs = []
+        for name, matrix in (("X_train", X_train), ("X_val", X_val)):
+            location = feature_store.location_of(matrix)
+            if location is None:
+                tmp_dir = tmp_dir or tempfile.mkdtemp(prefix="study-")
+                location = os.path.join(tmp_dir, name)
+                save_csr(location, matrix)
+            matrix_dirs.append(location)
+
+        try:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                futures = [
+                    executor.submit(_optimize_worker, study_name, storage_url, objective,
+                                    matrix_dirs[0], y_train, matrix_dirs[1], y_val, n_trials, timeout, pruner, patience)
+                    for _ in range(n_jobs)
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _ensure_completed_trial(study_name, storage_url, objective, X_train, y_train, X_val, y_val)
+    study = optuna.load_study(study_name=study_name, storage=_get_storage(storage_url), pruner=pruner)
+    pruned = len(study.get_trials(deepcopy=False, states=(TrialState.PRUNED,)))
+    print(f"Study '{study_name}': {count_finished_trials(study)} finished trials ({pruned} pruned early), best value {study.best_value:.4f}")
+    return study
+
+
+def run_stored_study(prefix, data_type_name, study_key, objective, X_train, y_train, X_val, y_val, **kwargs):
+    """
+    run_study on a study database kept in the artifact store under `study_key`. The key (and thus the study name) changes
+    with the data, search space and trainer code, so a changed setup starts a fresh study instead of resuming a stale one.
+    """
+    os.makedirs(artifact_store.root, exist_ok=True)
+    db_path = artifact_store.path_for(study_key, ".db")
+    study = run_study(f"{prefix}_{data_type_name}_{study_key[:12]}", objective, X_train, y_train, X_val, y_val,
+                      storage_url=f"sqlite:///{db_path}", **kwargs)
+    artifact_store.register(study_key, f"{prefix}_study_{data_type_name}", db_path,
+                            metadata={"best_params": study.best_params, "best_value": study.best_value})
+    return study
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import the packages of the repository root (data, models, dialogue_system, utils) like main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,118 @@
+import threading
+import wave
+
+import numpy as np
+import pytest
+
+from dialogue_system.audio_capture import AudioCapture, AudioRingBuffer, Endpointer, FileReplaySource, RATE, chunk_rms, read_wav
+
+
+def write_wav(path, *segments):
+    """Writes (seconds, level) segments as a 16-bit mono wav: a 200 Hz tone of that RMS level, or silence for level 0."""
+    audio = np.concatenate([level * np.sqrt(2) * np.sin(2 * np.pi * 200 * np.arange(int(seconds * RATE)) / RATE)
+                            for seconds, level in segments])
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(audio.astype(np.int16).tobytes())
+    return str(path)
+
+
+def chunk_of(value, size=4):
+    return np.full(size, value, dtype=np.int16).tobytes()
+
+
+def test_chunk_rms_matches_reference():
+    chunks = np.random.default_rng(0).integers(-32768, 32767, size=(8, 1024), dtype=np.int16)
+    reference = [np.sqrt(np.mean(chunk.astype(np.float64) ** 2)) for chunk in chunks]
+    np.testing.assert_allclose(chunk_rms(chunks), reference, rtol=1e-5)
+
+
+def test_ring_counts_overruns_of_a_slow_reader():
+    ring = AudioRingBuffer(capacity=4, chunk=4)
+    for value in range(10):
+        ring.write(chunk_of(value))
+    chunks, _, end = ring.read(0)
+    assert end == 10
+    assert ring.overruns == 6
+    assert chunks[:, 0].tolist() == [6, 7, 8, 9]
+
+
+def test_ring_pads_short_chunks():
+    ring = AudioRingBuffer(capacity=2, chunk=4)
+    ring.write(chunk_of(5, size=2))
+    chunks, _, _ = ring.read(0)
+    assert chunks.tolist() == [[5, 5, 0, 0]]
+
+
+def test_blocking_write_waits_for_the_reader():
+    ring = AudioRingBuffer(capacity=2, chunk=4)
+    ring.write(chunk_of(1), block=True)
+    ring.write(chunk_of(2), block=True)
+    writer = threading.Thread(target=ring.write, args=(chunk_of(3),), kwargs={"block": True}, daemon=True)
+    writer.start()
+    writer.join(0.2)
+    assert writer.is_alive() and ring.written == 2
+
+    chunks, _, end = ring.read(0)
+    writer.join(5)
+    assert not writer.is_alive()
+    assert chunks[:, 0].tolist() == [1, 2] and ring.overruns == 0
+    assert ring.read(end)[0][:, 0].tolist() == [3]
+
+
+def test_read_wav_mixes_down_and_resamples(tmp_path):
+    path = tmp_path / "stereo.wav"
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE // 2)
+        wf.writeframes(np.tile([[1000, 3000]], (800, 1)).astype(np.int16).tobytes())
+    audio = read_wav(str(path))
+    assert len(audio) == 1600 and np.all(audio == 2000)
+
+
+def replay(*paths, trailing_silence=1.0):
+    return AudioCapture(FileReplaySource(paths, trailing_silence=trailing_silence), Endpointer())
+
+
+def test_replay_endpoints_one_utterance_per_file(tmp_path):
+    paths = [write_wav(tmp_path / f"{i}.wav", (0.5, 0), (1.0, 3000), (0.2, 0)) for i in range(2)]
+    capture = replay(*paths)
+    for _ in paths:
+        utterance = capture.next_utterance()
+        assert utterance.reason == "silence"
+        assert 1.0 <= len(utterance.audio) / RATE <= 2.0
+    with pytest.raises(EOFError):
+        capture.next_utterance()
+
+
+def test_replay_keeps_audio_after_the_first_endpoint(tmp_path):
+    path = write_wav(tmp_path / "two.wav", (0.5, 0), (0.8, 3000), (1.0, 0), (0.8, 3000))
+    capture = replay(path)
+    first = capture.next_utterance(skip_buffered=False)
+    second = capture.next_utterance(skip_buffered=False)
+    assert first.reason == "silence" and second.reason == "silence"
+    assert first.noise_floor == second.noise_floor == 0.0
+
+
+def test_adaptive_endpointing_keeps_speech_from_the_first_chunk(tmp_path):
+    path = write_wav(tmp_path / "no_lead.wav", (1.5, 3000), (1.0, 0))
+    for endpointer in (Endpointer.fixed(), Endpointer()):
+        utterance = AudioCapture(FileReplaySource([path], trailing_silence=2.0), endpointer).next_utterance()
+        assert utterance.reason == "silence"
+        assert len(utterance.audio) / RATE >= 1.5
+
+
+def test_replay_file_without_speech_ends_its_turn(tmp_path):
+    silent = write_wav(tmp_path / "silent.wav", (1.0, 0))
+    spoken = write_wav(tmp_path / "spoken.wav", (0.5, 0), (1.0, 3000))
+    capture = replay(silent, spoken)
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(first=capture.next_utterance(), second=capture.next_utterance()), daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive(), "next_utterance waited for audio after the end of the file"
+    assert result["first"].reason == "end_of_audio" and not len(result["first"].audio)
+    assert result["second"].reason == "silence"
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from dialogue_system.channels import ConsoleOutput, QueueInput, QueueOutput
+from dialogue_system.finite_state_machine_initializor import initialize_fsm
+from dialogue_system.tts_cache import TTSCache, synthesize_tone
+from utils.metrics import metrics
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.enable(False)
+    metrics.reset()
+
+
+def test_tts_spans_are_tagged_with_the_state_and_session(tmp_path, enabled_metrics, capsys):
+    output = ConsoleOutput(use_tts=True, tts_cache=TTSCache(root=str(tmp_path), synthesizer=synthesize_tone, audio_format="wav"))
+    output.attach(lambda: ("welcome", "session-1"))
+    asyncio.run(output.send("Hello"))
+
+    # Playback may fail without an audio backend; the synthesis span is recorded either way
+    tags = {(stage, state, session) for _, stage, state, session, _ in enabled_metrics.recent}
+    assert ("tts_synthesis", "welcome", "session-1") in tags
+    assert all(state == "welcome" for stage, state, _ in tags if stage.startswith("tts"))
+
+
+def test_fsm_attaches_its_state_and_session_to_the_channels():
+    user, output = QueueInput(), QueueOutput()
+    fsm = initialize_fsm(None, None, None, use_asr=False, use_tts=False, input_channel=user, output_channel=output)
+    assert user.tags() == output.tags() == (fsm.current_state.name, fsm.logger.session_id)
+    assert QueueInput().tags() == (None, None)
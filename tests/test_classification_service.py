@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+from models.classification_service import BatchingClassifier
+
+
+class SlowModel:
+    """Predicts the upper-cased text; the first batch waits until the test releases it."""
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = []
+
+    def predict(self, texts):
+        self.release.wait(5)
+        self.batches.append(list(texts))
+        return [text.upper() for text in texts]
+
+
+def test_classify_batches_requests():
+    model = SlowModel()
+    model.release.set()
+    with BatchingClassifier(model, max_batch_size=8, max_wait_ms=50) as service:
+        futures = [service.submit(text) for text in ("hi", "bye", "yes")]
+        assert [future.result(5).label for future in futures] == ["HI", "BYE", "YES"]
+    assert service.stats()["requests"] == 3
+
+
+def test_cancelled_request_does_not_stop_the_worker():
+    model = SlowModel()
+    service = BatchingClassifier(model, max_batch_size=1, max_wait_ms=0).start()
+
+    async def cancel_then_classify():
+        blocking = asyncio.ensure_future(service.aclassify("first"))
+        cancelled = asyncio.ensure_future(service.aclassify("cancelled"))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        model.release.set()
+        assert (await blocking).label == "FIRST"
+        return await asyncio.wait_for(service.aclassify("next"), timeout=5)
+
+    assert asyncio.run(cancel_then_classify()).label == "NEXT"
+    assert ["cancelled"] not in model.batches
+    service.stop()
+
+
+def test_submit_restarts_a_dead_worker():
+    model = SlowModel()
+    model.release.set()
+    service = BatchingClassifier(model).start()
+    service._queue.put(None)
+    service._worker.join(5)
+    assert not service._worker.is_alive()
+    assert service.classify("again").label == "AGAIN"
+    service.stop()
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from dialogue_system.dialogue_server import DialogueServer
+from dialogue_system.keyword_searcher import RestaurantSearcher
+from dialogue_system.restaurant_manager import RestaurantManager
+from dialogue_system.restaurant_reader import RestaurantReader
+from utils.dialogue_logger import DialogueLogger
+
+RESTAURANT_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "restaurant_info.csv")
+
+
+class InformModel:
+    """Classifies every utterance as 'inform'."""
+    def predict(self, texts):
+        return ["inform" for _ in texts]
+
+
+@pytest.fixture
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("saved_transcripts")
+    return tmp_path
+
+
+async def one_session(server):
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    session_id = json.loads(await reader.readline())["session"]
+    writer.close()
+    # The server saves the transcript of a disconnected session when it closes the session
+    while server.sessions:
+        await asyncio.sleep(0.01)
+    return session_id
+
+
+def test_sessions_of_different_servers_never_share_a_transcript(in_tmp_path):
+    restaurant_manager = RestaurantManager(RestaurantReader(RESTAURANT_CSV).read_store())
+    searcher = RestaurantSearcher(restaurant_manager)
+
+    async def run_servers():
+        session_ids = []
+        for _ in range(2):
+            # Two server runs in the same second, each with its first session
+            server = await DialogueServer(InformModel(), restaurant_manager, searcher, port=0, save_transcripts=True).start()
+            session_ids.append(await asyncio.wait_for(one_session(server), timeout=10))
+            await server.close()
+        return session_ids
+
+    first, second = asyncio.run(run_servers())
+    assert first != second
+    assert len(os.listdir("saved_transcripts")) == 2
+
+
+def test_saving_never_overwrites_a_transcript(in_tmp_path):
+    # The same session id saved twice within one second
+    first = DialogueLogger("same")
+    first.save()
+    name = os.listdir("saved_transcripts")[0]
+    with open(os.path.join("saved_transcripts", name), "w") as f:
+        f.write("kept")
+    with pytest.raises(FileExistsError):
+        for _ in range(100):
+            DialogueLogger("same").save()
+    with open(os.path.join("saved_transcripts", name)) as f:
+        assert f.read() == "kept"
@@ -0,0 +1,43 @@
+import pytest
+
+from dialogue_system.audio_capture import Endpointer, HANGOVER_SECONDS
+from dialogue_system.endpoint_benchmark import FIXTURES, benchmark_endpointing, print_benchmark, write_synthetic_fixtures
+
+
+@pytest.fixture(scope="module")
+def results(tmp_path_factory):
+    paths = write_synthetic_fixtures(str(tmp_path_factory.mktemp("endpoint_fixtures")))
+    return dict(zip(("fixed", "adaptive"), benchmark_endpointing(paths, {"fixed": Endpointer.fixed, "adaptive": Endpointer}).values()))
+
+
+def by_name(file_results):
+    return {result.path.rsplit("/", 1)[-1][:-len(".wav")]: result for result in file_results}
+
+
+def test_fixtures_are_deterministic(tmp_path):
+    first = write_synthetic_fixtures(str(tmp_path / "a"), FIXTURES[:2])
+    second = write_synthetic_fixtures(str(tmp_path / "b"), FIXTURES[:2])
+    for a, b in zip(first, second):
+        assert open(a, "rb").read() == open(b, "rb").read()
+
+
+def test_adaptive_endpointing_ends_every_fixture_after_the_hangover(results):
+    for name, result in by_name(results["adaptive"]).items():
+        assert result.reasons == ["silence"], name
+        assert result.endpoint_delays[0] == pytest.approx(HANGOVER_SECONDS, abs=0.07), name
+
+
+def test_adaptive_endpointing_handles_speech_from_the_first_chunk(results):
+    for name in ("no_lead_quiet", "no_lead_noisy"):
+        assert by_name(results["adaptive"])[name].reasons == ["silence"]
+
+
+def test_fixed_endpointing_misses_noisy_rooms(results):
+    fixed = by_name(results["fixed"])
+    assert all(fixed[name].reasons == ["end_of_audio"] for name in fixed if "noisy" in name)
+    assert all(fixed[name].reasons == ["silence"] for name in fixed if name.startswith(("quiet", "pauses")))
+
+
+def test_print_benchmark(results, capsys):
+    print_benchmark(results)
+    assert "adaptive" in capsys.readouterr().out
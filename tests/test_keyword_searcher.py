@@ -0,0 +1,47 @@
+import os
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from dialogue_system.keyword_searcher import RestaurantSearcher, TfidfIndex
+from dialogue_system.restaurant_manager import RestaurantManager
+from dialogue_system.restaurant_reader import RestaurantReader
+from dialogue_system.types import SearchThemes
+
+RESTAURANT_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "restaurant_info.csv")
+
+
+@pytest.fixture(scope="module")
+def searcher():
+    return RestaurantSearcher(RestaurantManager(RestaurantReader(RESTAURANT_CSV).read_store()))
+
+
+def test_extract_slots_leaves_the_shared_searcher_unchanged(searcher):
+    before = dict(vars(searcher))
+    extraction = searcher.extract_slots("cheap italian food in the centre")
+    assert extraction.value(SearchThemes.pricerange) == "cheap"
+    assert extraction.value(SearchThemes.food) == "italian"
+    assert dict(vars(searcher)) == before
+
+
+def tfidf_ranking(utterance, domain_list):
+    """The original TF-IDF fallback: a vectorizer fitted on the domain terms plus the utterance for every query."""
+    vectorizer = TfidfVectorizer()
+    tfidf_matrix = vectorizer.fit_transform(domain_list + [utterance])
+    sims = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1])
+    return sorted(zip(domain_list, sims[0]), key=lambda x: x[1], reverse=True)
+
+
+@pytest.mark.parametrize("utterance", [
+    "i want cheap food", "something in the north part of town", "modern european please", "asian oriental or thai",
+    "expensive expensive expensive", "no idea at all", "the the food",
+])
+def test_tfidf_index_scores_like_a_per_query_fit(searcher, utterance):
+    for attribute in (SearchThemes.food, SearchThemes.area, SearchThemes.pricerange, SearchThemes.assigned_seats):
+        domain_list = searcher._domain_list(attribute)
+        term, score = TfidfIndex(domain_list).best_match(utterance)
+        best_term, best_score = tfidf_ranking(utterance, domain_list)[0]
+        assert score == pytest.approx(best_score, abs=1e-9)
+        if best_score > 0:
+            assert term == best_term
@@ -0,0 +1,9 @@
+from main import build_training_stages
+
+
+def test_every_stage_output_is_consumed():
+    stages = build_training_stages("data/dialog_acts.dat")
+    consumed = {name for stage in stages for name in stage.inputs}
+    produced = {name for stage in stages for name in stage.outputs}
+    assert produced - consumed == {"models"}
+    assert {"baselines_original", "baselines_deduplicated"} <= set(next(s for s in stages if s.name == "summary").inputs)
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from dialogue_system.tts_cache import TTSCache, synthesize_tone
+
+
+def tone_cache(root, calls=None, **kwargs):
+    """A TTSCache that synthesizes wav tones, optionally recording every synthesized text in `calls`."""
+    async def synthesizer(text, voice, path):
+        if calls is not None:
+            calls.append(text)
+        await asyncio.sleep(0.01)
+        await synthesize_tone(text, voice, path)
+
+    return TTSCache(root=str(root), synthesizer=synthesizer, audio_format="wav", **kwargs)
+
+
+def test_miss_then_hit(tmp_path):
+    calls = []
+    cache = tone_cache(tmp_path, calls)
+
+    async def lookups():
+        first = await cache.get("Hello, how can I help you?")
+        second = await cache.get("Hello, how can I help you?")
+        return first, second
+
+    first, second = asyncio.run(lookups())
+    assert first == second and first.endswith(".wav")
+    assert calls == ["Hello, how can I help you?"]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.stats()["entries"] == 1
+
+
+def test_concurrent_misses_share_one_synthesis(tmp_path):
+    calls = []
+    cache = tone_cache(tmp_path, calls)
+
+    async def lookups():
+        return await asyncio.gather(*(cache.get("Which area?") for _ in range(5)))
+
+    paths = asyncio.run(lookups())
+    assert len(set(paths)) == 1
+    assert calls == ["Which area?"]
+    assert cache.misses == 1
+
+
+def test_least_recently_used_audio_is_evicted(tmp_path):
+    # One word of tone is 0.05 s of 16-bit audio at 16 kHz (1600 bytes plus the wav header)
+    cache = tone_cache(tmp_path, max_bytes=4000)
+
+    async def lookups():
+        old = await cache.get("first")
+        await cache.get("second")
+        await cache.get("first")  # Now "second" is the least recently used
+        await asyncio.sleep(0.2)  # The hit updates the manifest in the background
+        await cache.get("third")
+        return old
+
+    asyncio.run(lookups())
+    cached = {entry["metadata"]["text"] for _, entry in cache.store.entries()}
+    assert cached == {"first", "third"}
+    assert cache.store.total_size() <= 4000
+
+
+def test_prerender_counts_rendered_and_cached_texts(tmp_path):
+    calls = []
+    cache = tone_cache(tmp_path, calls)
+    texts = ["What food?", "Which area?", "What food?", "Goodbye."]
+
+    assert asyncio.run(cache.prerender(texts, concurrency=2)) == (3, 0)
+    assert asyncio.run(cache.prerender(texts + ["Enjoy!"])) == (1, 3)
+    assert sorted(calls) == sorted(["What food?", "Which area?", "Goodbye.", "Enjoy!"])
+    assert cache.prerendered == 4 and (cache.hits, cache.misses) == (0, 0)
+
+
+def test_failed_synthesis_leaves_nothing_behind(tmp_path):
+    async def broken(text, voice, path):
+        raise OSError("no network")
+
+    cache = TTSCache(root=str(tmp_path), synthesizer=broken, audio_format="wav")
+    with pytest.raises(OSError):
+        asyncio.run(cache.get("Hello"))
+    assert list(tmp_path.iterdir()) == [] and not cache._in_flight
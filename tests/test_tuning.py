@@ -0,0 +1,45 @@
+import math
+
+import optuna
+import pytest
+
+from models.tuning import run_study
+
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+
+def always_pruned(trial, X_train, y_train, X_val, y_val):
+    """Reports a value and asks the pruner; every trial is pruned unless pruning is disabled."""
+    x = trial.suggest_float("x", 0.0, 1.0)
+    trial.report(x, 1)
+    if not isinstance(trial.study.pruner, optuna.pruners.NopPruner):
+        raise optuna.TrialPruned()
+    return x
+
+
+def never_completes(trial, X_train, y_train, X_val, y_val):
+    """Pruned, and without pruning returns NaN (optuna marks the trial as failed)."""
+    always_pruned(trial, X_train, y_train, X_val, y_val)
+    return math.nan
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_study_with_only_pruned_trials_gets_a_completed_trial():
+    study = run_study("all_pruned", always_pruned, None, [], None, [], n_trials=3)
+    assert "x" in study.best_params
+    assert len(study.trials) == 4
+
+
+def test_resumed_study_with_only_pruned_trials_gets_a_completed_trial():
+    run_study("resumed", always_pruned, None, [], None, [], n_trials=2, patience=None)
+    study = run_study("resumed", always_pruned, None, [], None, [], n_trials=2)
+    assert 0.0 <= study.best_value <= 1.0
+
+
+def test_study_without_completed_trial_names_the_study():
+    with pytest.raises(RuntimeError, match="never_done"):
+        run_study("never_done", never_completes, None, [], None, [], n_trials=2)
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+import joblib
+
+
+def source_version(*paths):
+    """Hash of the contents of the given source files, used as the 'code version' part of an artifact key."""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for trained models and tuning studies.
+
+    Every artifact is filed under a key that hashes everything it was derived from (data, split, hyperparameters/search space,
+    trainer code version), so changing any input simply produces a new key instead of silently reusing a stale artifact.
+    A JSON manifest records name, size and access times; writes are atomic (temporary file + rename) and the least recently
+    used artifacts are evicted once the store grows beyond `max_bytes`.
+    """
+    MANIFEST = "manifest.json"
+
+    def __init__(self, root=os.path.join("model_tuning", "artifacts"), max_bytes=2 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key_for(**components):
+        """Derives an artifact key from named components (any JSON-serializable values)."""
+        payload = json.dumps(components, sort_keys=True, default=repr)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    # --- Manifest ---
+    @contextmanager
+    def _locked(self, stale_after=60.0):
+        """Cross-process lock around manifest updates (a lock file created with O_EXCL)."""
+        os.makedirs(self.root, exist_ok=True)
+        lock_path = os.path.join(self.root, ".lock")
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > stale_after:
+                        os.remove(lock_path)  # Left behind by a killed process
+                except OSError:
+                    pass
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(lock_path)
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.root, self.MANIFEST), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest):
+        def write(path):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+
+        self._atomic_write(os.path.join(self.root, self.MANIFEST), write)
+
+    def _atomic_write(self, target, write):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    # --- Artifacts ---
+    def path_for(self, key, suffix=".joblib"):
+        """Where the artifact with this key lives (or will live)."""
+        return os.path.join(self.root, key + suffix)
+
+    def has(self, key):
+        entry = self._read_manifest().get(key)
+        return entry is not None and os.path.exists(os.path.join(self.root, entry["file"]))
+
+    def load(self, key):
+        """Loads a joblib artifact and marks it as recently used."""
+        with self._locked():
+            manifest = self._read_manifest()
+            entry = manifest[key]
+            entry["last_access"] = time.time()
+            self._write_manifest(manifest)
+        return joblib.load(os.path.join(self.root, entry["file"]))
+
+    def touch(self, key):
+        """Marks an artifact that is read directly from disk (e.g. an audio file) as recently used. Returns whether it is stored."""
+        with self._locked():
+            manifest = self._read_manifest()
+            entry = manifest.get(key)
+            if entry is None:
+                return False
+            entry["last_access"] = time.time()
+            self._write_manifest(manifest)
+        return True
+
+    def save(self, key, name, obj, metadata=None):
+        """Atomically stores `obj` with joblib under `key` and records it in the manifest."""
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path_for(key)
+        self._atomic_write(path, lambda tmp_path: joblib.dump(obj, tmp_path))
+        self.register(key, name, path, metadata)
+
+    def register(self, key, name, path, metadata=None):
+        """Records an artifact file that was written directly into the store (e.g. a study database)."""
+        now = time.time()
+        with self._locked():
+            manifest = self._read_manifest()
+            manifest[key] = {
+                "name": name,
+                "file": os.path.basename(path),
+                "size": os.path.getsize(path),
+                "created": now,
+                "last_access": now,
+                "metadata": metadata or {},
+            }
+            self._evict(manifest, protected={key})
+            self._write_manifest(manifest)
+
+    def latest(self, name):
+        """Key of the most recently created artifact with this name, or None."""
+        entries = [(entry["created"], key) for key, entry in self._read_manifest().items() if entry["name"] == name]
+        return max(entries)[1] if entries else None
+
+    def entries(self):
+        """All manifest entries as (key, entry) pairs, most recently used first."""
+        return sorted(self._read_manifest().items(), key=lambda item: item[1]["last_access"], reverse=True)
+
+    def total_size(self):
+        return sum(entry["size"] for entry in self._read_manifest().values())
+
+    # --- Eviction ---
+    def _evict(self, manifest, max_bytes=None, protected=()):
+        """Removes least recently used artifacts from disk and manifest until the total size fits. Returns the removed keys."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        total = sum(entry["size"] for entry in manifest.values())
+        removed = []
+        for key, entry in sorted(manifest.items(), key=lambda item: item[1]["last_access"]):
+            if total <= max_bytes:
+                break
+            if key in protected:
+                continue
+            try:
+                os.remove(os.path.join(self.root, entry["file"]))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            removed.append(key)
+        for key in removed:
+            del manifest[key]
+        return removed
+
+    def prune(self, max_bytes=None):
+        """Evicts least recently used artifacts down to max_bytes (default: the store limit) and drops entries whose file is gone."""
+        with self._locked():
+            manifest = self._read_manifest()
+            missing = [key for key, entry in manifest.items() if not os.path.exists(os.path.join(self.root, entry["file"]))]
+            for key in missing:
+                del manifest[key]
+            removed = self._evict(manifest, max_bytes)
+            self._write_manifest(manifest)
+        return missing + removed
+
+    def print_entries(self):
+        entries = self.entries()
+        print(f"\n--- Artifacts in {self.root} ({len(entries)} entries, {self.total_size() / (1024 * 1024):.1f} MB) ---")
+        for key, entry in entries:
+            last_access = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["last_access"]))
+            print(f"  {key}  {entry['name']:<32} {entry['size'] / 1024:>10.1f} KB  last used {last_access}")
+
+
+# Shared by all trainers and the serve mode
+artifact_store = ArtifactStore()
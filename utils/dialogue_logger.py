@@ -1,10 +1,17 @@
 import datetime
 import time
 import os
+import uuid
 
 class DialogueLogger:
-    """A class to handle logging of dialogue turns and saving transcripts."""
-    def __init__(self):
+    """
+    A class to handle logging of dialogue turns and saving transcripts.
+    Turns are kept as (timestamp, speaker, utterance, state) tuples and only formatted when saved. With a
+    TranscriptWriter every turn is also streamed as a JSON record, so a crash mid-dialogue does not lose the transcript.
+    """
+    def __init__(self, session_id=None, writer=None):
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.writer = writer
         self.transcript = []
         self.turn_count = 0
         self.system_turns = 0
@@ -13,43 +20,50 @@ class DialogueLogger:
 
     def log_turn(self, speaker, utterance, state):
         """Logs a single turn of the dialogue, including the state."""
-        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = time.time()
         self.turn_count += 1
         if speaker == "System":
             self.system_turns += 1
         else:
             self.user_turns += 1
 
-        log_entry = (
-            f"Timestamp: {timestamp}\n"
-            f"Turn: {self.turn_count}\n"
+        self.transcript.append((timestamp, speaker, utterance, state))
+        if self.writer is not None:
+            self.writer.write({"session": self.session_id, "turn": self.turn_count, "time": timestamp,
+                               "state": state, "speaker": speaker, "utterance": utterance})
+
+    def _format_turn(self, turn, entry):
+        timestamp, speaker, utterance, state = entry
+        return (
+            f"Timestamp: {datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"Turn: {turn}\n"
             f"State: {state}\n"
             f"Speaker: {speaker}\n"
             f"Utterance: {utterance}\n"
         )
-        self.transcript.append(log_entry)
 
     def save(self):
-        """Saves the complete dialogue transcript to a unique file."""
+        """Saves the complete dialogue transcript to a file unique to this session."""
         end_time = time.time()
         duration = end_time - self.start_time
-        
+
         # Calculate MM:SS format
         minutes = int(duration // 60)
         seconds = int(duration % 60)
         duration_mm_ss = f"{minutes:02d}:{seconds:02d}"
 
         session_timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = os.path.join("saved_transcripts", f"dialogue_{session_timestamp}.txt")
+        filename = os.path.join("saved_transcripts", f"dialogue_{session_timestamp}_{self.session_id}.txt")
 
-        with open(filename, 'w') as f:
+        # 'x': a transcript is never overwritten by another session's
+        with open(filename, 'x') as f:
             f.write("--- Dialogue Transcript ---\n\n")
-            f.write("\n".join(self.transcript))
+            f.write("\n".join(self._format_turn(turn, entry) for turn, entry in enumerate(self.transcript, start=1)))
             f.write(f"\n--- End of Dialogue ---\n")
             f.write(f"Total Duration (MM:SS format): {duration_mm_ss}\n")
             f.write(f"Total Duration (in seconds): {duration:.2f} seconds\n")
             f.write(f"Total Turns: {self.turn_count}\n")
             f.write(f"System Turns: {self.system_turns}\n")
             f.write(f"User Turns: {self.user_turns}\n")
-        
+
         print(f"[Dialogue transcript saved to {filename}]")
@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+from collections import deque
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class Histogram:
+    """
+    HDR-style latency histogram: log-linear buckets (2**sub_bucket_bits buckets per power of two of microseconds),
+    so recording is O(1), memory is bounded and every quantile is accurate to about 1 / 2**sub_bucket_bits (~3%).
+    """
+    def __init__(self, sub_bucket_bits=5):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def _bucket(self, microseconds):
+        if microseconds < (1 << self.sub_bucket_bits):
+            return microseconds
+        shift = microseconds.bit_length() - self.sub_bucket_bits - 1
+        return ((shift + 1) << self.sub_bucket_bits) + (microseconds >> shift) - (1 << self.sub_bucket_bits)
+
+    def _bucket_upper_bound(self, bucket):
+        """Largest value (in microseconds) that falls into `bucket`."""
+        if bucket < (1 << self.sub_bucket_bits):
+            return bucket
+        shift = (bucket >> self.sub_bucket_bits) - 1
+        mantissa = (bucket & ((1 << self.sub_bucket_bits) - 1)) + (1 << self.sub_bucket_bits)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds):
+        bucket = self._bucket(int(seconds * 1e6))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Value (seconds) below which a fraction q of the recorded values falls (bucket upper bound, capped at the max)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(q * self.count)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self._bucket_upper_bound(bucket) / 1e6, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {"count": self.count, "sum_s": self.total,
+                "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+                "min_ms": self.min * 1000 if self.count else 0.0, "max_ms": self.max * 1000,
+                **{f"p{q * 100:g}_ms": self.quantile(q) * 1000 for q in QUANTILES}}
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "state", "session", "started")
+
+    def __init__(self, metrics, stage, state, session):
+        self.metrics = metrics
+        self.stage = stage
+        self.state = state
+        self.session = session
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.stage, time.perf_counter() - self.started, self.state, self.session)
+        return False
+
+
+class Metrics:
+    """
+    Timing spans for the stages of a dialogue turn (input/ASR, classification, slot extraction, restaurant lookup,
+    reasoning, output/TTS), tagged with the FSM state and the session id. Durations are aggregated into one Histogram
+    per (stage, state); the most recent spans are kept with all their tags to find individual slow turns.
+
+    When disabled, span() returns a shared no-op context manager, so the instrumentation costs a method call.
+    """
+    def __init__(self, enabled=False, recent_spans=1000):
+        self.enabled = enabled
+        self.histograms = {}
+        self.recent = deque(maxlen=recent_spans)
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        return self
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.recent.clear()
+
+    def span(self, stage, state=None, session=None):
+        if not self.enabled:
+            return NOOP_SPAN
+        return _Span(self, stage, state, session)
+
+    def record(self, stage, seconds, state=None, session=None):
+        with self._lock:
+            histogram = self.histograms.get((stage, state))
+            if histogram is None:
+                histogram = self.histograms[(stage, state)] = Histogram()
+            histogram.record(seconds)
+            self.recent.append((time.time(), stage, state, session, seconds))
+
+    # --- Export ---
+    def snapshot(self):
+        """JSON-serializable snapshot: per stage and state the count, mean, min, max and quantiles, plus the recent spans."""
+        with self._lock:
+            return {
+                "stages": [{"stage": stage, "state": state, **histogram.snapshot()}
+                           for (stage, state), histogram in sorted(self.histograms.items(), key=lambda item: (item[0][0], item[0][1] or ""))],
+                "recent_spans": [{"time": at, "stage": stage, "state": state, "session": session, "ms": seconds * 1000}
+                                 for at, stage, state, session, seconds in self.recent],
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot())
+
+    def prometheus_text(self, name="dialogue_stage_duration_seconds"):
+        """Prometheus text exposition format: one summary (quantiles, sum, count) per stage and state."""
+        lines = [f"# HELP {name} Duration of the stages of a dialogue turn.", f"# TYPE {name} summary"]
+        with self._lock:
+            for (stage, state), histogram in sorted(self.histograms.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+                labels = f'stage="{stage}",state="{state or ""}"'
+                for q in QUANTILES:
+                    lines.append(f'{name}{{{labels},quantile="{q}"}} {histogram.quantile(q):.6f}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def print_table(self):
+        snapshot = self.snapshot()
+        if not snapshot["stages"]:
+            print("No metrics recorded" + ("" if self.enabled else " (start with --metrics to enable them)") + ".")
+            return
+        print(f"{'Stage':<18}{'State':<28}{'Count':>7}{'Mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'Max ms':>10}")
+        for row in snapshot["stages"]:
+            print(f"{row['stage']:<18}{row['state'] or '-':<28}{row['count']:>7}{row['mean_ms']:>10.2f}{row['p50_ms']:>10.2f}"
+                  f"{row['p90_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+
+
+# Process-wide instance used by the dialogue system (disabled unless --metrics is given)
+metrics = Metrics()
@@ -0,0 +1,204 @@
+import os
+import sys
+import glob
+import time
+import hashlib
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Tuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import joblib
+
+
+@dataclass
+class Stage:
+    """
+    A named step of the pipeline.
+    `func` is called with the declared inputs as positional arguments (plus the fixed `kwargs` and `options`) and returns
+    a tuple with one value per declared output (or the value itself when there is exactly one output).
+    `options` are execution settings (e.g. worker counts) that do not change the result and are not part of the cache key.
+    `code` lists extra source files whose changes must invalidate the cached outputs (the module of `func` is always included),
+    `files` lists data files whose contents are part of the cache key.
+    """
+    name: str
+    func: Callable
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    kwargs: Dict = field(default_factory=dict)
+    options: Dict = field(default_factory=dict)
+    code: Tuple[str, ...] = ()
+    files: Tuple[str, ...] = ()
+    cache: bool = True
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str  # "ran" or "cached"
+    start: float
+    end: float
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+def _file_digest(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _execute(func, args, kwargs):
+    """Runs a stage function (in a worker process) and returns its outputs."""
+    return func(*args, **kwargs)
+
+
+class PipelineRunner:
+    """
+    Runs a DAG of stages. A stage starts as soon as all of its inputs are available, so independent stages
+    run concurrently on a process pool. Stages whose code, input values and data files are unchanged since
+    the last run are skipped and their outputs are loaded from the stage cache.
+    """
+    def __init__(self, stages, max_workers=None, cache_dir=os.path.join("model_tuning", "stage_cache")):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.results = {}
+        self._producers = {}
+
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self._producers:
+                    raise ValueError(f"Output '{output}' is produced by both '{self._producers[output]}' and '{stage.name}'.")
+                self._producers[output] = stage.name
+
+    # --- Cache ---
+    def _code_files(self, stage):
+        module_file = getattr(sys.modules.get(stage.func.__module__), "__file__", None)
+        return ([module_file] if module_file else []) + list(stage.code)
+
+    def _cache_key(self, stage, values):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(stage.name.encode("utf-8"))
+        for path in self._code_files(stage) + list(stage.files):
+            digest.update(_file_digest(path).encode("ascii"))
+        for name in stage.inputs:
+            digest.update(joblib.hash(values[name]).encode("ascii"))
+        digest.update(joblib.hash(stage.kwargs).encode("ascii"))
+        return digest.hexdigest()
+
+    def _cache_path(self, stage, key):
+        return os.path.join(self.cache_dir, f"{stage.name}-{key}.joblib")
+
+    def _store(self, stage, key, outputs):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for stale in glob.glob(os.path.join(self.cache_dir, f"{stage.name}-*.joblib")):
+            os.remove(stale)
+        tmp_path = self._cache_path(stage, key) + ".tmp"
+        joblib.dump(outputs, tmp_path)
+        os.replace(tmp_path, self._cache_path(stage, key))
+
+    # --- Scheduling ---
+    def _validate(self, values):
+        for stage in self.stages.values():
+            for name in stage.inputs:
+                if name not in values and name not in self._producers:
+                    raise ValueError(f"Stage '{stage.name}' needs '{name}', which no stage produces and was not given.")
+
+    def _assign_outputs(self, stage, outputs, values):
+        if len(stage.outputs) == 1:
+            outputs = (outputs,)
+        for name, value in zip(stage.outputs, outputs):
+            values[name] = value
+
+    def run(self, **params):
+        """Runs all stages and returns a dict with every produced value (plus the given params)."""
+        values = dict(params)
+        self._validate(values)
+        pending = dict(self.stages)
+        running = {}
+        keys = {}
+        pipeline_start = time.perf_counter()
+
+        def ready_stages():
+            return [stage for stage in pending.values() if all(name in values for name in stage.inputs)]
+
+        executor = ProcessPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+        try:
+            while pending or running:
+                for stage in ready_stages():
+                    del pending[stage.name]
+                    start = time.perf_counter()
+                    key = keys[stage.name] = self._cache_key(stage, values) if stage.cache else None
+
+                    if key and os.path.exists(self._cache_path(stage, key)):
+                        self._assign_outputs(stage, joblib.load(self._cache_path(stage, key)), values)
+                        self.results[stage.name] = StageResult(stage.name, "cached", start - pipeline_start, time.perf_counter() - pipeline_start)
+                        continue
+
+                    args = [values[name] for name in stage.inputs]
+                    kwargs = {**stage.kwargs, **stage.options}
+                    if executor is None:
+                        outputs = _execute(stage.func, args, kwargs)
+                        self._finish(stage, key, outputs, values, start - pipeline_start, time.perf_counter() - pipeline_start)
+                    else:
+                        running[executor.submit(_execute, stage.func, args, kwargs)] = (stage, start)
+
+                if not running:
+                    if pending and not ready_stages():
+                        raise RuntimeError(f"Pipeline is stuck, unresolved stages: {', '.join(pending)} (cyclic dependencies?)")
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, start = running.pop(future)
+                    self._finish(stage, keys[stage.name], future.result(), values, start - pipeline_start, time.perf_counter() - pipeline_start)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        return values
+
+    def _finish(self, stage, key, outputs, values, start, end):
+        self._assign_outputs(stage, outputs, values)
+        if key:
+            self._store(stage, key, outputs)
+        self.results[stage.name] = StageResult(stage.name, "ran", start, end)
+
+    # --- Reporting ---
+    def critical_path(self):
+        """The chain of dependent stages with the largest total duration (the lower bound on wall-clock time)."""
+        finish, previous = {}, {}
+
+        def longest(name):
+            if name not in finish:
+                stage = self.stages[name]
+                dependencies = {self._producers[i] for i in stage.inputs if i in self._producers}
+                best = max(dependencies, key=longest, default=None)
+                previous[name] = best
+                finish[name] = (finish[best] if best else 0.0) + self.results[name].duration
+            return finish[name]
+
+        if not self.results:
+            return [], 0.0
+        last = max(self.results, key=longest)
+        path, node = [], last
+        while node:
+            path.append(node)
+            node = previous[node]
+        return list(reversed(path)), finish[last]
+
+    def print_report(self):
+        print("\n--- Pipeline stage report ---")
+        print(f"  {'Stage':<32} {'Status':<8} {'Start (s)':>10} {'Duration (s)':>13}")
+        for result in sorted(self.results.values(), key=lambda r: r.start):
+            print(f"  {result.name:<32} {result.status:<8} {result.start:>10.2f} {result.duration:>13.2f}")
+
+        path, length = self.critical_path()
+        wall_clock = max((r.end for r in self.results.values()), default=0.0)
+        total_work = sum(r.duration for r in self.results.values())
+        print(f"\n  Wall clock: {wall_clock:.2f}s, summed stage time: {total_work:.2f}s")
+        print(f"  Critical path ({length:.2f}s): {' -> '.join(path)}")
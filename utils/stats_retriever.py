@@ -15,6 +15,14 @@ class SystemsOverview:
             "Recall Deduplication": metrics_dedup["recall_macro"]
         })
 
+    def add_baseline_results(self, system_name, accuracy_original, accuracy_dedup):
+        # The baselines only report their test accuracy
+        self.results.append({
+            "System": system_name,
+            "Accuracy Origin": accuracy_original,
+            "Accuracy Deduplication": accuracy_dedup,
+        })
+
     def print_results_table(self):
         df_results = pd.DataFrame(self.results)
         print(df_results.to_string(index=False))
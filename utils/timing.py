@@ -0,0 +1,29 @@
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Collects the wall-clock duration of named stages and prints a breakdown."""
+    def __init__(self):
+        self.stages = []
+        self.start_time = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block and records it under the given name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def total(self):
+        return time.perf_counter() - self.start_time
+
+    def print_breakdown(self, title="Startup time breakdown"):
+        total = self.total()
+        print("\n--- " + title + " ---")
+        for name, seconds in self.stages:
+            share = (seconds / total) * 100 if total > 0 else 0.0
+            print(f"  {name:<30} {seconds * 1000:>9.1f} ms  ({share:5.1f}%)")
+        print(f"  {'Total':<30} {total * 1000:>9.1f} ms")
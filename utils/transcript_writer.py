@@ -0,0 +1,245 @@
+import atexit
+import datetime
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+
+class TranscriptWriter:
+    """
+    Appends structured dialogue turns as JSON lines from a background thread, so logging never blocks a turn.
+
+    - Records go through a bounded queue; when it is full, records are dropped (and counted) instead of stalling the session.
+    - The thread writes whatever is queued in one batch and fsyncs at most every `fsync_interval` seconds,
+      so a crash loses at most that much of the transcripts.
+    - Files rotate when they reach `max_bytes` or are `max_age` seconds old; rotated files are gzipped with compress=True.
+    - File names hold a timestamp, the process id and a sequence number and are created exclusively, so concurrent
+      writers (sessions, processes) never overwrite each other.
+    - Failures never stop the writer: values JSON cannot encode are written as strings, and a record that still cannot
+      be serialized is dropped. When writing, syncing or rotating fails (e.g. a full disk), the error is counted and
+      the unwritten lines are kept and retried in a new file. Nothing is lost unless more than `max_queue` lines pile up.
+    """
+    def __init__(self, directory="saved_transcripts", prefix="transcripts", max_bytes=64 * 1024 * 1024, max_age=3600.0,
+                 compress=True, max_queue=10000, batch_size=512, fsync_interval=0.5):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+
+        self.records_written = 0
+        self.records_dropped = 0
+        self.files_rotated = 0
+        self.errors = 0
+        self.last_error = None
+        self.current_path = None
+
+        self.max_queue = max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._opened_at = 0.0
+        self._sequence = 0
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._failing = False
+        atexit.register(self.close)
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+                self._worker.start()
+        return self
+
+    def close(self):
+        """Writes the queued records, fsyncs and closes the current file."""
+        with self._worker_lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- Records ---
+    def write(self, record):
+        """Queues one record (a JSON-serializable dict); returns False if it was dropped because the queue is full."""
+        if self._worker is None or not self._worker.is_alive():
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.records_dropped += 1
+            return False
+
+    def stats(self):
+        return {"written": self.records_written, "dropped": self.records_dropped, "queued": self._queue.qsize(),
+                "rotated_files": self.files_rotated, "errors": self.errors, "last_error": self.last_error,
+                "current_file": self.current_path}
+
+    def _error(self, action, error):
+        self.errors += 1
+        self.last_error = f"{action}: {error!r}"
+        if not self._failing:
+            # Reported once per failure streak, stats() keeps the count
+            print(f"[Transcripts] Could not {action}: {error}")
+        self._failing = True
+
+    def _serialize(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            except (TypeError, ValueError) as e:
+                # E.g. a circular reference
+                self.records_dropped += 1
+                self._error("serialize a record", e)
+        return lines
+
+    # --- Files ---
+    def _open_new_file(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        while True:
+            self._sequence += 1
+            path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{os.getpid()}_{self._sequence:04d}.jsonl")
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                break
+            except FileExistsError:
+                continue
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+        self._opened_at = time.monotonic()
+        self.current_path = path
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        file, self._file = self._file, None
+        try:
+            file.flush()
+            os.fsync(file.fileno())
+        finally:
+            file.close()
+
+    def _abandon_file(self):
+        """After a failed write the file may end in a partial line; later records go to a new file."""
+        file, self._file = self._file, None
+        try:
+            file.close()
+        except Exception:
+            pass
+
+    def _rotate(self):
+        path = self.current_path
+        self._close_file()
+        self.files_rotated += 1
+        if self.compress and path and os.path.getsize(path) > 0:
+            try:
+                with open(path, "rb") as source, gzip.open(path + ".gz", "wb") as target:
+                    shutil.copyfileobj(source, target)
+            except OSError as e:
+                # Keep the uncompressed file
+                if os.path.exists(path + ".gz"):
+                    os.remove(path + ".gz")
+                self._error("compress a rotated file", e)
+                return
+            os.remove(path)
+
+    def _needs_rotation(self):
+        return self._file is not None and (self._file.tell() >= self.max_bytes or
+                                           time.monotonic() - self._opened_at >= self.max_age)
+
+    # --- Worker ---
+    def _run(self):
+        last_fsync = time.monotonic()
+        dirty = False
+        stopping = False
+        pending = []  # Serialized lines not written yet (kept across I/O errors)
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                first = ()
+
+            batch = [] if first == () else [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [record for record in batch if record is not None]
+            pending.extend(self._serialize(batch))
+
+            try:
+                if pending:
+                    if self._needs_rotation():
+                        self._rotate()
+                    if self._file is None:
+                        self._open_new_file()
+                    self._file.write("".join(pending))
+                    self.records_written += len(pending)
+                    pending = []
+                    dirty = True
+
+                now = time.monotonic()
+                if dirty and (now - last_fsync >= self.fsync_interval or stopping):
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    last_fsync, dirty = now, False
+                elif self._needs_rotation():
+                    # Age-based rotation also happens while no records arrive
+                    self._rotate()
+                self._failing = False
+            except Exception as e:
+                self._error("write transcripts", e)
+                if self._file is not None:
+                    self._abandon_file()
+                dirty = False
+                if len(pending) > self.max_queue:
+                    self.records_dropped += len(pending) - self.max_queue
+                    pending = pending[-self.max_queue:]
+                if not stopping:
+                    time.sleep(self.fsync_interval)
+
+        self.records_dropped += len(pending)
+        try:
+            self._close_file()
+        except Exception as e:
+            self._error("close the transcript file", e)
+
+
+def read_jsonl_transcripts(*filepaths):
+    """
+    User utterances per session from (possibly gzipped) JSONL transcript files: {session id: [utterance, ...]}.
+    Pass all files of a run together, a session can span rotated files.
+    """
+    turns = {}
+    for filepath in filepaths:
+        opener = gzip.open if filepath.endswith(".gz") else open
+        with opener(filepath, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A line cut off by a crash or a failed write
+                session_turns = turns.setdefault(record["session"], [])
+                if record["speaker"] == "User":
+                    session_turns.append((record["turn"], record["utterance"]))
+    return {session: [utterance for _, utterance in sorted(session_turns)] for session, session_turns in turns.items()}